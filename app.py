@@ -1,157 +1,203 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+import click
 from flask_sqlalchemy import SQLAlchemy
-import google.generativeai as genai
-from datetime import datetime
+import asyncio
+import contextvars
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from scraper import WebScraper
 import json
-import re
 from config import Config
-from models import db, Conversation, Message, SearchHistory
+from llm import create_backend
+from assets import init_assets
+from compression import init_compression
+from metrics import REGISTRY, CHAT_REQUESTS, CHAT_DURATION, span, start_trace
+from profiler import profile_request
+from headlines import start_prefetcher
+from retention import RetentionTask, last_report, start_retention
+from memory import build_context, schedule_update
+from batch import run_batch
+from records import as_record, encode_sources, dumps_with_raw, unpack_payload
+from renderer import RENDERER_VERSION, RENDER_CACHE, format_ai_response, render_key, render_message
+from prefetch import SPECULATIVE
+from transfer import ImportFailed, export_lines, import_lines
+from models import db, ensure_schema, record_tombstones, Conversation, Message, SearchHistory, Tombstone
 
 app = Flask(__name__)
 app.config.from_object(Config)
 db.init_app(app)
+init_compression(app)
+init_assets(app)
 
-# Initialize Gemini
-genai.configure(api_key=Config.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash')
-
-def format_ai_response(text):
-    """
-    Enhanced formatting for AI responses with proper HTML structure for the chat interface
-    Includes special handling for source citations and better visual formatting
-    """
-    # Convert markdown to HTML-like structure for the frontend
-    formatted_lines = []
-    in_list = False
-    in_code = False
-    
-    # Split into lines and process each one
-    lines = text.split('\n')
-    for line in lines:
-        line = line.strip()
-        
-        # Skip empty lines (we'll handle spacing later)
-        if not line:
-            continue
-            
-        # Headers (## Header)
-        if line.startswith('## '):
-            if in_list:
-                formatted_lines.append('</ul>' if not line.startswith('- ') else '')
-                in_list = False
-            formatted_lines.append(f'<h3 class="ai-response-heading">{line[3:]}</h3>')
-            
-        # Subheaders (### Subheader)
-        elif line.startswith('### '):
-            if in_list:
-                formatted_lines.append('</ul>' if not line.startswith('- ') else '')
-                in_list = False
-            formatted_lines.append(f'<h4 class="ai-response-subheading">{line[4:]}</h4>')
-            
-        # Bullet points (- or *)
-        elif line.startswith('- ') or line.startswith('* '):
-            if not in_list:
-                formatted_lines.append('<ul>')
-                in_list = True
-            formatted_lines.append(f'<li>{line[2:]}</li>')
-            
-        # Numbered lists (1. 2. etc)
-        elif re.match(r'^\d+\.\s', line):
-            if not in_list:
-                formatted_lines.append('<ol>')
-                in_list = True
-            formatted_lines.append(f'<li>{line[line.find(" ")+1:]}</li>')
-            
-        # Code blocks (```)
-        elif line.startswith('```'):
-            if in_code:
-                formatted_lines.append('</pre></code>')
-                in_code = False
-            else:
-                formatted_lines.append('<code><pre>')
-                in_code = True
-                  # Regular paragraphs
-        else:
-            if in_list:
-                formatted_lines.append('</ul>' if not line.startswith('- ') else '</ol>' if re.match(r'^\d+\.\s', line) else '')
-                in_list = False
-            if in_code:
-                formatted_lines.append(line)
-            else:
-                # Highlight source citations [Source X]
-                line_with_citations = re.sub(
-                    r'\[Source\s*(\d+)\]', 
-                    r'<span class="source-citation">[Source \1]</span>', 
-                    line
-                )
-                
-                # Split long paragraphs into shorter ones for readability
-                if len(line) > 120:
-                    parts = [line_with_citations[i:i+120] for i in range(0, len(line_with_citations), 120)]
-                    for part in parts:
-                        formatted_lines.append(f'<p>{part}</p>')
-                else:
-                    formatted_lines.append(f'<p>{line_with_citations}</p>')
-    
-    # Close any open tags
-    if in_list:
-        formatted_lines.append('</ul>')
-    if in_code:
-        formatted_lines.append('</pre></code>')
-    
-    # Combine with line breaks for readability
-    return '\n'.join(formatted_lines)
+# Initialize the LLM backend (Gemini, or the local stub for benchmarks)
+llm = create_backend(Config)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/api/conversations', methods=['GET'])
-def get_conversations():
-    conversations = Conversation.query.order_by(Conversation.updated_at.desc()).all()
-    return jsonify([{
+def conversation_summary(conv):
+    return {
         'id': conv.id,
         'title': conv.title,
         'updated_at': conv.updated_at.strftime('%Y-%m-%d %H:%M'),
+        'updated_at_iso': conv.updated_at.isoformat(),
         'is_deep_search': conv.is_deep_search
-    } for conv in conversations])
+    }
+
+def message_payload(msg):
+    return {
+        'id': msg.id,
+        'content': render_message(msg),
+        'is_user': msg.is_user,
+        'created_at': msg.created_at.isoformat(),
+        'sources': json.loads(unpack_payload(msg.sources)) if msg.sources else None
+    }
+
+def conversation_etag(conversation):
+    """
+    Validator for a read of a conversation. It changes when the conversation,
+    its messages, the requested window or the reply renderer change, and is
+    cheap to compute before any message is loaded. Messages rewritten in place
+    (retention, the Markdown backfill, import restore) change it through
+    Message.updated_at, which every UPDATE stamps.
+    """
+    count, last_id, last_write = db.session.query(
+        db.func.count(Message.id), db.func.max(Message.id), db.func.max(Message.updated_at)
+    ).filter(Message.conversation_id == conversation.id).one()
+    key = (f"{conversation.id}:{conversation.updated_at.isoformat()}:{conversation.title}:{count}:{last_id}:"
+           f"{last_write}:{RENDERER_VERSION}:{request.query_string.decode()}")
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def revalidated(response, etag):
+    """Let the browser cache a response but check it with If-None-Match before every reuse."""
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def sync_cursor():
+    """Server time to pass back as /api/sync?since=, taken before the rows it covers are read."""
+    return datetime.utcnow().isoformat()
+
+@app.route('/api/conversations', methods=['GET'])
+def get_conversations():
+    """
+    All conversations, newest first, as a JSON list. With `page` (and optionally
+    `per_page`) only that page is returned; the paging details go in the
+    X-Page, X-Per-Page, X-Total-Pages and X-Total-Count headers. X-Sync-Cursor
+    is the `since` for /api/sync.
+    """
+    cursor = sync_cursor()
+    query = Conversation.query.order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+    if 'page' not in request.args:
+        response = jsonify([conversation_summary(conv) for conv in query.all()])
+    else:
+        conversations = query.paginate(page=request.args.get('page', 1, type=int),
+                                       per_page=request.args.get('per_page', 50, type=int), error_out=False)
+        response = jsonify([conversation_summary(conv) for conv in conversations.items])
+        response.headers['X-Page'] = str(conversations.page)
+        response.headers['X-Per-Page'] = str(conversations.per_page)
+        response.headers['X-Total-Pages'] = str(conversations.pages)
+        response.headers['X-Total-Count'] = str(conversations.total)
+    response.headers['X-Sync-Cursor'] = cursor
+    return response
+
+@app.route('/api/sync', methods=['GET'])
+def sync():
+    """
+    Changes since a cursor from an earlier response: conversations created or
+    updated, ids of deleted ones, and new messages of `conversation_id`.
+    Rows near the cursor may be sent again, so clients merge by id. A cursor
+    older than the kept tombstones gets `reset: true`; the client reloads.
+    """
+    cursor = sync_cursor()
+    try:
+        since = datetime.fromisoformat(request.args['since'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'since must be a cursor from an earlier response'}), 400
+    if since < datetime.utcnow() - timedelta(days=Config.SYNC_TOMBSTONE_DAYS):
+        return jsonify({'reset': True, 'cursor': cursor})
+    
+    since -= timedelta(seconds=Config.SYNC_OVERLAP_SECONDS)
+    conversations = Conversation.query\
+        .filter(Conversation.updated_at >= since)\
+        .order_by(Conversation.updated_at.desc()).all()
+    deleted = [row.conversation_id for row in Tombstone.query.filter(Tombstone.deleted_at >= since)]
+    messages = []
+    conversation_id = request.args.get('conversation_id', type=int)
+    if conversation_id:
+        messages = Message.query\
+            .filter(Message.conversation_id == conversation_id, Message.created_at >= since)\
+            .order_by(Message.id).all()
+    return jsonify({
+        'reset': False,
+        'cursor': cursor,
+        'conversations': [conversation_summary(conv) for conv in conversations],
+        'deleted': deleted,
+        'messages': [message_payload(msg) for msg in messages]
+    })
 
 @app.route('/api/conversation/<int:conversation_id>', methods=['GET'])
 def get_conversation(conversation_id):
     try:
         # Get conversation with error handling
         conversation = Conversation.query.get_or_404(conversation_id)
+        etag = conversation_etag(conversation)
+        if request.if_none_match.contains_weak(etag):
+            return revalidated(Response(status=304), etag)
+        
+        cursor = sync_cursor()
+        per_page = request.args.get('per_page', 50, type=int)
+        before = request.args.get('before', type=int)
+        conversation_info = {
+            'id': conversation.id,
+            'title': conversation.title,
+            'created_at': conversation.created_at.isoformat(),
+            'is_deep_search': conversation.is_deep_search
+        }
+        
+        if before is not None or request.args.get('tail', type=int) == 1:
+            # Newest-first windows for infinite scroll: the per_page messages
+            # before message `before` (or the latest ones), returned oldest first
+            query = Message.query.filter_by(conversation_id=conversation_id)
+            if before is not None:
+                query = query.filter(Message.id < before)
+            window = query.order_by(Message.id.desc()).limit(per_page + 1).all()
+            has_more = len(window) > per_page
+            window = window[:per_page][::-1]
+            return revalidated(jsonify({
+                'conversation': conversation_info,
+                'messages': [message_payload(msg) for msg in window],
+                'pagination': {
+                    'per_page': per_page,
+                    'has_more': has_more,
+                    'before': window[0].id if window else None
+                },
+                'cursor': cursor
+            }), etag)
         
         # Paginated messages query
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
         messages = Message.query\
             .filter_by(conversation_id=conversation_id)\
             .order_by(Message.created_at)\
             .paginate(page=page, per_page=per_page, error_out=False)
             
-        return jsonify({
-            'conversation': {
-                'id': conversation.id,
-                'title': conversation.title,
-                'created_at': conversation.created_at.isoformat(),
-                'is_deep_search': conversation.is_deep_search
-            },
-            'messages': [{
-                'id': msg.id,
-                'content': msg.content,
-                'is_user': msg.is_user,
-                'created_at': msg.created_at.isoformat(),
-                'sources': json.loads(msg.sources) if msg.sources else None
-            } for msg in messages.items],
+        return revalidated(jsonify({
+            'conversation': conversation_info,
+            'messages': [message_payload(msg) for msg in messages.items],
             'pagination': {
                 'page': messages.page,
                 'per_page': messages.per_page,
                 'total_pages': messages.pages,
                 'total_items': messages.total
-            }
-        })
+            },
+            'cursor': cursor
+        }), etag)
     except Exception as e:
         app.logger.error(f"Error fetching conversation {conversation_id}: {str(e)}")
         return jsonify({'error': 'Failed to retrieve conversation'}), 500
@@ -169,17 +215,137 @@ def update_conversation(conversation_id):
 
 @app.route('/api/conversation/<int:conversation_id>', methods=['DELETE'])
 def delete_conversation(conversation_id):
-    conversation = Conversation.query.get_or_404(conversation_id)
-    db.session.delete(conversation)
+    if not delete_conversations([conversation_id]):
+        return jsonify({'error': 'Conversation not found'}), 404
+    return jsonify({'success': True})
+
+@app.route('/api/conversations/delete', methods=['POST'])
+def bulk_delete_conversations():
+    """Delete up to BULK_DELETE_MAX conversations given as {"ids": [...]}."""
+    ids = (request.json or {}).get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return jsonify({'error': 'ids must be a list of conversation ids'}), 400
+    if len(ids) > Config.BULK_DELETE_MAX:
+        return jsonify({'error': f'At most {Config.BULK_DELETE_MAX} conversations per request'}), 400
+    deleted = delete_conversations(ids)
+    return jsonify({'deleted': deleted, 'missing': sorted(set(ids) - set(deleted))})
+
+def delete_conversations(ids):
+    """
+    Delete conversations with one statement and return the ids that existed.
+    Their messages, search history and memory go with them through ON DELETE
+    CASCADE, so none of those rows are loaded.
+    """
+    deleted = db.session.scalars(db.select(Conversation.id).where(Conversation.id.in_(ids))).all()
+    if deleted:
+        db.session.execute(db.delete(Conversation).where(Conversation.id.in_(deleted)))
+        # Remembered so other open clients drop them on their next sync
+        record_tombstones(db.session, deleted)
     db.session.commit()
+    return deleted
+
+def with_context(prompt, context):
+    """Prefix a prompt with the conversation's memory, if it has any."""
+    if not context:
+        return prompt
+    return (
+        "Earlier in this conversation (use it to resolve references such as 'it' or 'that'; "
+        f"don't repeat it back):\n{context}\n\n---\n\n{prompt}"
+    )
+
+def build_basic_prompt(message, note=None, context=None):
+    """Build the structured prompt used for basic chat and deep search fallbacks."""
+    prompt = f"Please provide a clear, structured response to: '{message}'\n\n"
+    if note:
+        prompt += f"Note: {note}\n\n"
+    return with_context(prompt + (
+        "Organize your answer with:\n"
+        "## Summary\n"
+        "- Key points\n\n"
+        "## Explanation\n"
+        "1. Step-by-step details\n"
+        "2. Supporting information\n\n"
+        "## Conclusion\n"
+        "- Final thoughts\n"
+        "- Recommendations if applicable"
+    ), context)
+
+def build_deep_search_prompt(message, scraped_data, context=None):
+    """Build the source-grounded prompt for a deep search."""
+    with span('prompt_build'):
+        # Number each source and cut its content to a preview, straight from the results
+        sources_text = "\n\n".join(
+            f"Source {number}:\nTitle: {item['title']}\nPublisher: {item['source']}\nDate: {item['time']}\nContent: {as_record(item).preview()}..."
+            for number, item in enumerate(scraped_data, 1)
+        )
+    
+        return with_context(
+            f"You are tasked with providing a comprehensive response about: '{message}'\n\n"
+            f"Using the following sources:\n{sources_text}\n\n"
+            "Your response should be thorough, well-structured, and specifically reference information from the sources provided.\n\n"
+            "Structure your response as follows:\n\n"
+            "## Key Findings\n"
+            "- Provide 3-5 bullet points summarizing the most important information\n"
+            "- Highlight the key facts relevant to the query\n\n"
+            "## Detailed Analysis\n"
+            "1. First major point with supporting evidence\n"
+            "2. Second major point with supporting evidence\n"
+            "3. Third major point with supporting evidence\n\n"
+            "## Additional Insights\n"
+            "- Include any other relevant information\n"
+            "- Note any contradictions or nuances across sources\n\n"
+            "## Sources\n"
+            "- List the key sources that informed your response\n\n"
+            "When referencing information, cite the sources using the format [Source X] where X is the source number.",
+            context
+        )
+
+# Blocking scrapes run here so a chat only holds a thread while Selenium does
+DEEP_SEARCH_POOL = ThreadPoolExecutor(max_workers=Config.DEEP_SEARCH_THREADS, thread_name_prefix='deep-search')
+
+def run_deep_search(message):
+    """Run the blocking Selenium scrape for a query; meant to be awaited via `deep_search`."""
+    scraper = WebScraper()
+    return scraper.scrape_news(message)
+
+def deep_search(message):
+    """Awaitable scrape on DEEP_SEARCH_POOL, carrying the request's trace context."""
+    context = contextvars.copy_context()
+    return asyncio.wrap_future(DEEP_SEARCH_POOL.submit(context.run, run_deep_search, message))
+
+@app.route('/api/prefetch', methods=['POST'])
+def prefetch_deep_search():
+    """Speculatively start the deep search for a draft message (see prefetch.py)."""
+    data = request.json or {}
+    query = (data.get('query') or '').strip()
+    client_id = data.get('client_id')
+    if not Config.PREFETCH_ENABLED:
+        return jsonify({'status': 'disabled'})
+    if len(query) < Config.PREFETCH_MIN_CHARS:
+        if client_id:
+            SPECULATIVE.cancel(client_id)
+        return jsonify({'status': 'ignored'})
+    return jsonify({'status': SPECULATIVE.start(query, client_id)}), 202
+
+@app.route('/api/prefetch', methods=['DELETE'])
+def cancel_prefetch():
+    """The draft was abandoned; cancel the client's prefetch unless something else is attached to it."""
+    client_id = request.args.get('client_id')
+    if client_id:
+        SPECULATIVE.cancel(client_id)
     return jsonify({'success': True})
 
 @app.route('/api/chat', methods=['POST'])
-def handle_chat():
+@profile_request
+async def handle_chat():
     data = request.json
     message = data['message'].strip()
     is_deep_search = data.get('deep_search', False)
     conversation_id = data.get('conversation_id')
+    # Optional per-request timing breakdown in the response
+    include_timings = data.get('timings', False) or request.args.get('timings', type=int) == 1
+    trace = start_trace()
+    mode = 'deep' if is_deep_search else 'basic'
     
     if not message:
         return jsonify({'error': 'Message cannot be empty'}), 400
@@ -197,149 +363,270 @@ def handle_chat():
         db.session.add(conversation)
         db.session.commit()
     
-    # Save user message
-    user_message = Message(
-        conversation_id=conversation.id,
-        content=message,
-        is_user=True
-    )
-    db.session.add(user_message)
+    # Load the conversation memory, then save the user message, committing
+    # before any awaits so no pooled connection is held while this chat waits
+    # on scraping or Gemini
+    conversation_id = conversation.id
+    with span('persistence'):
+        context = build_context(conversation_id)
+        user_message = Message(
+            conversation_id=conversation_id,
+            content=message,
+            is_user=True
+        )
+        db.session.add(user_message)
+        # Ids are read after a flush, since committing expires them
+        db.session.flush()
+        user_message_id = user_message.id
+        db.session.commit()
     # Generate response
     try:
         scraped_data = None
+        # Sources are encoded once; the same text is stored on both rows and sent back
+        sources_json = sources_text = None
         if is_deep_search:
             try:
-                # Perform deep search
+                # Perform deep search off the event loop so other chats keep being served
                 app.logger.info(f"Starting deep search for: {message}")
-                scraper = WebScraper()
-                scraped_data = scraper.scrape_news(message)
+                with span('deep_search'):
+                    scraped_data = None
+                    # Attach to a scrape prefetched while the message was typed, if any
+                    speculative = SPECULATIVE.claim(message)
+                    if speculative is not None:
+                        trace.annotate('prefetch', 'ready' if speculative.done() else 'running')
+                        try:
+                            scraped_data = await asyncio.wrap_future(speculative)
+                        except Exception as e:
+                            app.logger.warning(f"Prefetched deep search failed, scraping again: {str(e)}")
+                    # Nothing prefetched, or an empty (failed, blocked or incomplete) prefetch: search as usual
+                    if not scraped_data:
+                        scraped_data = await deep_search(message)
                 app.logger.info(f"Deep search completed. Found {len(scraped_data)} sources.")
                 
                 if not scraped_data:
                     app.logger.warning("Deep search returned no results")
                     # Fall back to regular search if no results found
-                    prompt = (
-                        f"Please provide a clear, structured response to: '{message}'\n\n"
-                        "Note: I tried to search for relevant information but couldn't find any specific sources.\n\n"
-                        "Organize your answer with:\n"
-                        "## Summary\n"
-                        "- Key points\n\n"
-                        "## Explanation\n"
-                        "1. Step-by-step details\n"
-                        "2. Supporting information\n\n"
-                        "## Conclusion\n"
-                        "- Final thoughts\n"
-                        "- Recommendations if applicable"
+                    prompt = build_basic_prompt(
+                        message,
+                        "I tried to search for relevant information but couldn't find any specific sources.",
+                        context
                     )
-                else:                    # Save search history
+                else:
+                    with span('serialization'):
+                        sources_json = encode_sources(scraped_data)
+                        sources_text = sources_json.decode()
+                    # Save search history
                     search_history = SearchHistory(
-                        conversation_id=conversation.id,
+                        conversation_id=conversation_id,
                         query=message,
-                        sources=json.dumps(scraped_data)
+                        sources=sources_text
                     )
                     db.session.add(search_history)
-                    
-                    # Enhance each source with metadata for better context
-                    enriched_sources = []
-                    for i, item in enumerate(scraped_data):
-                        source_number = i + 1
-                        source_info = {
-                            "number": source_number,
-                            "title": item['title'],
-                            "source": item['source'],
-                            "time": item['time'],
-                            "content_preview": item['content'][:3000] if len(item['content']) > 3000 else item['content']
-                        }
-                        enriched_sources.append(source_info)
-                    
-                    # Prepare prompt for Gemini with clear structure request and source metadata
-                    sources_text = "\n\n".join(
-                        f"Source {src['number']}:\nTitle: {src['title']}\nPublisher: {src['source']}\nDate: {src['time']}\nContent: {src['content_preview']}..."
-                        for src in enriched_sources
-                    )
-                    
-                    prompt = (
-                        f"You are tasked with providing a comprehensive response about: '{message}'\n\n"
-                        f"Using the following sources:\n{sources_text}\n\n"
-                        "Your response should be thorough, well-structured, and specifically reference information from the sources provided.\n\n"
-                        "Structure your response as follows:\n\n"
-                        "## Key Findings\n"
-                        "- Provide 3-5 bullet points summarizing the most important information\n"
-                        "- Highlight the key facts relevant to the query\n\n"
-                        "## Detailed Analysis\n"
-                        "1. First major point with supporting evidence\n"
-                        "2. Second major point with supporting evidence\n"
-                        "3. Third major point with supporting evidence\n\n"
-                        "## Additional Insights\n"
-                        "- Include any other relevant information\n"
-                        "- Note any contradictions or nuances across sources\n\n"
-                        "## Sources\n"
-                        "- List the key sources that informed your response\n\n"
-                        "When referencing information, cite the sources using the format [Source X] where X is the source number."
-                    )
+                    prompt = build_deep_search_prompt(message, scraped_data, context)
             except Exception as e:
                 app.logger.error(f"Error in deep search: {str(e)}")
                 # Fall back to regular search if deep search fails
-                prompt = (
-                    f"Please provide a clear, structured response to: '{message}'\n\n"
-                    "Note: I tried to search for relevant information but encountered technical issues.\n\n"
-                    "Organize your answer with:\n"
-                    "## Summary\n"
-                    "- Key points\n\n"
-                    "## Explanation\n"
-                    "1. Step-by-step details\n"
-                    "2. Supporting information\n\n"
-                    "## Conclusion\n"
-                    "- Final thoughts\n"
-                    "- Recommendations if applicable"
+                prompt = build_basic_prompt(
+                    message,
+                    "I tried to search for relevant information but encountered technical issues.",
+                    context
                 )
         else:
             # For basic chat, still request structured response
-            prompt = (
-                f"Please provide a clear, structured response to: '{message}'\n\n"
-                "Organize your answer with:\n"
-                "## Summary\n"
-                "- Key points\n\n"
-                "## Explanation\n"
-                "1. Step-by-step details\n"
-                "2. Supporting information\n\n"
-                "## Conclusion\n"
-                "- Final thoughts\n"
-                "- Recommendations if applicable"
-            )
+            prompt = build_basic_prompt(message, context=context)
         
-        # Get response from Gemini
-        response = model.generate_content(prompt)
-        response_text = format_ai_response(response.text)
+        # Get response from the LLM backend without blocking the event loop
+        with span('generation'):
+            generated = await llm.generate_async(prompt)
+        with span('formatting'):
+            response_text = format_ai_response(generated)
         
-        # Save AI response
-        ai_message = Message(
-            conversation_id=conversation.id,
-            content=response_text,
-            is_user=False,
-            sources=json.dumps(scraped_data) if scraped_data else None
-        )
-        db.session.add(ai_message)
+        with span('persistence'):
+            # Save AI response
+            # The Markdown is stored; HTML is rendered on read
+            ai_message = Message(
+                conversation_id=conversation_id,
+                content=generated,
+                is_user=False,
+                sources=sources_text,
+                renderer_version=RENDERER_VERSION
+            )
+            db.session.add(ai_message)
+            
+            # Update conversation timestamp
+            conversation.updated_at = datetime.utcnow()
+            db.session.flush()
+            message_id = ai_message.id
+            RENDER_CACHE.put(render_key(generated), response_text)
+            db.session.commit()
         
-        # Update conversation timestamp
-        conversation.updated_at = datetime.utcnow()
-        db.session.commit()
+        # Fold turns that left the recent window into the rolling summary
+        schedule_update(app, conversation_id, llm)
         
-        return jsonify({
+        result = {
             'response': response_text,
-            'conversation_id': conversation.id,
-            'sources': scraped_data
-        })
+            'conversation_id': conversation_id,
+            'user_message_id': user_message_id,
+            'message_id': message_id
+        }
+        CHAT_REQUESTS.inc(mode=mode, status='ok')
+        CHAT_DURATION.observe(time.perf_counter() - trace.started, mode=mode)
+        if include_timings:
+            result['timings'] = trace.breakdown()
+        return Response(dumps_with_raw(result, sources=sources_json), mimetype='application/json')
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        app.logger.exception(f"Error handling chat: {str(e)}")
         db.session.rollback()
+        CHAT_REQUESTS.inc(mode=mode, status='error')
         return jsonify({
             'error': str(e),
             'response': "<p>Sorry, I encountered an error processing your request.</p>"
         }), 500
 
+def build_batch_prompt(query, sources):
+    """Prompt for one query of a batch deep search."""
+    if not sources:
+        return build_basic_prompt(
+            query,
+            "I tried to search for relevant information but couldn't find any specific sources."
+        )
+    return build_deep_search_prompt(query, sources)
+
+def save_batch_result(result, sources_json=None):
+    """Store a finished batch query as its own deep-search conversation."""
+    conversation = Conversation(title=result['query'][:50], is_deep_search=True)
+    db.session.add(conversation)
+    db.session.flush()
+    sources = sources_json.decode() if sources_json else None
+    db.session.add(Message(conversation_id=conversation.id, content=result['query'], is_user=True))
+    ai_message = Message(conversation_id=conversation.id, content=result['generated'], is_user=False,
+                         sources=sources, renderer_version=RENDERER_VERSION)
+    db.session.add(ai_message)
+    if sources:
+        db.session.add(SearchHistory(conversation_id=conversation.id, query=result['query'], sources=sources))
+    db.session.commit()
+    RENDER_CACHE.put(render_key(result['generated']), result['response'])
+    return conversation.id
+
+@app.route('/api/deep_search/batch', methods=['POST'])
+def batch_deep_search():
+    """
+    Run many deep searches together and stream one NDJSON line per query as it
+    finishes, then a summary line with the batch's fetch statistics.
+    """
+    data = request.json or {}
+    queries = [q.strip() for q in data.get('queries', []) if isinstance(q, str) and q.strip()]
+    save = data.get('save', True)
+    
+    if not queries:
+        return jsonify({'error': 'At least one query is required'}), 400
+    if len(queries) > Config.BATCH_MAX_QUERIES:
+        return jsonify({'error': f'At most {Config.BATCH_MAX_QUERIES} queries per batch'}), 400
+    
+    def stream():
+        for result in run_batch(queries, llm, build_batch_prompt, format_ai_response, scraper_factory=WebScraper):
+            raw = {}
+            if 'sources' in result:
+                sources = result.pop('sources')
+                raw['sources'] = encode_sources(sources) if sources else None
+            generated = result.pop('generated', None)
+            if result['status'] == 'ok' and save:
+                try:
+                    result['conversation_id'] = save_batch_result(dict(result, generated=generated), raw.get('sources'))
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Error saving batch result for '{result['query']}': {str(e)}")
+            if result['status'] != 'done':
+                CHAT_REQUESTS.inc(mode='batch', status=result['status'])
+            yield dumps_with_raw(result, **raw) + b'\n'
+    
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+@app.route('/api/export', methods=['GET'])
+def export_data():
+    """
+    Stream every conversation with its messages, search history and memory as
+    NDJSON. With `since` (an ISO timestamp, e.g. a previous export's
+    `exported_at`) only what changed since then is included.
+    """
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({'error': 'since must be an ISO timestamp'}), 400
+    filename = f"export-{datetime.utcnow():%Y%m%dT%H%M%S}.ndjson"
+    return Response(
+        stream_with_context(export_lines(since or None)),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/api/import', methods=['POST'])
+def import_data():
+    """
+    Import an NDJSON export from the request body; `mode` is remap (new ids) or
+    restore (keep ids). The import is all or nothing unless `atomic=0`, which
+    commits every TRANSFER_BATCH_SIZE lines and keeps those before a failure.
+    """
+    mode = request.args.get('mode', 'remap')
+    if mode not in ('remap', 'restore'):
+        return jsonify({'error': 'mode must be remap or restore'}), 400
+    atomic = request.args.get('atomic', 1, type=int) != 0
+    try:
+        counts = import_lines(request.stream, mode, atomic=atomic)
+    except ImportFailed as e:
+        app.logger.error(f"Import failed: {e}")
+        return jsonify({'error': str(e), 'line': e.line, 'atomic': atomic, 'imported': e.counts}), 400
+    return jsonify({'imported': counts})
+
+@app.cli.command('export-data')
+@click.option('--since', type=click.DateTime(['%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d']),
+              help="Only export what changed since this time (UTC), e.g. a previous export's exported_at.")
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='File to write (default: stdout).')
+def export_data_command(since, output):
+    """Write all chat data as NDJSON."""
+    for line in export_lines(since):
+        output.write(line)
+
+@app.cli.command('import-data')
+@click.argument('source', type=click.File('rb'), default='-')
+@click.option('--mode', type=click.Choice(['remap', 'restore']), default='remap',
+              help='remap gives imported rows new ids; restore keeps them and replaces existing rows.')
+@click.option('--atomic/--batched', default=True,
+              help='Import all or nothing (default), or commit every TRANSFER_BATCH_SIZE lines.')
+def import_data_command(source, mode, atomic):
+    """Import an NDJSON export from a file (default: stdin)."""
+    ensure_schema()
+    try:
+        counts = import_lines(source, mode, atomic=atomic)
+    except ImportFailed as e:
+        kept = ', '.join(f"{count} {kind}" for kind, count in sorted(e.counts.items()))
+        raise click.ClickException(f"{e}" + (f" (kept: {kept})" if kept else ' (nothing imported)'))
+    click.echo(', '.join(f"{count} {kind}" for kind, count in sorted(counts.items())) or 'Nothing imported')
+
+@app.cli.command('retention')
+@click.option('--convert', is_flag=True, help='Switch the database to incremental vacuum first (full VACUUM; locks it while it runs).')
+@click.option('--report', 'report_only', is_flag=True, help='Only show the report of the last run.')
+def retention_command(convert, report_only):
+    """Apply the retention policy now and print what it reclaimed."""
+    task = RetentionTask(app)
+    if report_only:
+        click.echo(json.dumps(last_report(), indent=2))
+        return
+    if convert:
+        task.convert()
+    click.echo(json.dumps(task.run_once(), indent=2))
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
-    app.run(debug=True)
\ No newline at end of file
+        ensure_schema()
+    # Only in the reloader's serving process, not the file watcher
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_prefetcher()
+        start_retention(app)
+    app.run(debug=True)
\ No newline at end of file
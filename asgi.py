@@ -0,0 +1,175 @@
+"""
+ASGI entry point for serving the chat app from an ASGI server, e.g.:
+
+    uvicorn asgi:asgi_app --host 0.0.0.0 --port 5000
+
+Async views such as /api/chat are served natively: each request is a task on
+the server's event loop, so a chat holds no thread while it waits. Only its
+blocking steps take one, for as long as they run: the Selenium scrape on the
+DEEP_SEARCH_THREADS pool and the Gemini call on the LLM backend's executor.
+Every other route is a plain Flask view and goes through a2wsgi's WSGI bridge
+on ASGI_MAX_THREADS threads. benchmarks/load_chat.py compares this with the
+synchronous chat handler on a threaded WSGI server.
+
+The schema check and the background headline and retention tasks run on the
+server's lifespan startup event, not when this module is imported.
+"""
+import inspect
+import io
+import sys
+
+from a2wsgi import WSGIMiddleware
+from flask import request_started
+from werkzeug.exceptions import HTTPException
+
+from app import app
+from config import Config
+from headlines import start_prefetcher
+from models import ensure_schema
+from retention import start_retention
+
+
+def wsgi_to_asgi(wsgi_app):
+    """Wrap a WSGI app for an ASGI server, running requests on ASGI_MAX_THREADS threads."""
+    return WSGIMiddleware(wsgi_app, workers=Config.ASGI_MAX_THREADS)
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI HTTP request whose body has been read."""
+    host, port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': host,
+        'SERVER_PORT': str(port or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+        environ['REMOTE_PORT'] = str(scope['client'][1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f"HTTP_{name}"
+        value = value.decode('latin1')
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+class AsyncFlask:
+    """
+    ASGI app for a Flask app that awaits its coroutine views on the event loop
+    and bridges the rest. `on_startup` runs on the lifespan startup event.
+    """
+
+    def __init__(self, flask_app, on_startup=None):
+        self.app = flask_app
+        self.bridge = wsgi_to_asgi(flask_app)
+        self.on_startup = on_startup
+        self._urls = flask_app.url_map.bind('localhost')
+
+    def is_async(self, scope):
+        if scope['method'] == 'OPTIONS':
+            return False
+        try:
+            endpoint, _ = self._urls.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return False
+        return inspect.iscoroutinefunction(self.app.view_functions.get(endpoint))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and self.is_async(scope):
+            await self._serve(scope, receive, send)
+        else:
+            await self.bridge(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    if self.on_startup is not None:
+                        self.on_startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _serve(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        environ = build_environ(scope, bytes(body))
+        ctx = self.app.request_context(environ)
+        error = None
+        ctx.push()
+        try:
+            response = await self._dispatch(ctx.request)
+            status, headers = response.status_code, response.get_wsgi_headers(environ)
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in headers.items()],
+            })
+            chunks = response.get_app_iter(environ)
+            try:
+                for chunk in chunks:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            ctx.pop(error)
+
+    async def _dispatch(self, request):
+        # Flask.full_dispatch_request, awaiting the view rather than running it
+        # to completion on a thread of its own
+        app = self.app
+        try:
+            try:
+                request_started.send(app, _async_wrapper=app.ensure_sync)
+                rv = app.preprocess_request()
+                if rv is None:
+                    if request.routing_exception is not None:
+                        app.raise_routing_exception(request)
+                    rv = await app.view_functions[request.url_rule.endpoint](**request.view_args)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            return app.finalize_request(rv)
+        except Exception as e:
+            return app.handle_exception(e)
+
+
+def startup():
+    with app.app_context():
+        ensure_schema()
+    # Keep the general-news headline store warm in the background
+    start_prefetcher()
+    # Compact old source payloads in the background
+    start_retention(app)
+
+
+asgi_app = AsyncFlask(app, on_startup=startup)
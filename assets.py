@@ -0,0 +1,130 @@
+"""
+Fingerprinted, precompressed static assets.
+
+At startup `build_assets` copies every stylesheet and script under static/ to
+assets/ in the app's instance folder, never into the source tree, with a
+content hash in its name (css/styles.css becomes css/styles.1a2b3c4d5e6f.css).
+Next to each copy it writes a .gz version and, with Brotli installed, a .br
+version, both at maximum compression. The mapping is recorded in
+assets/manifest.json. Templates link assets through `asset_url`, so an edited
+file gets a new URL and nothing behind a URL ever changes. /static/dist/, the
+route serving the builds, can therefore be cached for a year as immutable. It
+answers with the precompressed file that best matches the client's
+Accept-Encoding.
+
+The build is skipped when the manifest is newer than every source file and
+all the files it names exist, so importing the app (CLI commands, benchmarks,
+each worker) normally reads the manifest and writes nothing. Files that
+already exist are not rewritten, so concurrent workers can build safely.
+Older builds stay behind for pages that still link them. If the build fails,
+`asset_url` falls back to the plain /static/ URLs.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from flask import request, send_from_directory
+
+from compression import choose_encoding
+
+ASSET_EXTENSIONS = ('.css', '.js', '.svg')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def _write(path, data, replace=False):
+    if os.path.exists(path) and not replace:
+        return
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _sources(static_dir, build_dir):
+    """(path, static path) of every asset under static_dir, in a stable order."""
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != build_dir)
+        for name in sorted(files):
+            if name.endswith(ASSET_EXTENSIONS):
+                source = os.path.join(root, name)
+                yield source, os.path.relpath(source, static_dir).replace(os.sep, '/')
+
+
+def current_manifest(static_dir, build_dir):
+    """The existing build's manifest if it is up to date with the sources, else None."""
+    manifest_path = os.path.join(build_dir, 'manifest.json')
+    try:
+        built_at = os.path.getmtime(manifest_path)
+        with open(manifest_path, 'rb') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for source, path in _sources(static_dir, build_dir):
+        if path not in manifest or os.path.getmtime(source) > built_at:
+            return None
+    if not all(os.path.isfile(os.path.join(build_dir, built)) for built in manifest.values()):
+        return None
+    return manifest
+
+
+def build_assets(static_dir, build_dir):
+    """Fingerprint and precompress the assets; returns the manifest {static path: built path}."""
+    manifest = {}
+    for source, path in _sources(static_dir, build_dir):
+        with open(source, 'rb') as f:
+            data = f.read()
+        stem, extension = os.path.splitext(path)
+        built = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+        target = os.path.join(build_dir, built)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _write(target, data)
+        _write(target + SUFFIXES['gzip'], gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            _write(target + SUFFIXES['br'], brotli.compress(data, quality=11))
+        manifest[path] = built
+    os.makedirs(build_dir, exist_ok=True)
+    _write(os.path.join(build_dir, 'manifest.json'), json.dumps(manifest, indent=2).encode(), replace=True)
+    return manifest
+
+
+def serve_asset(build_dir, filename):
+    """A built asset, precompressed if the client accepts it, cached as immutable."""
+    mimetype = mimetypes.guess_type(filename)[0]
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is not None and os.path.isfile(os.path.join(build_dir, filename + SUFFIXES[encoding])):
+        response = send_from_directory(build_dir, filename + SUFFIXES[encoding], mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(build_dir, filename, mimetype=mimetype)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_assets(app):
+    """Build the assets if needed, register `asset_url` for templates and the route serving the builds."""
+    build_dir = os.path.join(app.instance_path, 'assets')
+    try:
+        manifest = current_manifest(app.static_folder, build_dir) or build_assets(app.static_folder, build_dir)
+    except OSError as e:
+        app.logger.warning(f"Could not build static assets, serving them unversioned: {e}")
+        manifest = {}
+
+    def asset_url(path):
+        built = manifest.get(path)
+        return f"{app.static_url_path}/dist/{built}" if built else f"{app.static_url_path}/{path}"
+
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.add_url_rule(
+        f"{app.static_url_path}/dist/<path:filename>", 'asset',
+        lambda filename: serve_asset(build_dir, filename)
+    )
+    return manifest
@@ -0,0 +1,113 @@
+"""
+Batch deep search: many related queries planned and run together.
+
+`run_batch` deduplicates the queries, then scrapes them one after another on
+a single WebScraper, so they share one browser session and its article cache
+and every URL is fetched at most once per batch. As soon as a query's sources
+are in, its generation is handed to a pool of BATCH_LLM_CONCURRENCY workers,
+so Gemini calls for earlier queries overlap scraping of later ones. Results
+are yielded as each query finishes, followed by a summary record.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from scraper import WebScraper, is_general_news_query
+
+
+class PlannedQuery:
+    __slots__ = ('query', 'indices')
+
+    def __init__(self, query, index):
+        self.query = query
+        self.indices = [index]
+
+
+def plan_queries(queries):
+    """
+    Collapse duplicate queries (case and spacing insensitive) and put general
+    headline queries first, so the direct-source listings they share are
+    scraped once and reused.
+    """
+    planned = {}
+    for index, query in enumerate(queries):
+        key = ' '.join(query.lower().split())
+        if key in planned:
+            planned[key].indices.append(index)
+        else:
+            planned[key] = PlannedQuery(query, index)
+    return sorted(planned.values(), key=lambda p: (not is_general_news_query(p.query), p.indices[0]))
+
+
+def run_batch(queries, llm, build_prompt, format_response, scraper_factory=WebScraper, concurrency=None):
+    """
+    Yield one result dict per distinct query as it completes, then a summary.
+
+    `build_prompt(query, sources)` turns scraped sources (possibly empty) into
+    a prompt and `format_response(text)` formats the LLM output. Results keep
+    the unformatted output as `generated`.
+    """
+    started = time.perf_counter()
+    plan = plan_queries(queries)
+    finished = queue.Queue()
+    cancelled = threading.Event()
+    stats = {}
+    pool = ThreadPoolExecutor(max_workers=concurrency or Config.BATCH_LLM_CONCURRENCY, thread_name_prefix='batch-llm')
+
+    def result(entry, query_started, **fields):
+        fields.update({
+            'query': entry.query,
+            'indices': entry.indices,
+            'elapsed_ms': round((time.perf_counter() - query_started) * 1000, 1),
+        })
+        return fields
+
+    def generate(entry, sources, query_started):
+        try:
+            if cancelled.is_set():
+                return
+            generated = llm.generate(build_prompt(entry.query, sources))
+            finished.put(result(entry, query_started, status='ok', response=format_response(generated),
+                                generated=generated, sources=sources))
+        except Exception as e:
+            finished.put(result(entry, query_started, status='error', error=str(e)))
+
+    def scrape_all():
+        pending = list(plan)
+        try:
+            with scraper_factory() as scraper:
+                while pending and not cancelled.is_set():
+                    entry = pending.pop(0)
+                    query_started = time.perf_counter()
+                    try:
+                        sources = scraper.scrape_news(entry.query)
+                    except Exception as e:
+                        finished.put(result(entry, query_started, status='error', error=str(e)))
+                        continue
+                    pool.submit(generate, entry, sources, query_started)
+                stats.update(scraper.fetch_stats)
+        except Exception as e:
+            # The shared scraper itself failed: report every query it never reached
+            for entry in pending:
+                finished.put(result(entry, time.perf_counter(), status='error', error=str(e)))
+
+    scraping = threading.Thread(target=scrape_all, name='batch-scrape', daemon=True)
+    scraping.start()
+    try:
+        for _ in plan:
+            yield finished.get()
+        scraping.join()
+        yield {
+            'status': 'done',
+            'queries': len(queries),
+            'distinct_queries': len(plan),
+            'urls_fetched': stats.get('fetched', 0),
+            'url_cache_hits': stats.get('cache_hits', 0),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+    finally:
+        # If the client went away, stop scraping and skip pending generations
+        cancelled.set()
+        pool.shutdown(wait=False)
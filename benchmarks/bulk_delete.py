@@ -0,0 +1,99 @@
+"""
+Conversation delete benchmark on conversations with thousands of messages.
+
+Seeds --conversations conversations of --messages messages each (every tenth
+with a search-history row), then deletes them in two ways:
+
+    orm       the previous path: each conversation loaded and deleted through
+              the session, its messages loaded by the relationship cascade
+              and deleted one statement per row
+    cascade   delete_conversations: one DELETE of the conversations, with
+              messages, search history and memory removed by ON DELETE CASCADE
+
+For each it reports the time, peak traced memory and the child rows left
+behind.
+
+    python benchmarks/bulk_delete.py --conversations 5 --messages 5000
+"""
+import argparse
+import time
+import tracemalloc
+
+import harness  # noqa: F401  (points the app at a throwaway database)
+
+import app as app_module
+from models import db, ensure_schema, Conversation, ConversationMemory, Message, SearchHistory
+
+SOURCES = '[{"title": "t", "link": "https://example.com", "source": "Example", "time": "", "content": "' + 'x' * 2000 + '"}]'
+
+
+def seed(conversations, messages):
+    ids = []
+    for c in range(conversations):
+        conversation = Conversation(title=f"benchmark {c}", is_deep_search=True)
+        db.session.add(conversation)
+        db.session.flush()
+        ids.append(conversation.id)
+        db.session.execute(db.insert(Message), [
+            dict(conversation_id=conversation.id, content=f"message {i} " + 'text ' * 60, is_user=i % 2 == 0,
+                 sources=SOURCES if i % 10 == 1 else None)
+            for i in range(messages)
+        ])
+        db.session.execute(db.insert(SearchHistory), [
+            dict(conversation_id=conversation.id, query=f"query {i}", sources=SOURCES) for i in range(0, messages, 10)
+        ])
+        db.session.add(ConversationMemory(conversation_id=conversation.id, summary='summary'))
+    db.session.commit()
+    return ids
+
+
+def orm_delete(ids):
+    for conversation_id in ids:
+        conversation = db.session.get(Conversation, conversation_id)
+        # What cascade='all, delete-orphan' without passive_deletes did: load
+        # the children and delete them row by row before the conversation
+        for message in conversation.messages:
+            db.session.delete(message)
+        if conversation.memory is not None:
+            db.session.delete(conversation.memory)
+        db.session.flush()
+        db.session.expire(conversation, ['messages', 'memory'])
+        db.session.delete(conversation)
+    db.session.commit()
+
+
+def cascade_delete(ids):
+    app_module.delete_conversations(ids)
+
+
+def leftovers(ids):
+    return sum(
+        db.session.query(model).filter(model.conversation_id.in_(ids)).count()
+        for model in (Message, SearchHistory, ConversationMemory)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=5)
+    parser.add_argument('--messages', type=int, default=5000)
+    args = parser.parse_args()
+
+    with app_module.app.app_context():
+        ensure_schema()
+        print(f"{args.conversations} conversations x {args.messages} messages")
+        print(f"{'method':>8}{'ms':>10}{'peak KiB':>10}{'left':>6}")
+        for name, delete in (('orm', orm_delete), ('cascade', cascade_delete)):
+            ids = seed(args.conversations, args.messages)
+            db.session.expunge_all()
+            tracemalloc.start()
+            start = time.perf_counter()
+            delete(ids)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:>8}{elapsed * 1000:>10.1f}{peak / 1024:>10.0f}{leftovers(ids):>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+/api/chat throughput benchmark on the stub LLM backend.
+
+Sweeps concurrency levels for basic chat and deep search and reports
+throughput, latency percentiles and our own overhead per request (latency
+minus the time the stub backends spend "waiting on the network"), which is
+what scraping glue, prompt building, formatting and the DB cost us.
+
+    python benchmarks/chat_throughput.py --concurrency 1 4 16 64 --rounds 3
+"""
+import argparse
+import asyncio
+import time
+
+from harness import StubScraper, asgi_post, percentile
+
+import app as app_module
+from asgi import AsyncFlask
+from llm import StubBackend
+from models import db
+
+
+async def timed_post(asgi_app, payload):
+    start = time.perf_counter()
+    status, _ = await asgi_post(asgi_app, '/api/chat', payload)
+    return status, time.perf_counter() - start
+
+
+async def run_level(asgi_app, deep_search, concurrency, rounds):
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    for r in range(rounds):
+        results = await asyncio.gather(*(
+            timed_post(asgi_app, {'message': f"benchmark query {r}-{i}", 'deep_search': deep_search})
+            for i in range(concurrency)
+        ))
+        for status, latency in results:
+            latencies.append(latency)
+            failures += status != 200
+    return time.perf_counter() - start, latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--scrape-latency', type=float, default=0.5)
+    parser.add_argument('--model-latency', type=float, default=0.2)
+    parser.add_argument('--tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--output-tokens', type=int, default=300)
+    args = parser.parse_args()
+
+    StubScraper.latency = args.scrape_latency
+    app_module.WebScraper = StubScraper
+    app_module.llm = StubBackend(
+        latency=args.model_latency,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        max_concurrency=max(args.concurrency)
+    )
+    model_time = args.model_latency + args.output_tokens / args.tokens_per_second
+
+    flask_app = app_module.app
+    with flask_app.app_context():
+        db.create_all()
+    asgi_app = AsyncFlask(flask_app)
+
+    print(f"{'mode':<8} {'conc':>5} {'chats/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'overhead ms':>12} {'fail':>5}")
+    for deep_search in (False, True):
+        backend_time = model_time + (args.scrape_latency if deep_search else 0)
+        for concurrency in args.concurrency:
+            elapsed, latencies, failures = asyncio.run(run_level(asgi_app, deep_search, concurrency, args.rounds))
+            p50 = percentile(latencies, 50)
+            print(
+                f"{'deep' if deep_search else 'basic':<8} {concurrency:>5} {len(latencies) / elapsed:>9.2f} "
+                f"{p50 * 1000:>9.1f} {percentile(latencies, 95) * 1000:>9.1f} "
+                f"{(p50 - backend_time) * 1000:>12.1f} {failures:>5}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Shared plumbing for the benchmark scripts.
+
+Importing this module points the app at a throwaway SQLite database and the
+stub LLM backend, with headline prefetching off (unless the environment
+already says otherwise), so it must be imported before `app`.
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+os.environ.setdefault('LLM_BACKEND', 'stub')
+os.environ.setdefault('HEADLINE_PREFETCH_ENABLED', 'false')
+
+
+class StubScraper:
+    """Stands in for WebScraper: sleeps like network I/O and returns canned articles."""
+    latency = 0.5
+    results = 5
+
+    def __init__(self):
+        self.fetch_stats = {'fetched': 0, 'cache_hits': 0, 'revalidated': 0, 'bytes_saved': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def scrape_news(self, query, cancel=None):
+        time.sleep(self.latency)
+        return [{
+            'title': f"{query} - article {i}",
+            'link': f"https://example.com/{i}",
+            'source': 'Example News',
+            'time': '1 hour ago',
+            'content': f"Body text about {query}. " * 50
+        } for i in range(self.results)]
+
+
+async def asgi_request(asgi_app, method, path, payload=None, headers=None):
+    """Send one request through an ASGI app in-process and return (status, headers, body)."""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    path, _, query_string = path.partition('?')
+    request_headers = [(b'content-length', str(len(body)).encode())]
+    if payload is not None:
+        request_headers.append((b'content-type', b'application/json'))
+    for name, value in (headers or {}).items():
+        request_headers.append((name.lower().encode('latin1'), value.encode('latin1')))
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string.encode(),
+        'root_path': '',
+        'headers': request_headers,
+        'client': ('127.0.0.1', 0),
+        'server': ('127.0.0.1', 80),
+    }
+    received = False
+    status = None
+    response_headers = {}
+    chunks = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await asyncio.sleep(3600)
+
+    async def send(event):
+        nonlocal status
+        if event['type'] == 'http.response.start':
+            status = event['status']
+            response_headers.update((k.decode('latin1'), v.decode('latin1')) for k, v in event['headers'])
+        elif event['type'] == 'http.response.body':
+            chunks.append(event.get('body', b''))
+
+    await asgi_app(scope, receive, send)
+    return status, response_headers, b''.join(chunks)
+
+
+async def asgi_post(asgi_app, path, payload):
+    """Send one JSON POST through an ASGI app and return (status, body)."""
+    status, _, body = await asgi_request(asgi_app, 'POST', path, payload)
+    return status, body
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,105 @@
+"""
+Concurrent-chat load test for deep-search chats with stubbed scraper and model backends.
+
+Sends the same batch of chats, all in flight together, to:
+
+* baseline - the synchronous handler /api/chat had before it became async
+  (scrape, then generate, on the request thread), served by a threaded WSGI
+  server with --threads threads, like werkzeug threaded=True or gunicorn gthread.
+* asgi     - /api/chat served natively by asgi.py. The chat awaits on the
+  event loop; the scrape runs on DEEP_SEARCH_THREADS threads and the model
+  call on the backend's executor, both set to --threads here.
+
+The stubs sleep instead of doing network I/O. The baseline holds a thread for
+the whole chat; the async path only while each blocking step runs, so with
+the same number of threads it overlaps scraping with generation.
+
+    python benchmarks/load_chat.py --requests 200 --threads 16 --scrape-latency 0.5 --model-latency 0.3
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from harness import StubScraper, asgi_post
+
+from flask import jsonify, request
+
+import app as app_module
+from asgi import AsyncFlask
+from llm import StubBackend
+from models import db, Conversation, Message
+from records import encode_sources
+from renderer import format_ai_response
+
+
+def baseline_chat():
+    """The pre-async /api/chat for a new deep-search conversation, without its prompt-template noise."""
+    message = request.json['message'].strip()
+    conversation = Conversation(title=message[:50], is_deep_search=True)
+    db.session.add(conversation)
+    db.session.commit()
+    db.session.add(Message(conversation_id=conversation.id, content=message, is_user=True))
+    scraped_data = app_module.WebScraper().scrape_news(message)
+    generated = app_module.llm.generate(app_module.build_deep_search_prompt(message, scraped_data))
+    response_text = format_ai_response(generated)
+    db.session.add(Message(conversation_id=conversation.id, content=generated, is_user=False,
+                           sources=encode_sources(scraped_data).decode()))
+    conversation.updated_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify({'response': response_text, 'conversation_id': conversation.id})
+
+
+def chat_payload(i):
+    return {'message': f"load test query {i}", 'deep_search': True}
+
+
+def run_baseline(flask_app, n, threads):
+    def post(i):
+        return flask_app.test_client().post('/bench/baseline_chat', json=chat_payload(i)).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(post, range(n)))
+    return time.perf_counter() - start, sum(1 for status in statuses if status != 200)
+
+
+async def run_asgi(asgi_app, n):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(asgi_post(asgi_app, '/api/chat', chat_payload(i)) for i in range(n)))
+    failures = sum(1 for status, _ in results if status != 200)
+    return time.perf_counter() - start, failures
+
+
+def report(label, n, elapsed, failures):
+    print(f"{label:<10} {n:>5} chats  {elapsed:8.2f}s  {n / elapsed:8.2f} chats/s  failures={failures}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--scrape-latency', type=float, default=0.5)
+    parser.add_argument('--model-latency', type=float, default=0.3)
+    args = parser.parse_args()
+
+    StubScraper.latency = args.scrape_latency
+    app_module.WebScraper = StubScraper
+    app_module.llm = StubBackend(latency=args.model_latency, output_tokens=0, max_concurrency=args.threads)
+    app_module.DEEP_SEARCH_POOL = ThreadPoolExecutor(max_workers=args.threads, thread_name_prefix='deep-search')
+
+    flask_app = app_module.app
+    flask_app.add_url_rule('/bench/baseline_chat', 'baseline_chat', baseline_chat, methods=['POST'])
+    with flask_app.app_context():
+        db.create_all()
+
+    print(f"{args.threads} threads per serving path")
+    elapsed, failures = run_baseline(flask_app, args.requests, args.threads)
+    report('baseline', args.requests, elapsed, failures)
+    elapsed, failures = asyncio.run(run_asgi(AsyncFlask(flask_app), args.requests))
+    report('asgi', args.requests, elapsed, failures)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Bytes on the wire for loading the chat page and a deep-search conversation.
+
+Runs a few deep-search chats on the stub scraper and LLM, then requests the
+page, its stylesheet and scripts, and the conversation (?tail=1) three ways:
+
+    plain         no Accept-Encoding and no cache: what every load cost before
+    compressed    Accept-Encoding: gzip, br; assets precompressed and hashed
+    revisit       the same with a warm browser cache: immutable assets are not
+                  requested at all and the conversation revalidates to a 304
+
+For each it reports the bytes transferred and an estimated load time on a
+slow link (--kbps, --rtt-ms; one round trip per request, requests in
+sequence).
+
+    python benchmarks/page_weight.py --chats 4 --kbps 400 --rtt-ms 400
+"""
+import argparse
+import re
+
+from harness import StubScraper
+
+import app as app_module
+from models import ensure_schema
+
+
+def load(client, conversation_id, encoding, cache):
+    """Bytes and requests for one page load; `cache` holds what the browser kept from earlier loads."""
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    transferred = len(client.get('/', headers=headers).data)
+    requests = 1
+    # Asset URLs do not depend on the encoding
+    html = client.get('/').get_data(as_text=True)
+    for url in re.findall(r'(?:href|src)="(/static/[^"]+)"', html):
+        if 'immutable' in cache.get(url, ''):
+            continue
+        response = client.get(url, headers=headers)
+        transferred += len(response.data)
+        requests += 1
+        cache[url] = response.headers.get('Cache-Control', '')
+    url = f"/api/conversation/{conversation_id}?tail=1"
+    conditional = dict(headers, **({'If-None-Match': cache[url]} if url in cache else {}))
+    response = client.get(url, headers=conditional)
+    transferred += len(response.data)
+    requests += 1
+    cache[url] = response.headers.get('ETag')
+    return transferred, requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=4)
+    parser.add_argument('--kbps', type=float, default=400)
+    parser.add_argument('--rtt-ms', type=float, default=400)
+    args = parser.parse_args()
+
+    StubScraper.latency = 0
+    app_module.WebScraper = StubScraper
+    with app_module.app.app_context():
+        ensure_schema()
+    client = app_module.app.test_client()
+    conversation_id = None
+    for i in range(args.chats):
+        result = client.post('/api/chat', json={
+            'message': f"budget session {i}", 'deep_search': True, 'conversation_id': conversation_id
+        }).get_json()
+        conversation_id = result['conversation_id']
+
+    print(f"{args.chats} deep-search chats, {args.kbps:.0f} kbps, {args.rtt_ms:.0f} ms RTT")
+    print(f"{'load':>11}{'requests':>10}{'KiB':>9}{'est. s':>9}")
+    cache = {}
+    loads = (
+        ('plain', load(client, conversation_id, None, {})),
+        ('compressed', load(client, conversation_id, 'gzip, br', cache)),
+        ('revisit', load(client, conversation_id, 'gzip, br', cache)),
+    )
+    for name, (transferred, requests) in loads:
+        seconds = requests * args.rtt_ms / 1000 + transferred * 8 / (args.kbps * 1000)
+        print(f"{name:>11}{requests:>10}{transferred / 1024:>9.1f}{seconds:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Memory and allocation benchmark for the results of a 20-source deep search.
+
+Compares the old handling of scraped results with the current one, using the
+same 20 synthetic articles (--content-chars each):
+
+    dicts     plain result dicts, copied into per-source preview dicts for the
+              prompt, json.dumps-ed for SearchHistory and again for Message,
+              and re-encoded inside the jsonify response
+    records   SourceResult records, prompt built straight from them, sources
+              encoded once (orjson) and spliced into the response
+
+Both store and return every article's full content, so the byte counts
+compare like for like.
+
+For each it reports the peak traced memory, the bytes stored in the two
+rows and returned, and the median time. A final line runs one real deep-search /api/chat request (on the stub
+scraper and LLM) under tracemalloc.
+
+    python benchmarks/result_memory.py --sources 20 --repeat 50
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+
+from harness import StubScraper
+
+import app as app_module
+from records import SourceResult, encode_sources, dumps_with_raw
+
+
+def make_results(count, content_chars):
+    body = ("The committee reviewed the proposal in detail and published its findings. " * 200)[:content_chars]
+    return [dict(
+        title=f"Article {i} about the budget session",
+        link=f"https://example.com/news/{i}",
+        source='Example News',
+        time='2 hours ago',
+        content=f"{i} {body}",
+    ) for i in range(count)]
+
+
+def dict_pipeline(results):
+    # The pre-record implementation, kept here as the baseline
+    enriched_sources = []
+    for i, item in enumerate(results):
+        enriched_sources.append({
+            "number": i + 1,
+            "title": item['title'],
+            "source": item['source'],
+            "time": item['time'],
+            "content_preview": item['content'][:3000] if len(item['content']) > 3000 else item['content']
+        })
+    prompt = "\n\n".join(
+        f"Source {src['number']}:\nTitle: {src['title']}\nPublisher: {src['source']}\nDate: {src['time']}\nContent: {src['content_preview']}..."
+        for src in enriched_sources
+    )
+    history_sources = json.dumps(results)
+    message_sources = json.dumps(results)
+    response = json.dumps({'response': 'ok', 'conversation_id': 1, 'sources': results}).encode()
+    return prompt, history_sources, message_sources, response
+
+
+def record_pipeline(results):
+    prompt = app_module.build_deep_search_prompt('budget session', results)
+    sources_json = encode_sources(results)
+    sources_text = sources_json.decode()
+    response = dumps_with_raw({'response': 'ok', 'conversation_id': 1}, sources=sources_json)
+    return prompt, sources_text, sources_text, response
+
+
+def measure(pipeline, results, repeat):
+    pipeline(results)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    output = pipeline(results)
+    peak = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    del output
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = pipeline(results)
+        timings.append(time.perf_counter() - start)
+    stored = len(output[1]) + len(output[2])
+    return peak, stored, len(output[3]), statistics.median(timings)
+
+
+class RecordScraper(StubScraper):
+    latency = 0
+
+    def scrape_news(self, query):
+        return [SourceResult(**item) for item in make_results(self.results, self.content_chars)]
+
+
+def end_to_end(count, content_chars):
+    RecordScraper.results = count
+    RecordScraper.content_chars = content_chars
+    app_module.WebScraper = RecordScraper
+    with app_module.app.app_context():
+        app_module.db.create_all()
+    client = app_module.app.test_client()
+    client.post('/api/chat', json={'message': 'warm up', 'deep_search': True})
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.post('/api/chat', json={'message': 'budget session', 'deep_search': True})
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return response.status_code, peak, len(response.data), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', type=int, default=20)
+    parser.add_argument('--content-chars', type=int, default=12000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    dicts = make_results(args.sources, args.content_chars)
+    records = [SourceResult(**item) for item in dicts]
+    print(f"{args.sources} sources, {args.content_chars} content chars each")
+    print(f"{'pipeline':>8}{'peak KiB':>10}{'stored KiB':>12}{'response KiB':>14}{'median ms':>11}")
+    for name, pipeline, results in (('dicts', dict_pipeline, dicts), ('records', record_pipeline, records)):
+        peak, stored, response, median = measure(pipeline, results, args.repeat)
+        print(f"{name:>8}{peak / 1024:>10.0f}{stored / 1024:>12.0f}{response / 1024:>14.0f}{median * 1000:>11.2f}")
+
+    status, peak, size, elapsed = end_to_end(args.sources, args.content_chars)
+    print(f"/api/chat deep search: status {status}, peak {peak / 1024:.0f} KiB, "
+          f"response {size / 1024:.0f} KiB, {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Offline scraper benchmark against a replay archive.
+
+Runs `WebScraper.scrape_news` through the local replay server (see replay.py)
+and reports the self time of every tracing span (see metrics.py), per source
+and per stage, averaged over the runs, along with why each run stopped and
+which phases the early-exit policy skipped:
+
+    driver_init      Chrome + chromedriver startup
+    page_load        driver.get on a listing, search or article page
+    page_wait        fixed post-load waits (scaled by --wait-scale)
+    http_fetch       requests-based article downloads
+    content_fetch    parsing article bodies
+    source_scrape    walking result elements on listing/search pages
+    ranking          final ordering of the collected results
+
+Requests that hit no recording are counted as misses rather than going to the
+live web. If the archive is empty it is synthesized for the given queries.
+
+    python benchmarks/scraper_bench.py --archive fixtures/replay --query "python decorators" --repeat 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import start_trace
+from replay import ReplayArchive, ReplayServer, synthesize_archive
+from scraper import WebScraper
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--archive', default=None, help="Replay archive directory (synthesized if empty)")
+    parser.add_argument('--query', action='append', dest='queries')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--wait-scale', type=float, default=1.0,
+                        help="Scale for the fixed page-load sleeps; 0 measures pure scraping overhead")
+    args = parser.parse_args()
+    queries = args.queries or ["python decorators", "latest news india"]
+
+    archive = ReplayArchive(args.archive or tempfile.mkdtemp(prefix='replay-'))
+    if not len(archive):
+        synthesize_archive(archive, queries)
+        print(f"Synthesized {len(archive)} pages into {archive.path}")
+
+    with ReplayServer(archive) as server:
+        for query in queries:
+            trace = start_trace()
+            runs = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                scraper = WebScraper(url_rewriter=server.rewrite, seed=args.seed, wait_scale=args.wait_scale,
+                                     headline_store=None, article_cache=None, limiter=None)
+                results = scraper.scrape_news(query)
+                runs.append((time.perf_counter() - start, len(results), scraper.last_report or {}))
+
+            print(f"\nQuery: {query!r}  ({args.repeat} runs, wait scale {args.wait_scale})")
+            for i, (elapsed, count, report) in enumerate(runs, 1):
+                skipped = ', '.join(report.get('phases_skipped', [])) or 'none'
+                print(f"  run {i}: {elapsed:8.2f}s  {count} results  "
+                      f"stopped: {report.get('stop_reason')}  skipped: {skipped}")
+
+            stages = sorted({stage for _, stage in trace.self_times})
+            by_source = defaultdict(dict)
+            for (source, stage), ms in trace.self_times.items():
+                by_source[source or '(pipeline)'][stage] = ms / 1000 / args.repeat
+            print(f"  {'source':<34}" + ''.join(f"{stage:>16}" for stage in stages) + f"{'total':>10}")
+            for source, row in sorted(by_source.items(), key=lambda item: -sum(item[1].values())):
+                print(f"  {source:<34}" + ''.join(f"{row.get(stage, 0):>16.3f}" for stage in stages)
+                      + f"{sum(row.values()):>10.3f}")
+
+        if server.misses:
+            print(f"\n{len(server.misses)} requests had no recording (re-record the archive)")
+
+
+if __name__ == '__main__':
+    main()
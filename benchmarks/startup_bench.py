@@ -0,0 +1,86 @@
+"""
+Cold-start benchmark: import time of the app and latency of the first plain chat.
+
+Each run starts a fresh interpreter that imports `app` (with the default
+Gemini backend configured, but never called) and then serves one basic
+/api/chat request through the Flask test client on the stub backend. It
+reports the median import time, the median time from interpreter start to the
+first response, and which heavy optional dependencies had been imported by
+then; selenium, webdriver_manager, requests, bs4, numpy and
+google.generativeai should only load once a deep search or a Gemini call
+actually needs them.
+
+    python benchmarks/startup_bench.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from harness import ROOT
+
+HEAVY_MODULES = (
+    'selenium.webdriver', 'webdriver_manager.chrome', 'requests', 'bs4', 'numpy', 'google.generativeai'
+)
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+heavy_after_import = [m for m in HEAVY if m in sys.modules]
+
+from llm import StubBackend
+app_module.llm = StubBackend(latency=0, tokens_per_second=1e9, output_tokens=300)
+with app_module.app.app_context():
+    app_module.db.create_all()
+client = app_module.app.test_client()
+response = client.post('/api/chat', json={'message': 'hello'})
+done = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'import_s': imported - start,
+    'first_chat_s': done - start,
+    'heavy_after_import': heavy_after_import,
+    'heavy_after_chat': [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+
+def run_once():
+    workdir = tempfile.mkdtemp(prefix='startup-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'chat.db')}",
+        SHARED_STORE_PATH=os.path.join(workdir, 'shared.db'),
+        HEADLINE_STORE_DIR=os.path.join(workdir, 'headlines'),
+        LLM_BACKEND='gemini',
+        GEMINI_API_KEY=os.environ.get('GEMINI_API_KEY', 'unused'),
+        HEADLINE_PREFETCH_ENABLED='false',
+    )
+    code = f"HEAVY = {HEAVY_MODULES!r}\n{CHILD}"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    if any(r['status'] != 200 for r in runs):
+        print("Warning: some first chats did not return 200")
+    print(f"runs: {args.runs}")
+    print(f"import app:         {statistics.median(r['import_s'] for r in runs) * 1000:8.1f} ms (median)")
+    print(f"first plain chat:   {statistics.median(r['first_chat_s'] for r in runs) * 1000:8.1f} ms (median, from start)")
+    print(f"heavy modules after import: {', '.join(runs[-1]['heavy_after_import']) or 'none'}")
+    print(f"heavy modules after chat:   {', '.join(runs[-1]['heavy_after_chat']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Throughput scaling of the pre-forked gunicorn deployment across worker counts.
+
+For each worker count this starts `gunicorn -c gunicorn.conf.py wsgi:application`
+on a throwaway database with the stub LLM backend and headline prefetching off,
+drives basic /api/chat requests at a fixed concurrency over real HTTP, and
+reports throughput and latency. With the default zero-latency stub the
+requests are CPU-bound (routing, DB writes, memory lookups, response
+formatting), which is the part extra workers scale; raise --model-latency to
+see how threads alone absorb I/O waits.
+
+Compare the throughput column against `nproc`: scaling should be close to
+linear up to the number of cores and flat beyond it.
+
+    python benchmarks/worker_scaling.py --workers 1 2 4 8 --concurrency 32 --requests 400
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import ROOT, percentile
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def post_chat(port, i):
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        conn.request('POST', '/api/chat', json.dumps({'message': f"scaling query {i}"}),
+                     {'Content-Type': 'application/json'})
+        status = conn.getresponse().status
+    except OSError:
+        status = 0
+    finally:
+        conn.close()
+    return status, time.perf_counter() - start
+
+
+def wait_ready(port, proc, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/conversations')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn did not start in time")
+
+
+def run(workers, args):
+    port = free_port()
+    workdir = tempfile.mkdtemp(prefix='scaling-')
+    env = dict(
+        os.environ,
+        WORKERS=str(workers),
+        WORKER_THREADS=str(args.threads),
+        BIND=f"127.0.0.1:{port}",
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'chat.db')}",
+        SHARED_STORE_PATH=os.path.join(workdir, 'shared.db'),
+        LLM_BACKEND='stub',
+        LLM_STUB_LATENCY=str(args.model_latency),
+        LLM_STUB_TOKENS_PER_SECOND='1000000',
+        LLM_MAX_CONCURRENCY=str(args.concurrency),
+        HEADLINE_PREFETCH_ENABLED='false',
+        # No browser is started for basic chat; skip resolving one at startup
+        CHROME_DRIVER_PATH=os.environ.get('CHROME_DRIVER_PATH') or 'chromedriver',
+    )
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_ready(port, proc)
+        # Warm every worker before measuring
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(lambda i: post_chat(port, i), range(workers * 4)))
+            start = time.perf_counter()
+            results = list(pool.map(lambda i: post_chat(port, i), range(args.requests)))
+            elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait(30)
+    latencies = [latency for _, latency in results]
+    failures = sum(status != 200 for status, _ in results)
+    return args.requests / elapsed, percentile(latencies, 50), percentile(latencies, 95), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--model-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.threads} threads per worker, concurrency {args.concurrency}")
+    print(f"{'workers':>8}{'chats/s':>10}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}{'failed':>8}")
+    baseline = None
+    for workers in args.workers:
+        throughput, p50, p95, failures = run(workers, args)
+        baseline = baseline or throughput
+        print(f"{workers:>8}{throughput:>10.1f}{throughput / baseline:>8.2f}x{p50 * 1000:>9.0f}{p95 * 1000:>9.0f}{failures:>8}")
+
+
+if __name__ == '__main__':
+    main()
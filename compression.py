@@ -0,0 +1,69 @@
+"""
+Compression of dynamic responses.
+
+`init_compression` registers an after_request hook. It encodes compressible
+responses of at least COMPRESS_MIN_BYTES with Brotli (when installed) or
+gzip, whichever the client's Accept-Encoding prefers. Conversation payloads
+with their source lists and rendered HTML shrink several-fold this way.
+Streamed responses (the NDJSON batch and export endpoints) are sent as they
+are, so they keep flushing line by line. So are files, including the
+precompressed assets served by assets.py. Strong ETags are made weak
+because the bytes on the wire now depend on the encoding.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from flask import request
+
+from config import Config
+from metrics import RESPONSE_BYTES
+
+COMPRESSIBLE = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' or None for a request's parsed Accept-Encoding; Brotli wins ties."""
+    candidates = [('gzip', accept_encodings['gzip'])]
+    if brotli is not None:
+        candidates.insert(0, ('br', accept_encodings['br']))
+    encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+    return encoding if quality > 0 else None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=Config.COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, Config.COMPRESS_GZIP_LEVEL)
+
+
+def init_compression(app):
+    if not Config.COMPRESS_ENABLED:
+        return
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or not (response.mimetype or '').startswith(COMPRESSIBLE)):
+            return response
+        response.vary.add('Accept-Encoding')
+        data = response.get_data()
+        if len(data) < Config.COMPRESS_MIN_BYTES:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        body = compress(data, encoding)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        RESPONSE_BYTES.inc(len(body), encoding=encoding, kind='sent')
+        RESPONSE_BYTES.inc(len(data) - len(body), encoding=encoding, kind='saved')
+        return response
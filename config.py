@@ -3,13 +3,130 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# The app's root; its instance/ folder is Flask's app.instance_path
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
 class Config:
     # Gemini API
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
+    
+    # LLM backend: 'gemini' or 'stub' (deterministic local model for benchmarks)
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+    LLM_RETRY_BACKOFF = float(os.getenv('LLM_RETRY_BACKOFF', 0.5))
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))  # Per worker process; the host allows WORKERS times this
+    LLM_RATE_LIMIT_PER_MINUTE = float(os.getenv('LLM_RATE_LIMIT_PER_MINUTE', 0))  # Shared by all workers; 0 = off
+    LLM_STUB_LATENCY = float(os.getenv('LLM_STUB_LATENCY', 0.2))
+    LLM_STUB_TOKENS_PER_SECOND = float(os.getenv('LLM_STUB_TOKENS_PER_SECOND', 200))
+    LLM_STUB_OUTPUT_TOKENS = int(os.getenv('LLM_STUB_OUTPUT_TOKENS', 300))
     
     # Database
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///chat.db'
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///chat.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Several worker processes may write to one SQLite file: wait for locks instead of failing
+    SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}} if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {}
+    
+    # Result ranking (ranking.py): blend weights and how many sources reach the prompt
+    RANKING_TOP_K = int(os.getenv('RANKING_TOP_K', 8))
+    PROMPT_SOURCE_CHARS = int(os.getenv('PROMPT_SOURCE_CHARS', 3000))  # Content of each source that reaches the prompt
+    RANKING_RELEVANCE_WEIGHT = float(os.getenv('RANKING_RELEVANCE_WEIGHT', 0.6))
+    RANKING_RELIABILITY_WEIGHT = float(os.getenv('RANKING_RELIABILITY_WEIGHT', 0.25))
+    RANKING_RECENCY_WEIGHT = float(os.getenv('RANKING_RECENCY_WEIGHT', 0.15))
+    RANKING_RECENCY_HALF_LIFE_HOURS = float(os.getenv('RANKING_RECENCY_HALF_LIFE_HOURS', 48))
+    RANKING_CONTENT_CHARS = int(os.getenv('RANKING_CONTENT_CHARS', 5000))
+    
+    # Deep-search early exit (ranking.EvidencePolicy)
+    DEEP_SEARCH_EVIDENCE_THRESHOLD = float(os.getenv('DEEP_SEARCH_EVIDENCE_THRESHOLD', 3.0))
+    DEEP_SEARCH_MIN_COVERAGE = float(os.getenv('DEEP_SEARCH_MIN_COVERAGE', 0.75))
+    DEEP_SEARCH_MIN_RELEVANCE = float(os.getenv('DEEP_SEARCH_MIN_RELEVANCE', 0.5))
+    DEEP_SEARCH_TIME_BUDGET = float(os.getenv('DEEP_SEARCH_TIME_BUDGET', 45))
+    DEEP_SEARCH_MAX_RESULTS = int(os.getenv('DEEP_SEARCH_MAX_RESULTS', 40))
+    DEEP_SEARCH_LOW_YIELD_RESULTS = int(os.getenv('DEEP_SEARCH_LOW_YIELD_RESULTS', 12))  # Results in a row matching no query term; 0 = off
+    
+    # Background prefetch of the general-news headline feeds (headlines.py)
+    HEADLINE_PREFETCH_ENABLED = os.getenv('HEADLINE_PREFETCH_ENABLED', 'true').lower() == 'true'
+    HEADLINE_STORE_DIR = os.getenv('HEADLINE_STORE_DIR', 'headlines')
+    HEADLINE_REFRESH_INTERVAL = float(os.getenv('HEADLINE_REFRESH_INTERVAL', 600))
+    HEADLINE_MAX_AGE = float(os.getenv('HEADLINE_MAX_AGE', 1800))
+    HEADLINE_MAX_BACKOFF = float(os.getenv('HEADLINE_MAX_BACKOFF', 3600))
+    
+    # Per-host rate limits shared by every scraper (politeness.py)
+    HOST_RATE_PER_SECOND = float(os.getenv('HOST_RATE_PER_SECOND', 1))
+    HOST_BURST = float(os.getenv('HOST_BURST', 3))
+    HOST_MAX_WAIT = float(os.getenv('HOST_MAX_WAIT', 15))
+    HOST_BACKOFF_BASE = float(os.getenv('HOST_BACKOFF_BASE', 30))
+    HOST_MAX_BACKOFF = float(os.getenv('HOST_MAX_BACKOFF', 900))
+    
+    # Delta sync for the frontend (/api/sync)
+    SYNC_OVERLAP_SECONDS = float(os.getenv('SYNC_OVERLAP_SECONDS', 5))  # Re-sent window for rows committed late
+    SYNC_TOMBSTONE_DAYS = float(os.getenv('SYNC_TOMBSTONE_DAYS', 30))
+    
+    # NDJSON export/import (transfer.py): rows per read batch and per import transaction
+    TRANSFER_BATCH_SIZE = int(os.getenv('TRANSFER_BATCH_SIZE', 1000))
+    
+    # Response compression (compression.py); Brotli is used when installed
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+    
+    # Conversations per POST /api/conversations/delete
+    BULK_DELETE_MAX = int(os.getenv('BULK_DELETE_MAX', 500))
+    
+    # Rendered AI replies kept in memory (renderer.py)
+    RENDER_CACHE_SIZE = int(os.getenv('RENDER_CACHE_SIZE', 2000))
+    
+    # Retention and compaction of stored sources (retention.py); 0 days turns a step off
+    RETENTION_ENABLED = os.getenv('RETENTION_ENABLED', 'true').lower() == 'true'
+    RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL', 3600))
+    RETENTION_COMPRESS_DAYS = float(os.getenv('RETENTION_COMPRESS_DAYS', 7))
+    RETENTION_BODY_DAYS = float(os.getenv('RETENTION_BODY_DAYS', 90))  # Article bodies dropped, titles and links kept
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 200))  # Rows per write transaction
+    RETENTION_PAUSE = float(os.getenv('RETENTION_PAUSE', 0.2))  # Seconds between batches
+    RETENTION_VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', 1000))
+    
+    # Speculative deep searches started while the user types (prefetch.py)
+    PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() == 'true'
+    PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', 2))
+    PREFETCH_MIN_CHARS = int(os.getenv('PREFETCH_MIN_CHARS', 12))
+    PREFETCH_IDLE_TIMEOUT = float(os.getenv('PREFETCH_IDLE_TIMEOUT', 90))
+    PREFETCH_TTL = float(os.getenv('PREFETCH_TTL', 300))
+    PREFETCH_HOST_RESERVE = float(os.getenv('PREFETCH_HOST_RESERVE', 1))  # Host tokens speculative scrapes leave for real searches
+    
+    # Conversation memory sent with each prompt (memory.py)
+    MEMORY_RECENT_TURNS = int(os.getenv('MEMORY_RECENT_TURNS', 4))
+    MEMORY_SUMMARIZE_BATCH = int(os.getenv('MEMORY_SUMMARIZE_BATCH', 2))
+    MEMORY_TURN_CHARS = int(os.getenv('MEMORY_TURN_CHARS', 1500))
+    MEMORY_SUMMARY_WORDS = int(os.getenv('MEMORY_SUMMARY_WORDS', 250))
+    MEMORY_SUMMARY_CHARS = int(os.getenv('MEMORY_SUMMARY_CHARS', 2000))
+    
+    # Batch deep search (batch.py)
+    BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', 20))
+    BATCH_LLM_CONCURRENCY = int(os.getenv('BATCH_LLM_CONCURRENCY', 4))
+    
+    # Multi-process serving (gunicorn.conf.py, wsgi.py, shared.py)
+    WORKERS = int(os.getenv('WORKERS', 0))  # 0 = one per CPU core
+    WORKER_THREADS = int(os.getenv('WORKER_THREADS', 8))
+    SHARED_STORE_PATH = os.getenv('SHARED_STORE_PATH', os.path.join(ROOT_DIR, 'instance', 'shared.db'))
+    ARTICLE_CACHE_TTL = float(os.getenv('ARTICLE_CACHE_TTL', 3600))
+    SHARED_PURGE_EVERY = int(os.getenv('SHARED_PURGE_EVERY', 500))  # Expired shared-store rows are purged every N cache writes
+    # How long a stale article body and its ETag/Last-Modified are kept for conditional re-fetches
+    ARTICLE_REVALIDATE_TTL = float(os.getenv('ARTICLE_REVALIDATE_TTL', 86400))
+    
+    # Sampling profiler for slow /api/chat requests (profiler.py)
+    PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'false').lower() == 'true'
+    PROFILE_THRESHOLD_MS = float(os.getenv('PROFILE_THRESHOLD_MS', 20000))
+    PROFILE_HEADER = 'X-Debug-Profile'
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 10))
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
+    PROFILE_MAX_AGE_DAYS = float(os.getenv('PROFILE_MAX_AGE_DAYS', 7))
+    
+    # ASGI serving (asgi.py)
+    ASGI_MAX_THREADS = int(os.getenv('ASGI_MAX_THREADS', 64))  # Threads for the synchronous routes
+    DEEP_SEARCH_THREADS = int(os.getenv('DEEP_SEARCH_THREADS', 16))  # Blocking scrapes awaited by /api/chat, per process
       # Selenium
     CHROME_DRIVER_PATH = os.getenv('CHROME_DRIVER_PATH', '')  # Get from .env or leave empty for auto-detection
     HEADLESS = True
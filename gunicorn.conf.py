@@ -0,0 +1,57 @@
+"""
+gunicorn settings for production serving (see wsgi.py):
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Pre-forks Config.WORKERS processes (default: one per core), each with
+Config.WORKER_THREADS threads, so deep searches blocked on Chrome or Gemini
+don't hold up other chats. Caches, rate limits and background-job leases are
+shared between the workers through shared.SharedStore. The hooks below start
+per-worker background work after the fork and reap Chrome processes when a
+worker exits, including one that crashed or was killed for timing out.
+"""
+import multiprocessing
+import os
+import sys
+
+# The config file is loaded before --chdir applies
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = Config.WORKERS or multiprocessing.cpu_count()
+worker_class = 'gthread'
+threads = Config.WORKER_THREADS
+# Deep searches can legitimately take minutes
+timeout = int(os.getenv('WORKER_TIMEOUT', 300))
+graceful_timeout = 30
+preload_app = True
+
+
+def post_fork(server, worker):
+    from app import app
+    from headlines import start_prefetcher
+    from retention import start_retention
+    # Every worker runs a prefetcher; per-source leases keep refreshes to one worker at a time
+    start_prefetcher()
+    # Likewise for retention, which a lease gives to one worker per interval
+    start_retention(app)
+
+
+def worker_exit(server, worker):
+    from workers import shutdown_worker
+    shutdown_worker()
+
+
+def child_exit(server, worker):
+    # Runs in the master, so it also covers workers that died without cleaning up
+    from workers import reap_browsers
+    reaped = reap_browsers(worker.pid)
+    if reaped:
+        server.log.warning(f"Reaped {reaped} Chrome processes left by worker {worker.pid}")
+
+
+def on_exit(server):
+    from workers import reap_orphans
+    reap_orphans()
@@ -0,0 +1,164 @@
+"""
+Warm store of headline feeds for the general-news sources.
+
+`HeadlinePrefetcher` runs in a background thread and periodically re-scrapes
+each of the direct-scrape sources (Times of India, Hindustan Times, The Hindu,
+NDTV, India Today) together with their article bodies into a `HeadlineStore`.
+Refreshes are staggered across the interval so only one source is fetched at
+a time, page requests go through the same per-host limiter as live scrapes
+(politeness.py) but may wait out a throttled host instead of skipping it, and a
+source that keeps failing backs off up to HEADLINE_MAX_BACKOFF. When several
+worker processes each run a prefetcher, a per-source lease in the shared store
+lets only one of them refresh a given source.
+
+scrape_news then answers general-news queries from the store and only falls
+back to a live scrape for sources whose snapshot is older than
+HEADLINE_MAX_AGE.
+"""
+import json
+import os
+import random
+import threading
+import time
+
+from config import Config
+from records import as_record
+from shared import SHARED
+
+HEADLINE_SOURCES = ("times_of_india", "hindustan_times", "the_hindu", "ndtv", "india_today")
+
+
+class HeadlineStore:
+    """One JSON snapshot per source in a directory, replaced atomically on every refresh."""
+
+    def __init__(self, path):
+        # Created on the first save, not at import time
+        self.path = path
+
+    def _file(self, source):
+        return os.path.join(self.path, f"{source}.json")
+
+    def save(self, source, articles, fetched_at=None):
+        articles = [as_record(article).to_dict() for article in articles]
+        snapshot = {'source': source, 'fetched_at': fetched_at or time.time(), 'articles': articles}
+        os.makedirs(self.path, exist_ok=True)
+        tmp = f"{self._file(source)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, self._file(source))
+
+    def load(self, source):
+        """Return (fetched_at, articles) for a source, or None if it was never stored."""
+        try:
+            with open(self._file(source), encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return snapshot['fetched_at'], snapshot['articles']
+
+    def fresh(self, source, max_age=None):
+        """Stored articles for a source if they are younger than `max_age` seconds, else None."""
+        max_age = Config.HEADLINE_MAX_AGE if max_age is None else max_age
+        snapshot = self.load(source)
+        if snapshot is None or not snapshot[1]:
+            return None
+        fetched_at, articles = snapshot
+        if time.time() - fetched_at > max_age:
+            return None
+        return articles
+
+    def age(self, source):
+        snapshot = self.load(source)
+        return None if snapshot is None else time.time() - snapshot[0]
+
+
+HEADLINE_STORE = HeadlineStore(Config.HEADLINE_STORE_DIR)
+
+
+class HeadlinePrefetcher:
+    """Background thread that keeps a HeadlineStore warm."""
+
+    def __init__(self, store=HEADLINE_STORE, sources=HEADLINE_SOURCES, interval=None, scraper_factory=None):
+        self.store = store
+        self.sources = list(sources)
+        self.interval = interval or Config.HEADLINE_REFRESH_INTERVAL
+        self.scraper_factory = scraper_factory
+        self.failures = dict.fromkeys(self.sources, 0)
+        self._stop = threading.Event()
+        self._thread = None
+        # Spread the first refreshes evenly over one interval, skipping sources
+        # whose stored snapshot is still fresh (e.g. after a restart)
+        now = time.monotonic()
+        step = self.interval / max(len(self.sources), 1)
+        self.next_due = {}
+        for i, source in enumerate(self.sources):
+            age = store.age(source)
+            if age is not None and age < self.interval:
+                self.next_due[source] = now + self.interval - age
+            else:
+                self.next_due[source] = now + i * step
+
+    def _scraper(self):
+        if self.scraper_factory:
+            return self.scraper_factory()
+        from scraper import WebScraper
+        # Background refreshes can afford to queue behind a throttled host
+        return WebScraper(max_host_wait=Config.HOST_MAX_BACKOFF)
+
+    def refresh(self, source):
+        """Scrape one source into the store; returns the number of articles stored."""
+        scraper = self._scraper()
+        try:
+            articles = scraper.scrape_direct_from_source(source)
+        finally:
+            scraper.close()
+        if articles:
+            self.store.save(source, articles)
+        return len(articles)
+
+    def _schedule(self, source, ok):
+        if ok:
+            self.failures[source] = 0
+            delay = self.interval
+        else:
+            self.failures[source] += 1
+            delay = min(self.interval * 2 ** self.failures[source], Config.HEADLINE_MAX_BACKOFF)
+        # A little jitter keeps the sources from drifting into lockstep
+        self.next_due[source] = time.monotonic() + delay * random.uniform(0.9, 1.1)
+
+    def _run(self):
+        while not self._stop.is_set():
+            source = min(self.next_due, key=self.next_due.get)
+            wait = self.next_due[source] - time.monotonic()
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            try:
+                if not SHARED.try_lease(f"headline-prefetch:{source}", os.getpid(), ttl=self.interval / 2):
+                    # Another worker is refreshing this source
+                    self._schedule(source, True)
+                    continue
+                count = self.refresh(source)
+                print(f"Prefetched {count} headlines from {source}")
+            except Exception as e:
+                # Includes shared-store errors (e.g. a locked database): back off and keep the thread alive
+                print(f"Error prefetching headlines from {source}: {e}")
+                count = 0
+            self._schedule(source, count > 0)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='headline-prefetch', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def start_prefetcher():
+    """Start the background prefetcher if HEADLINE_PREFETCH_ENABLED; returns it or None."""
+    if not Config.HEADLINE_PREFETCH_ENABLED:
+        return None
+    return HeadlinePrefetcher().start()
@@ -0,0 +1,241 @@
+"""
+Pluggable LLM backends for response generation.
+
+`create_backend` picks the implementation named by Config.LLM_BACKEND:
+
+* gemini - Google Gemini through google-generativeai
+* stub   - deterministic local generator with configurable latency and token
+           rate, used for benchmarks and offline load tests
+
+Every backend shares the same call discipline: an optional request rate limit
+shared by all worker processes, a concurrency limiter, a per-call timeout,
+and retries with jittered exponential backoff. The concurrency limit is per
+process: with several workers (gunicorn.conf.py) up to WORKERS times
+max_concurrency calls can be in flight on a host. Use the shared rate limit
+to bound the host as a whole.
+"""
+import asyncio
+import functools
+import hashlib
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from shared import SHARED
+
+
+class LLMError(Exception):
+    """Raised when a backend cannot produce a response."""
+
+
+class LLMTimeoutError(LLMError):
+    """Raised when a call, or waiting for a concurrency slot, exceeds the timeout."""
+
+
+class LLMBackend:
+    """Base class for LLM backends. Subclasses implement `_generate(prompt) -> str`."""
+
+    name = 'base'
+    retryable_errors = (LLMTimeoutError,)
+
+    def __init__(self, timeout=60.0, max_retries=2, retry_backoff=0.5, max_concurrency=8, rate_limit_per_minute=0):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # In-flight calls in this process; each worker process has its own limit
+        self.max_concurrency = max_concurrency
+        # Requests per minute across all worker processes (0 = unlimited)
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self._limiter = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"llm-{self.name}")
+
+    def _generate(self, prompt):
+        raise NotImplementedError
+
+    def generate(self, prompt):
+        """Generate a response for `prompt`, retrying transient failures with jitter."""
+        attempt = 0
+        while True:
+            try:
+                return self._call_with_limits(prompt)
+            except self.retryable_errors:
+                if attempt >= self.max_retries:
+                    raise
+                # Full jitter keeps concurrent retries from hitting the API in lockstep
+                time.sleep(random.uniform(0, self.retry_backoff * (2 ** attempt)))
+                attempt += 1
+
+    async def generate_async(self, prompt):
+        """
+        Awaitable `generate`. Rate-limit waits and retry backoff sleep on the
+        event loop and the call itself is submitted to the executor once; the
+        shared store and a contended slot are waited on from the loop's default
+        executor, so nothing blocks the loop.
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self._call_with_limits_async(prompt)
+            except self.retryable_errors:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, self.retry_backoff * (2 ** attempt)))
+                attempt += 1
+
+    def _submit(self, prompt):
+        # The slot is held until the underlying call really finishes, even if we
+        # stop waiting for it, so the backend never sees more than max_concurrency calls
+        future = self._executor.submit(self._generate, prompt)
+        future.add_done_callback(lambda _: self._limiter.release())
+        return future
+
+    def _call_with_limits(self, prompt):
+        if self.rate_limit_per_minute:
+            rate = self.rate_limit_per_minute / 60
+            if not SHARED.acquire(f"llm:{self.name}", rate, burst=max(1.0, rate), timeout=self.timeout):
+                raise LLMTimeoutError(f"{self.name} rate limit left no slot within {self.timeout}s")
+        if not self._limiter.acquire(timeout=self.timeout):
+            raise LLMTimeoutError(f"No {self.name} slot free within {self.timeout}s")
+        try:
+            return self._submit(prompt).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise LLMTimeoutError(f"{self.name} call timed out after {self.timeout}s")
+
+    async def _call_with_limits_async(self, prompt):
+        loop = asyncio.get_running_loop()
+        if self.rate_limit_per_minute:
+            rate = self.rate_limit_per_minute / 60
+            deadline = time.monotonic() + self.timeout
+            while True:
+                # A SQLite transaction, so it runs off the loop; the wait itself doesn't
+                wait = await loop.run_in_executor(None, SHARED.take, f"llm:{self.name}", rate, max(1.0, rate))
+                if not wait:
+                    break
+                if time.monotonic() + wait > deadline:
+                    raise LLMTimeoutError(f"{self.name} rate limit left no slot within {self.timeout}s")
+                await asyncio.sleep(wait)
+        # The slot semaphore is shared with `generate`, so a contended acquire blocks a thread, not the loop
+        if not self._limiter.acquire(blocking=False):
+            waiting = loop.run_in_executor(None, functools.partial(self._limiter.acquire, timeout=self.timeout))
+            try:
+                acquired = await asyncio.shield(waiting)
+            except asyncio.CancelledError:
+                # Hand back a slot the wait gets after we stopped waiting for it
+                waiting.add_done_callback(lambda f: f.result() and self._limiter.release())
+                raise
+            if not acquired:
+                raise LLMTimeoutError(f"No {self.name} slot free within {self.timeout}s")
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self._submit(prompt)), self.timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"{self.name} call timed out after {self.timeout}s")
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini backend. google-generativeai is slow to import, so the client
+    is only set up on the first call rather than when the app starts.
+    """
+
+    name = 'gemini'
+
+    def __init__(self, api_key, model_name='gemini-2.0-flash', **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_key
+        self.model_name = model_name
+        self._model = None
+        self._retryable_errors = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._init_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    @property
+    def retryable_errors(self):
+        # Only consulted once a call has failed, by which point the client is loaded
+        if self._retryable_errors is None:
+            from google.api_core import exceptions as google_exceptions
+            self._retryable_errors = LLMBackend.retryable_errors + (
+                google_exceptions.ServiceUnavailable,
+                google_exceptions.ResourceExhausted,
+                google_exceptions.DeadlineExceeded,
+                google_exceptions.InternalServerError,
+            )
+        return self._retryable_errors
+
+    def _generate(self, prompt):
+        # google-generativeai 0.3.x takes no per-request timeout; the caller's
+        # wait is bounded by `timeout` and the slot is held until the call returns
+        return self.model.generate_content(prompt).text
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic local backend for benchmarking.
+
+    A call takes `latency + output_tokens / tokens_per_second` seconds and the
+    same prompt always yields the same Markdown answer, citing whichever
+    `Source N:` blocks appear in the prompt.
+    """
+
+    name = 'stub'
+
+    def __init__(self, latency=0.2, tokens_per_second=200.0, output_tokens=300, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+
+    def _generate(self, prompt):
+        time.sleep(self.latency + self.output_tokens / self.tokens_per_second)
+
+        seed = int.from_bytes(hashlib.sha256(prompt.encode('utf-8')).digest()[:8], 'big')
+        rng = random.Random(seed)
+        sources = re.findall(r'^Source (\d+):', prompt, flags=re.MULTILINE) or ['1']
+        words = re.findall(r'[a-zA-Z]{4,}', prompt) or ['response']
+
+        def sentence(length):
+            cited = rng.choice(sources)
+            return ' '.join(rng.choice(words) for _ in range(length)).capitalize() + f". [Source {cited}]"
+
+        # Spread the token budget over the usual response structure (~1 token per word)
+        per_line = 12
+        lines = max(self.output_tokens // per_line, 3)
+        findings = [f"- {sentence(per_line)}" for _ in range(lines // 3)]
+        analysis = [f"{i + 1}. {sentence(per_line)}" for i in range(lines // 3)]
+        insights = [f"- {sentence(per_line)}" for _ in range(lines - 2 * (lines // 3))]
+        return '\n'.join(
+            ['## Key Findings'] + findings +
+            ['', '## Detailed Analysis'] + analysis +
+            ['', '## Additional Insights'] + insights
+        )
+
+
+def create_backend(config):
+    """Build the backend selected by `config.LLM_BACKEND`."""
+    common = {
+        'timeout': config.LLM_TIMEOUT,
+        'max_retries': config.LLM_MAX_RETRIES,
+        'retry_backoff': config.LLM_RETRY_BACKOFF,
+        'max_concurrency': config.LLM_MAX_CONCURRENCY,
+        'rate_limit_per_minute': config.LLM_RATE_LIMIT_PER_MINUTE,
+    }
+    if config.LLM_BACKEND == 'stub':
+        return StubBackend(
+            latency=config.LLM_STUB_LATENCY,
+            tokens_per_second=config.LLM_STUB_TOKENS_PER_SECOND,
+            output_tokens=config.LLM_STUB_OUTPUT_TOKENS,
+            **common
+        )
+    if config.LLM_BACKEND == 'gemini':
+        return GeminiBackend(config.GEMINI_API_KEY, model_name=config.GEMINI_MODEL, **common)
+    raise ValueError(f"Unknown LLM backend: {config.LLM_BACKEND}")
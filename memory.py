@@ -0,0 +1,133 @@
+"""
+Bounded conversation memory for chat prompts.
+
+Each conversation keeps a rolling summary (ConversationMemory) of everything
+older than its last MEMORY_RECENT_TURNS turns. `build_context` renders that
+summary plus the recent turns for the next prompt, so prompt size stays
+bounded however long the conversation gets. After each reply,
+`schedule_update` folds turns that have left the recent window into the
+summary on a background thread, MEMORY_SUMMARIZE_BATCH turns per LLM call,
+so the summary is updated incrementally rather than rebuilt from the whole
+transcript.
+"""
+import html
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import IntegrityError
+
+from config import Config
+from metrics import span
+from models import db, ConversationMemory, Message
+
+TAG_RE = re.compile(r'<[^>]+>')
+SPACE_RE = re.compile(r'\s+')
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='memory')
+
+
+def message_text(message):
+    """Plain text of a message; older AI replies are stored as formatted HTML."""
+    text = message.content or ''
+    if not message.is_user and message.renderer_version is None:
+        text = html.unescape(TAG_RE.sub(' ', text))
+    return SPACE_RE.sub(' ', text).strip()
+
+
+def clip(text, limit):
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(' ', 1)[0] + ' ...'
+
+
+def format_turns(messages):
+    return '\n'.join(
+        f"{'User' if m.is_user else 'Assistant'}: {clip(message_text(m), Config.MEMORY_TURN_CHARS)}"
+        for m in messages
+    )
+
+
+def build_context(conversation_id):
+    """Summary plus recent turns of a conversation for the next prompt, or None if it has no history."""
+    memory = ConversationMemory.query.get(conversation_id)
+    summarized_through = memory.summarized_through if memory else 0
+    recent = Message.query\
+        .filter(Message.conversation_id == conversation_id, Message.id > summarized_through)\
+        .order_by(Message.id.desc())\
+        .limit(Config.MEMORY_RECENT_TURNS * 2)\
+        .all()
+    recent.reverse()
+
+    parts = []
+    if memory and memory.summary:
+        parts.append(f"Summary of the earlier conversation:\n{memory.summary}")
+    if recent:
+        parts.append(f"Most recent turns:\n{format_turns(recent)}")
+    return '\n\n'.join(parts) or None
+
+
+def build_summary_prompt(summary, messages):
+    return (
+        "Update the running summary of a conversation between a user and an assistant.\n\n"
+        f"Current summary:\n{summary or '(none yet)'}\n\n"
+        f"New turns to fold in:\n{format_turns(messages)}\n\n"
+        f"Write the updated summary as plain text in at most {Config.MEMORY_SUMMARY_WORDS} words. "
+        "Keep facts, names, decisions and open questions the user may refer back to; "
+        "drop greetings and formatting."
+    )
+
+
+def update_memory(conversation_id, llm):
+    """
+    Fold the oldest turns that have left the recent window into the summary.
+    Returns True if the summary changed.
+    """
+    memory = ConversationMemory.query.get(conversation_id)
+    summarized_through = memory.summarized_through if memory else 0
+    pending = Message.query\
+        .filter(Message.conversation_id == conversation_id, Message.id > summarized_through)\
+        .order_by(Message.id)\
+        .limit((Config.MEMORY_RECENT_TURNS + Config.MEMORY_SUMMARIZE_BATCH) * 2)\
+        .all()
+    if len(pending) < (Config.MEMORY_RECENT_TURNS + Config.MEMORY_SUMMARIZE_BATCH) * 2:
+        return False
+    folded = pending[:Config.MEMORY_SUMMARIZE_BATCH * 2]
+    prompt = build_summary_prompt(memory.summary if memory else '', folded)
+    last_folded = folded[-1].id
+    db.session.commit()  # Don't hold a connection while the LLM is summarizing
+
+    with span('memory_update'):
+        summary = llm.generate(prompt).strip()
+    summary = clip(SPACE_RE.sub(' ', summary), Config.MEMORY_SUMMARY_CHARS)
+
+    values = {'summary': summary, 'summarized_through': last_folded}
+    if memory is None:
+        db.session.add(ConversationMemory(conversation_id=conversation_id, **values))
+    else:
+        # Only apply if no concurrent update folded these turns first
+        updated = ConversationMemory.query\
+            .filter_by(conversation_id=conversation_id, summarized_through=summarized_through)\
+            .update(values)
+        if not updated:
+            db.session.rollback()
+            return False
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker created this conversation's memory first
+        db.session.rollback()
+        return False
+    return True
+
+
+def schedule_update(app, conversation_id, llm):
+    """Run update_memory in the background, catching up as many batches as are due."""
+    def run():
+        with app.app_context():
+            try:
+                while update_memory(conversation_id, llm):
+                    pass
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Error updating memory for conversation {conversation_id}: {str(e)}")
+    return _executor.submit(run)
@@ -0,0 +1,239 @@
+"""
+Lightweight tracing spans and Prometheus-style metrics for the chat pipeline.
+
+Wrap a pipeline stage in `span('stage', source=...)` to record its duration
+in the `crm_stage_duration_seconds` histogram and, when a request trace is
+active, in that request's timing breakdown. Nested spans inherit the parent's
+`source` label, so e.g. article fetches are attributed to the source being
+scraped. The registry is rendered in the Prometheus text format by /metrics.
+
+The registry is per process. With several workers each keeps its own
+counters and histograms, and /metrics shows whichever worker served the
+scrape; every series carries a `worker` label (its pid) so a scraper that
+reaches each worker can sum them.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    # Every series names the worker process it came from (see the module docstring)
+    pairs = (('worker', os.getpid()),) + tuple(zip(names, values))
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        with self._lock:
+            self._values[key] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ('le',)
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(names, key + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'crm_stage_duration_seconds', 'Duration of chat pipeline stages.', ('stage', 'source')
+))
+SOURCE_RESULTS = REGISTRY.register(Counter(
+    'crm_source_results_total', 'Results collected per scraping source.', ('source',)
+))
+CHAT_REQUESTS = REGISTRY.register(Counter(
+    'crm_chat_requests_total', 'Chat requests handled.', ('mode', 'status')
+))
+CHAT_DURATION = REGISTRY.register(Histogram(
+    'crm_chat_duration_seconds', 'End-to-end /api/chat latency.', ('mode',)
+))
+DEEP_SEARCH_STOPS = REGISTRY.register(Counter(
+    'crm_deep_search_stops_total', 'Deep searches by the reason scraping stopped.', ('reason',)
+))
+DEEP_SEARCH_SKIPPED_PHASES = REGISTRY.register(Counter(
+    'crm_deep_search_skipped_phases_total', 'Scraping phases skipped by the early-exit policy.', ('phase',)
+))
+HEADLINE_LOOKUPS = REGISTRY.register(Counter(
+    'crm_headline_store_lookups_total', 'General-news source lookups in the prefetched headline store.', ('source', 'result')
+))
+DEEP_SEARCH_PREFETCHES = REGISTRY.register(Counter(
+    'crm_deep_search_prefetches_total', 'Speculative deep searches by outcome.', ('outcome',)
+))
+HOST_THROTTLES = REGISTRY.register(Counter(
+    'crm_host_throttles_total', 'Fetches refused or backed off by the per-host limiter.', ('host', 'reason')
+))
+HTTP_BYTES = REGISTRY.register(Counter(
+    'crm_http_bytes_total', 'Article bytes fetched over HTTP, and bytes saved by compression or 304 revalidation.', ('source', 'kind')
+))
+RENDER_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'crm_render_cache_lookups_total', 'AI replies rendered from Markdown on read, by render cache result.', ('result',)
+))
+RESPONSE_BYTES = REGISTRY.register(Counter(
+    'crm_response_bytes_total', 'Compressed response bytes sent, and bytes saved by compression.', ('encoding', 'kind')
+))
+RETENTION_BYTES = REGISTRY.register(Counter(
+    'crm_retention_bytes_total', 'Bytes reclaimed by the retention task: payloads compressed or pruned, and database file shrinkage.', ('kind',)
+))
+HOST_WAIT = REGISTRY.register(Histogram(
+    'crm_host_wait_seconds', 'Time fetches waited for their host\'s rate limit.', ('host',)
+))
+
+
+class RequestTrace:
+    """Timing breakdown of one request, filled in by every span that runs under it."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = defaultdict(lambda: {'ms': 0.0, 'self_ms': 0.0, 'count': 0})
+        # Self time in ms per (source, stage); source is '' outside any source
+        self.self_times = defaultdict(float)
+        # Extra per-request details reported alongside the timings
+        self.annotations = {}
+
+    def add(self, stage, source, duration, self_time):
+        with self._lock:
+            entry = self.stages[stage]
+            entry['ms'] += duration * 1000
+            entry['self_ms'] += self_time * 1000
+            entry['count'] += 1
+            self.self_times[(source or '', stage)] += self_time * 1000
+
+    def annotate(self, key, value):
+        with self._lock:
+            self.annotations[key] = value
+
+    def breakdown(self):
+        """Per-stage totals (inclusive and self time) plus self time per source, in ms."""
+        with self._lock:
+            sources = defaultdict(float)
+            for (source, _), ms in self.self_times.items():
+                if source:
+                    sources[source] += ms
+            return {
+                'total_ms': round((time.perf_counter() - self.started) * 1000, 1),
+                'stages': {
+                    stage: {'ms': round(v['ms'], 1), 'self_ms': round(v['self_ms'], 1), 'count': v['count']}
+                    for stage, v in self.stages.items()
+                },
+                'sources': {source: round(ms, 1) for source, ms in sources.items()},
+                **self.annotations,
+            }
+
+
+_current_trace = contextvars.ContextVar('crm_trace', default=None)
+_current_span = contextvars.ContextVar('crm_span', default=None)
+
+
+def start_trace():
+    """Begin collecting spans for the current request; returns the trace."""
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+class _Span:
+    __slots__ = ('stage', 'source', 'child_time')
+
+    def __init__(self, stage, source):
+        self.stage = stage
+        self.source = source
+        self.child_time = 0.0
+
+
+@contextmanager
+def span(stage, source=None):
+    """Time a pipeline stage; `source` defaults to the enclosing span's source."""
+    parent = _current_span.get()
+    if source is None and parent is not None:
+        source = parent.source
+    current = _Span(stage, source)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        if parent is not None:
+            parent.child_time += duration
+        STAGE_DURATION.observe(duration, stage=stage, source=source or '')
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, source, duration, duration - current.child_time)
@@ -1,5 +1,12 @@
-from datetime import datetime
+import sqlite3
+from datetime import datetime, timedelta
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import MetaData, delete, event, insert, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateTable
+
+from config import Config
 
 db = SQLAlchemy()
 
@@ -8,20 +15,159 @@ class Conversation(db.Model):
     title = db.Column(db.String(200))
     is_deep_search = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Children are deleted by the database (ON DELETE CASCADE), never loaded just to be deleted
+    messages = db.relationship('Message', backref='conversation', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    memory = db.relationship('ConversationMemory', backref='conversation', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
 
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'))
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id', ondelete='CASCADE'), index=True)
     content = db.Column(db.Text)
     is_user = db.Column(db.Boolean)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     sources = db.Column(db.Text)  # JSON string for deep search sources
+    # Set when content is the model's Markdown (rendered on read by renderer.py); NULL for replies stored as HTML
+    renderer_version = db.Column(db.Integer)
+    # Last write of any kind, including in-place rewrites by retention, backfill and import; set on insert
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class SearchHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'))
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id', ondelete='CASCADE'), index=True)
     query = db.Column(db.Text)
     sources = db.Column(db.Text)  # JSON string
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Last write of any kind, e.g. retention compacting `sources`; set on insert
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ConversationMemory(db.Model):
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id', ondelete='CASCADE'), primary_key=True)
+    summary = db.Column(db.Text, default='')  # Rolling summary of turns older than the recent window
+    summarized_through = db.Column(db.Integer, default=0)  # Id of the last Message folded into the summary
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Tombstone(db.Model):
+    """A deleted conversation, kept so /api/sync can tell clients to drop it."""
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class RetentionState(db.Model):
+    """A retention watermark: the last row id a step has visited (retention.py)."""
+    name = db.Column(db.String(64), primary_key=True)
+    last_id = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+def record_tombstones(conn, conversation_ids):
+    """
+    Remember deleted conversations so /api/sync tells clients to drop them, and
+    forget those older than SYNC_TOMBSTONE_DAYS. `conn` is a session or connection.
+    """
+    table = Tombstone.__table__
+    now = datetime.utcnow()
+    conn.execute(insert(table), [{'conversation_id': i, 'deleted_at': now} for i in conversation_ids])
+    conn.execute(delete(table).where(table.c.deleted_at < now - timedelta(days=Config.SYNC_TOMBSTONE_DAYS)))
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite(dbapi_connection, connection_record):
+    """
+    SQLite only enforces foreign keys, and so ON DELETE CASCADE, when asked to
+    on each connection. WAL lets readers, such as a long export, run alongside
+    a writer under every entry point; the mode sticks to the file once set.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.close()
+
+def stale_foreign_keys(inspector, table):
+    """Whether an existing table's foreign keys lack the ON DELETE rules its model declares."""
+    existing = {
+        (tuple(fk['constrained_columns']), (fk.get('options') or {}).get('ondelete', '').upper())
+        for fk in inspector.get_foreign_keys(table.name)
+    }
+    return any(
+        ((fk.parent.name,), (fk.ondelete or '').upper()) not in existing
+        for fk in table.foreign_keys
+    )
+
+def rebuild_table(conn, table):
+    """
+    Recreate a SQLite table from its model, keeping the rows (SQLite cannot
+    alter constraints in place). Rows whose parent no longer exists would be
+    rejected by the new foreign keys, so they are moved, unchanged, to
+    `<table>__orphans` (created only if there are any) for the operator to
+    inspect or drop; returns how many.
+    """
+    metadata = MetaData()
+    # The copy's foreign keys resolve against copies of the tables they reference
+    for fk in table.foreign_keys:
+        fk.column.table.to_metadata(metadata)
+    staging = table.to_metadata(metadata, name=f"{table.name}__rebuild")
+    conn.exec_driver_sql(str(CreateTable(staging).compile(dialect=conn.dialect)))
+    columns = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    names = ', '.join(f'"{column.name}"' for column in table.columns if column.name in columns)
+    orphan_filter = ' AND '.join(
+        f'("{fk.parent.name}" IS NULL OR "{fk.parent.name}" IN (SELECT "{fk.column.name}" FROM "{fk.column.table.name}"))'
+        for fk in table.foreign_keys
+    ) or '1'
+    conn.exec_driver_sql(
+        f'INSERT INTO "{staging.name}" ({names}) SELECT {names} FROM "{table.name}" WHERE {orphan_filter}'
+    )
+    moved = conn.exec_driver_sql(f'SELECT COUNT(*) FROM "{table.name}" WHERE NOT ({orphan_filter})').scalar()
+    if moved:
+        orphans = f"{table.name}__orphans"
+        conn.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS "{orphans}" AS SELECT {names} FROM "{table.name}" WHERE 0')
+        conn.exec_driver_sql(
+            f'INSERT INTO "{orphans}" ({names}) SELECT {names} FROM "{table.name}" WHERE NOT ({orphan_filter})'
+        )
+    conn.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    conn.exec_driver_sql(f'ALTER TABLE "{staging.name}" RENAME TO "{table.name}"')
+    for index in table.indexes:
+        index.create(conn)
+    return moved
+
+def ensure_schema():
+    """
+    Create missing tables, then bring existing ones up to date with the models:
+    add the columns and indexes they gained after the table was created, which
+    create_all leaves out (new columns must be nullable), and rebuild SQLite
+    tables created before their foreign keys cascaded.
+    """
+    db.create_all()
+    inspector = inspect(db.engine)
+    if db.engine.dialect.name == 'sqlite':
+        stale = [table for table in db.metadata.sorted_tables if stale_foreign_keys(inspector, table)]
+        if stale:
+            # Foreign keys must be off while tables are swapped, and the switch only works outside a transaction
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+                try:
+                    conn.exec_driver_sql('BEGIN IMMEDIATE')
+                    try:
+                        for table in stale:
+                            moved = rebuild_table(conn, table)
+                            current_app.logger.warning(
+                                f"Rebuilt table {table.name} with cascading foreign keys"
+                                + (f"; {moved} orphaned rows moved to {table.name}__orphans" if moved else '')
+                            )
+                        conn.exec_driver_sql('COMMIT')
+                    except Exception:
+                        conn.exec_driver_sql('ROLLBACK')
+                        raise
+                finally:
+                    conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+            inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    column_type = column.type.compile(dialect=conn.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
@@ -0,0 +1,190 @@
+"""
+Per-host politeness for every scraping path.
+
+`HostLimiter` gives each host a token bucket in the shared store, so every
+WebScraper in every worker process draws from the same budget for, say,
+google.com. Hosts are paced independently: a busy or throttled host only
+delays fetches to itself, and a fetch that would have to wait longer than
+HOST_MAX_WAIT raises `HostBusyError` so the scrape moves on to other hosts
+instead of spending its time budget in a queue. `schedule` orders a scrape's
+work across hosts by how soon each host can be fetched, so work for a busy or
+backed-off host waits behind work for idle ones instead of ahead of it.
+A limiter built with a `reserve` (e.g. for speculative prefetches) only takes
+a token while more than `reserve` are left, so it never spends the last of a
+host's budget that real searches need.
+
+When a host answers 429/503 or serves a block page (CAPTCHA, "unusual
+traffic"), the limiter backs off from it exponentially, from
+HOST_BACKOFF_BASE up to HOST_MAX_BACKOFF seconds (or Retry-After, if
+longer), and steps the backoff down again on each successful fetch.
+"""
+import time
+from urllib.parse import quote, quote_plus, urlsplit
+
+from config import Config
+from metrics import HOST_THROTTLES, HOST_WAIT
+from shared import SHARED
+
+# (requests per second, burst) for hosts that need a stricter pace than the default
+HOST_RATES = {
+    'google.com': (1 / 3, 3),
+    'news.google.com': (1 / 3, 3),
+}
+
+BLOCK_STATUSES = (429, 503)
+
+# Paths an anti-bot interstitial redirects to
+BLOCK_PATHS = ('/sorry/',)
+
+# Substrings of the page title, or of the host and path it ended up on, that mark an anti-bot interstitial
+BLOCK_MARKERS = (
+    'unusual traffic', 'captcha', 'are you a robot', 'access denied',
+    'attention required', 'just a moment',
+)
+
+
+class HostBusyError(Exception):
+    """A host is backed off or rate limited for longer than the caller is willing to wait."""
+
+
+def host_key(url):
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def _echoes(query):
+    """The forms in which a page can echo a search query: as typed, URL-encoded, or as a path slug."""
+    query = query.lower().strip()
+    if not query:
+        return []
+    words = query.split()
+    forms = {query, quote(query), quote_plus(query), '-'.join(words), '_'.join(words)}
+    # Longest first, so a form is never cut short by a shorter one inside it
+    return sorted(forms, key=len, reverse=True)
+
+
+def is_block_page(url, title='', query=''):
+    """
+    Whether a fetch that ended up at `url` with page `title` hit an anti-bot
+    page. The query string is never matched, and the search `query` is cut
+    out of the title and path first: search URLs and result titles echo it,
+    so "captcha bypass news" must not read as a CAPTCHA, while a real block
+    page still does.
+    """
+    parts = urlsplit(url)
+    path = parts.path.lower()
+    if any(marker in path for marker in BLOCK_PATHS):
+        return True
+    title = title.lower()
+    for echo in _echoes(query):
+        path = path.replace(echo, ' ')
+        title = title.replace(echo, ' ')
+    text = f"{parts.netloc.lower()}{path} {title}"
+    return any(marker in text for marker in BLOCK_MARKERS)
+
+
+def _retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class HostLimiter:
+    def __init__(self, store=SHARED, rate=None, burst=None, max_wait=None, reserve=0):
+        self.store = store
+        self.rate = rate or Config.HOST_RATE_PER_SECOND
+        self.burst = burst or Config.HOST_BURST
+        self.max_wait = Config.HOST_MAX_WAIT if max_wait is None else max_wait
+        # Tokens this limiter leaves in each bucket for others
+        self.reserve = reserve
+
+    def limits(self, host):
+        return HOST_RATES.get(host, (self.rate, self.burst))
+
+    def backoff_state(self, host):
+        return self.store.cache_get(f"backoff:{host}")
+
+    def delay(self, url):
+        """Seconds until a fetch of `url` could start, from its host's backoff and bucket; takes nothing."""
+        host = host_key(url)
+        state = self.backoff_state(host)
+        cooldown = state['until'] - time.time() if state else 0.0
+        rate, burst = self.limits(host)
+        return max(cooldown, self.store.peek(f"host:{host}", rate, burst), 0.0)
+
+    def schedule(self, items, url_of):
+        """
+        Yield `items` soonest-fetchable host first, re-checked after each item,
+        so one busy host's work moves behind other hosts' instead of holding
+        it up. Ties keep their given order.
+        """
+        pending = list(items)
+        while pending:
+            delays = [self.delay(url_of(item)) for item in pending]
+            yield pending.pop(delays.index(min(delays)))
+
+    def acquire(self, url, max_wait=None):
+        """Wait for this host's turn; raises HostBusyError if that would take longer than `max_wait`."""
+        host = host_key(url)
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        start = time.monotonic()
+        state = self.backoff_state(host)
+        if state:
+            cooldown = state['until'] - time.time()
+            if cooldown > max_wait:
+                HOST_THROTTLES.inc(host=host, reason='backoff')
+                raise HostBusyError(f"{host} is backed off for another {cooldown:.0f}s")
+            if cooldown > 0:
+                time.sleep(cooldown)
+        rate, burst = self.limits(host)
+        if self.reserve and self.store.peek(f"host:{host}", rate, burst, cost=1 + self.reserve):
+            HOST_THROTTLES.inc(host=host, reason='reserve')
+            raise HostBusyError(f"{host} is down to its last {self.reserve:g} tokens")
+        while True:
+            wait = self.store.take(f"host:{host}", rate, burst)
+            if not wait:
+                break
+            if time.monotonic() + wait > deadline:
+                HOST_THROTTLES.inc(host=host, reason='rate')
+                raise HostBusyError(f"{host} is rate limited for another {wait:.1f}s")
+            time.sleep(wait)
+        waited = time.monotonic() - start
+        if waited:
+            HOST_WAIT.observe(waited, host=host)
+
+    def report(self, url, status=None, title='', retry_after=None, final_url=None, query=''):
+        """
+        Feed back the outcome of a fetch of `url`, which ended up at `final_url`
+        (after redirects): back off on 429/503 or a block page, recover on success.
+        """
+        host = host_key(url)
+        if status in BLOCK_STATUSES or is_block_page(final_url or url, title, query):
+            self.back_off(host, _retry_after(retry_after))
+        else:
+            self.recover(host)
+
+    def back_off(self, host, retry_after=0.0):
+        state = self.backoff_state(host) or {'level': 0}
+        level = state['level'] + 1
+        delay = max(retry_after, min(Config.HOST_BACKOFF_BASE * 2 ** (level - 1), Config.HOST_MAX_BACKOFF))
+        # The level outlives the cooldown so repeat offences escalate
+        self.store.cache_set(f"backoff:{host}", {'level': level, 'until': time.time() + delay},
+                             ttl=delay + Config.HOST_MAX_BACKOFF)
+        HOST_THROTTLES.inc(host=host, reason='blocked')
+        print(f"Backing off from {host} for {delay:.0f}s (level {level})")
+
+    def recover(self, host):
+        state = self.backoff_state(host)
+        if not state:
+            return
+        level = state['level'] - 1
+        if level <= 0:
+            self.store.cache_delete(f"backoff:{host}")
+        else:
+            self.store.cache_set(f"backoff:{host}", {'level': level, 'until': state['until']},
+                                 ttl=Config.HOST_MAX_BACKOFF)
+
+
+LIMITER = HostLimiter()
@@ -0,0 +1,268 @@
+"""
+Speculative deep searches, started while the user is still typing.
+
+With deep search on, script.js posts the draft message to /api/prefetch once
+the input has been stable for a moment. `SpeculativeSearches` then starts
+scrape_news for it on a pool of PREFETCH_WORKERS threads. If the same query
+(ignoring case and spacing) is already running or done, no new scrape starts.
+Each client has at most one live prefetch. When its draft changes, or it
+calls DELETE /api/prefetch, the previous scrape is cancelled at its next
+checkpoint, unless another client or a chat is attached to it. Scrapes that
+nobody touches for PREFETCH_IDLE_TIMEOUT seconds are cancelled too.
+
+When the message is sent, handle_chat calls `claim`. It attaches to the
+running scrape, or picks up the finished result, instead of starting over.
+Finished results stay claimable for PREFETCH_TTL seconds. They are also kept
+in the shared store, so a chat served by another worker can reuse them.
+Running scrapes hold a lease in the shared store, so no other worker starts
+the same one, and a chat on another worker waits for its result there, for
+at most DEEP_SEARCH_TIME_BUDGET. One poller thread per process serves all
+such waits. An empty result usually means a failed or blocked scrape: it is
+neither stored nor handed out, and the chat searches as usual.
+
+Speculative scrapes only fetch from a host while more than
+PREFETCH_HOST_RESERVE of its tokens are left, and never queue for one, so
+they skip hosts that real searches need rather than competing with them.
+A scrape that skipped a host, or stopped for any reason but enough evidence,
+is incomplete: it is handed out as empty, so the chat runs a search of its
+own (on article bodies the prefetch already cached).
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import Config
+from metrics import DEEP_SEARCH_PREFETCHES
+from politeness import HostLimiter
+from records import SourceResult, as_record
+from scraper import WebScraper
+from shared import SHARED
+
+# Seconds between checks of the shared store for another worker's result
+REMOTE_POLL_INTERVAL = 0.5
+
+
+def query_key(query):
+    return ' '.join(query.lower().split())
+
+
+def speculative_scraper():
+    """A scraper that gives way to real searches at every host."""
+    return WebScraper(limiter=HostLimiter(reserve=Config.PREFETCH_HOST_RESERVE), max_host_wait=0)
+
+
+def complete(report):
+    """Whether a scrape found enough evidence without skipping a busy host (no report: assume so)."""
+    if report is None:
+        return True
+    return report['stop_reason'] == 'evidence' and not report.get('hosts_skipped')
+
+
+def unusable(future):
+    """Whether a finished scrape failed, was cancelled or found nothing."""
+    return future.done() and (future.cancelled() or future.exception() is not None or not future.result())
+
+
+class Speculation:
+    __slots__ = ('query', 'future', 'cancel', 'clients', 'claimed', 'touched')
+
+    def __init__(self, query):
+        self.query = query
+        self.future = None
+        self.cancel = threading.Event()
+        self.clients = set()
+        self.claimed = False
+        self.touched = time.monotonic()
+
+
+class SpeculativeSearches:
+    def __init__(self, scraper_factory=speculative_scraper, store=SHARED, workers=None):
+        self.scraper_factory = scraper_factory
+        self.store = store
+        self.workers = workers or Config.PREFETCH_WORKERS
+        self._pool = None
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._client_keys = {}
+        # Futures waiting on other workers' scrapes: key -> [(future, deadline)]
+        self._remote = {}
+        self._remote_lock = threading.Lock()
+        self._poller = None
+
+    @property
+    def owner(self):
+        # Read on use: this object is created before gunicorn forks its workers
+        return os.getpid()
+
+    def _submit(self, entry, key):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='prefetch')
+        entry.future = self._pool.submit(self._run, entry, key)
+
+    def _run(self, entry, key):
+        try:
+            if entry.cancel.is_set():
+                return []
+            scraper = self.scraper_factory()
+            results = scraper.scrape_news(entry.query, cancel=entry.cancel)
+            if results and not complete(getattr(scraper, 'last_report', None)):
+                # A real search may reach the hosts and phases this one gave up on
+                DEEP_SEARCH_PREFETCHES.inc(outcome='incomplete')
+                return []
+            if results and self.store is not None and not entry.cancel.is_set():
+                self.store.cache_set(f"search:{key}", [as_record(item).to_dict() for item in results], Config.PREFETCH_TTL)
+            return results
+        finally:
+            if self.store is not None:
+                self.store.release_lease(f"prefetch:{key}", self.owner)
+
+    def _wait_remote(self, key):
+        """
+        A Future for the result another worker is scraping. It fails if that
+        worker stops without one, or if it takes longer than DEEP_SEARCH_TIME_BUDGET,
+        the most a search of our own would (e.g. because that worker died).
+        """
+        future = Future()
+        # Running futures can't be cancelled, so the poller may always settle it
+        future.set_running_or_notify_cancel()
+        with self._remote_lock:
+            self._remote.setdefault(key, []).append((future, time.monotonic() + Config.DEEP_SEARCH_TIME_BUDGET))
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll_remote, name='prefetch-wait', daemon=True)
+                self._poller.start()
+        return future
+
+    def _poll_remote(self):
+        """Settle the futures of _wait_remote; exits once none are left."""
+        while True:
+            with self._remote_lock:
+                if not self._remote:
+                    self._poller = None
+                    return
+                keys = list(self._remote)
+            for key in keys:
+                try:
+                    stored = self.store.cache_get(f"search:{key}")
+                    running = stored is None and self.store.lease_holder(f"prefetch:{key}") is not None
+                except Exception as e:
+                    # e.g. a locked shared store: try again on the next round
+                    print(f"Error polling prefetch {key}: {e}")
+                    continue
+                now = time.monotonic()
+                with self._remote_lock:
+                    waiting = []
+                    for future, deadline in self._remote.pop(key, []):
+                        if stored:
+                            future.set_result([SourceResult.from_dict(item) for item in stored])
+                        elif not running:
+                            future.set_exception(LookupError("The prefetching worker finished without results"))
+                        elif now >= deadline:
+                            future.set_exception(LookupError("The prefetching worker took longer than a search budget"))
+                        else:
+                            waiting.append((future, deadline))
+                    if waiting:
+                        self._remote.setdefault(key, []).extend(waiting)
+            time.sleep(REMOTE_POLL_INTERVAL)
+
+    def start(self, query, client_id=None):
+        """Start or join the speculative scrape for `query`; returns 'started', 'running' or 'ready'."""
+        key = query_key(query)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if client_id is not None:
+                previous = self._client_keys.get(client_id)
+                if previous is not None and previous != key:
+                    self._release(client_id, previous)
+                self._client_keys[client_id] = key
+            entry = self._entries.get(key)
+            if entry is not None and unusable(entry.future):
+                # A failed or empty scrape is retried rather than handed out
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                entry.touched = now
+                if client_id is not None:
+                    entry.clients.add(client_id)
+                DEEP_SEARCH_PREFETCHES.inc(outcome='joined')
+                return 'ready' if entry.future.done() else 'running'
+            if self.store is not None:
+                if self.store.cache_get(f"search:{key}"):
+                    return 'ready'
+                # Held until the scrape ends; the TTL only matters if this worker dies first
+                if not self.store.try_lease(f"prefetch:{key}", self.owner,
+                                            ttl=Config.PREFETCH_IDLE_TIMEOUT + Config.DEEP_SEARCH_TIME_BUDGET):
+                    DEEP_SEARCH_PREFETCHES.inc(outcome='joined_remote')
+                    return 'running'
+            entry = Speculation(query)
+            if client_id is not None:
+                entry.clients.add(client_id)
+            self._submit(entry, key)
+            self._entries[key] = entry
+        DEEP_SEARCH_PREFETCHES.inc(outcome='started')
+        return 'started'
+
+    def cancel(self, client_id):
+        """The client abandoned its draft: cancel its prefetch unless someone else needs it."""
+        with self._lock:
+            self._release(client_id, self._client_keys.pop(client_id, None))
+
+    def claim(self, query):
+        """A Future for the running or finished scrape of `query`, or None if there is none to attach to."""
+        key = query_key(query)
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is not None and unusable(entry.future):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                entry.claimed = True
+                entry.touched = time.monotonic()
+                DEEP_SEARCH_PREFETCHES.inc(outcome='claimed_ready' if entry.future.done() else 'claimed_running')
+                return entry.future
+        if self.store is None:
+            return None
+        stored = self.store.cache_get(f"search:{key}")
+        if not stored:
+            holder = self.store.lease_holder(f"prefetch:{key}")
+            if holder is None or holder == str(self.owner):
+                return None
+            DEEP_SEARCH_PREFETCHES.inc(outcome='claimed_remote')
+            return self._wait_remote(key)
+        DEEP_SEARCH_PREFETCHES.inc(outcome='claimed_ready')
+        future = Future()
+        future.set_result([SourceResult.from_dict(item) for item in stored])
+        return future
+
+    def _release(self, client_id, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.clients.discard(client_id)
+        if not entry.clients and not entry.claimed and not entry.future.done():
+            self._drop(key, entry, 'cancelled')
+
+    def _drop(self, key, entry, outcome):
+        entry.cancel.set()
+        if entry.future.cancel() and self.store is not None:
+            # Never started, so _run will not release the lease
+            self.store.release_lease(f"prefetch:{key}", self.owner)
+        del self._entries[key]
+        DEEP_SEARCH_PREFETCHES.inc(outcome=outcome)
+
+    def _expire(self, now):
+        for key, entry in list(self._entries.items()):
+            idle = now - entry.touched
+            if entry.future.done():
+                if idle > Config.PREFETCH_TTL:
+                    del self._entries[key]
+            elif not entry.claimed and idle > Config.PREFETCH_IDLE_TIMEOUT:
+                self._drop(key, entry, 'expired')
+        for client_id, key in list(self._client_keys.items()):
+            if key not in self._entries:
+                del self._client_keys[client_id]
+
+
+SPECULATIVE = SpeculativeSearches()
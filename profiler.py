@@ -0,0 +1,203 @@
+"""
+Opt-in sampling profiler for slow chat requests.
+
+While Config.PROFILE_ENABLED is on, `profile_request` samples the stacks of
+the threads working on each /api/chat request (the view itself plus any
+`profile_thread`-wrapped work such as WebScraper.scrape_news) from a single
+background thread. Nothing is written unless the request exceeds
+PROFILE_THRESHOLD_MS or carries the PROFILE_HEADER debug header; then the
+samples go to PROFILE_DIR as a folded-stack file (flamegraph.pl, speedscope
+and inferno all read it) next to a JSON file with the sources and stage
+timings. Old profiles are pruned by count and age.
+"""
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import request
+
+from config import Config
+from metrics import current_trace
+
+_current_session = contextvars.ContextVar('crm_profile_session', default=None)
+
+
+class ProfileSession:
+    """Stack samples for one request, taken from the threads registered to it."""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:8]
+        self.started = time.perf_counter()
+        self.samples = Counter()
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def register(self, ident, anchor=None):
+        """
+        Sample thread `ident` on behalf of this session. With an `anchor` frame
+        (a coroutine running on a shared event loop thread) only stacks that pass
+        through that frame count, so concurrent requests don't bleed into each other.
+        """
+        with self._lock:
+            self._threads[ident] = anchor
+
+    def unregister(self, ident):
+        with self._lock:
+            self._threads.pop(ident, None)
+
+    def sample(self, frames):
+        with self._lock:
+            threads = list(self._threads.items())
+        for ident, anchor in threads:
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            stack = []
+            anchored = anchor is None
+            while frame is not None:
+                if frame is anchor:
+                    anchored = True
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if anchored:
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+class _Sampler:
+    """One daemon thread that samples every active session; idle when there are none."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._sessions = set()
+        self._lock = threading.Condition()
+        self._thread = None
+
+    def add(self, session):
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self._thread.start()
+            self._lock.notify()
+
+    def remove(self, session):
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                while not self._sessions:
+                    self._lock.wait()
+                sessions = list(self._sessions)
+            frames = sys._current_frames()
+            frames.pop(own, None)
+            for session in sessions:
+                session.sample(frames)
+            time.sleep(self.interval)
+
+
+_sampler = _Sampler(Config.PROFILE_INTERVAL_MS / 1000)
+
+
+def profile_thread(func):
+    """Include the calling thread in the active request's profile while `func` runs."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        session = _current_session.get()
+        if session is None:
+            return func(*args, **kwargs)
+        ident = threading.get_ident()
+        session.register(ident)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            session.unregister(ident)
+    return wrapper
+
+
+def profile_request(view):
+    """Profile an async view, keeping the result if it was slow or asked for."""
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        if not Config.PROFILE_ENABLED:
+            return await view(*args, **kwargs)
+        forced = request.headers.get(Config.PROFILE_HEADER, '').lower() in ('1', 'true', 'yes')
+        session = ProfileSession()
+        session.register(threading.get_ident(), anchor=sys._getframe())
+        token = _current_session.set(session)
+        _sampler.add(session)
+        try:
+            response = await view(*args, **kwargs)
+        finally:
+            _sampler.remove(session)
+            _current_session.reset(token)
+        elapsed_ms = (time.perf_counter() - session.started) * 1000
+        if forced or elapsed_ms >= Config.PROFILE_THRESHOLD_MS:
+            try:
+                save_profile(session, elapsed_ms, response, forced)
+            except OSError as e:
+                print(f"Error saving profile {session.id}: {e}")
+        return response
+    return wrapper
+
+
+def save_profile(session, elapsed_ms, response, forced):
+    """Write the folded stacks and request metadata, then apply retention."""
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    base = os.path.join(Config.PROFILE_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{session.id}")
+
+    with open(base + '.folded', 'w', encoding='utf-8') as f:
+        for stack, count in session.samples.most_common():
+            f.write(f"{stack} {count}\n")
+
+    body = response[0] if isinstance(response, tuple) else response
+    payload = body.get_json(silent=True) or {}
+    data = request.get_json(silent=True) or {}
+    trace = current_trace()
+    metadata = {
+        'id': session.id,
+        'path': request.path,
+        'message': data.get('message'),
+        'deep_search': data.get('deep_search', False),
+        'elapsed_ms': round(elapsed_ms, 1),
+        'trigger': 'header' if forced else 'threshold',
+        'samples': sum(session.samples.values()),
+        'interval_ms': Config.PROFILE_INTERVAL_MS,
+        'stage_timings': trace.breakdown() if trace else None,
+        'sources': [
+            {'title': s.get('title'), 'link': s.get('link'), 'source': s.get('source')}
+            for s in (payload.get('sources') or [])
+        ],
+    }
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+
+    prune_profiles()
+
+
+def prune_profiles():
+    """Keep at most PROFILE_MAX_FILES profiles, none older than PROFILE_MAX_AGE_DAYS."""
+    entries = []
+    for name in os.listdir(Config.PROFILE_DIR):
+        if name.endswith('.json'):
+            path = os.path.join(Config.PROFILE_DIR, name)
+            entries.append((os.path.getmtime(path), path[:-len('.json')]))
+    entries.sort(reverse=True)
+    cutoff = time.time() - Config.PROFILE_MAX_AGE_DAYS * 86400
+    for index, (mtime, base) in enumerate(entries):
+        if index >= Config.PROFILE_MAX_FILES or mtime < cutoff:
+            for extension in ('.json', '.folded'):
+                try:
+                    os.remove(base + extension)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,248 @@
+"""
+Relevance ranking for scraped results.
+
+`rank_results` replaces the old (source, recency) tuple sort: it blends
+
+* query relevance - BM25 over title + content, computed for the whole batch
+  at once with numpy
+* source reliability - a per-publisher prior from SOURCE_RELIABILITY
+* recency - exponential decay on a real timestamp parsed from the free-text
+  time strings the scrapers collect ("3 hours ago", "Oct 3, 2025", ...)
+
+and keeps only the top-k, so fewer and better sources reach the prompt.
+
+`EvidencePolicy` scores results as they are collected and tells scrape_news
+when it has enough relevant, reliable evidence (or has used up its time
+budget, or keeps finding nothing on topic) to skip the remaining, slower
+phases.
+"""
+import math
+import re
+import time
+from datetime import datetime, timedelta
+
+from config import Config
+
+# Prior reliability per publisher, matched as a substring of the result's source
+SOURCE_RELIABILITY = {
+    'the hindu': 0.9, 'hindu': 0.9, 'indian express': 0.85, 'indianexpress': 0.85,
+    'hindustan': 0.8, 'times of india': 0.8, 'timesofindia': 0.8, 'ndtv': 0.8,
+    'india today': 0.8, 'indiatoday': 0.8, 'livemint': 0.8, 'economictimes': 0.8,
+    'bbc': 0.9, 'news18': 0.65,
+    'python docs': 0.95, 'docs.python': 0.95, 'mdn': 0.95, 'mozilla': 0.95,
+    'stackoverflow': 0.85, 'github': 0.75, 'geeksforgeeks': 0.75, 'freecodecamp': 0.75,
+    'w3schools': 0.65, 'tutorialspoint': 0.6, 'javatpoint': 0.6, 'dev to': 0.6, 'dev.to': 0.6,
+}
+DEFAULT_RELIABILITY = 0.5
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to was what when "
+    "where which who why with latest news today recent".split()
+)
+TOKEN_RE = re.compile(r'[a-z0-9]+(?:[+#][a-z0-9+#]*)?')
+
+RELATIVE_RE = re.compile(r'(\d+)\s*(min|minute|hr|hour|day|week|wk|month|mo|year|yr)s?\b')
+RELATIVE_UNITS = {
+    'min': timedelta(minutes=1), 'minute': timedelta(minutes=1),
+    'hr': timedelta(hours=1), 'hour': timedelta(hours=1),
+    'day': timedelta(days=1), 'week': timedelta(weeks=1), 'wk': timedelta(weeks=1),
+    'month': timedelta(days=30), 'mo': timedelta(days=30),
+    'year': timedelta(days=365), 'yr': timedelta(days=365),
+}
+ABSOLUTE_FORMATS = ('%B %d, %Y', '%b %d, %Y', '%d %B %Y', '%d %b %Y', '%Y-%m-%d', '%B %d %Y', '%b %d %Y')
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def parse_timestamp(text, now=None):
+    """Best-effort datetime for a scraped time string, or None if it can't be read."""
+    now = now or datetime.now()
+    text = (text or '').strip().lower()
+    if not text:
+        return None
+    match = RELATIVE_RE.search(text)
+    if match:
+        return now - int(match.group(1)) * RELATIVE_UNITS[match.group(2)]
+    if 'just now' in text:
+        return now
+    if 'yesterday' in text:
+        return now - timedelta(days=1)
+    if 'today' in text:
+        return now
+    # "Recent - October 18, 2026" and plain dates: try the part after any label
+    candidate = text.split(' - ')[-1].strip().title()
+    for fmt in ABSOLUTE_FORMATS:
+        try:
+            return datetime.strptime(candidate, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def source_reliability(source):
+    source = (source or '').lower()
+    return max((w for name, w in SOURCE_RELIABILITY.items() if name in source), default=DEFAULT_RELIABILITY)
+
+
+def bm25_scores(query_terms, documents, k1=1.5, b=0.75):
+    """BM25 of each tokenized document against the query terms, vectorized over the batch."""
+    import numpy as np  # Deferred: only deep searches rank, plain chat never needs numpy
+    if not documents or not query_terms:
+        return np.zeros(len(documents))
+    terms = list(dict.fromkeys(query_terms))
+    column = {term: j for j, term in enumerate(terms)}
+    tf = np.zeros((len(documents), len(terms)))
+    for i, tokens in enumerate(documents):
+        for token in tokens:
+            j = column.get(token)
+            if j is not None:
+                tf[i, j] += 1
+    lengths = np.array([len(tokens) for tokens in documents], dtype=float)
+    avg_length = lengths.mean() or 1.0
+    df = (tf > 0).sum(axis=0)
+    n = len(documents)
+    idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / avg_length)
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def document_tokens(item):
+    # Titles are short and on-topic, so they count double
+    title = tokenize(item.get('title', ''))
+    content = item.get('content') or ''
+    if content.startswith('Could not extract content'):
+        content = ''
+    return title + title + tokenize(content[:Config.RANKING_CONTENT_CHARS])
+
+
+def rank_results(query, results, is_tech_query=False, top_k=None, now=None):
+    """Return the top-k results ordered by blended relevance, reliability and recency."""
+    import numpy as np
+    if not results:
+        return []
+    top_k = top_k or Config.RANKING_TOP_K
+    now = now or datetime.now()
+
+    relevance = bm25_scores(tokenize(query), [document_tokens(item) for item in results])
+    if relevance.max() > 0:
+        relevance = relevance / relevance.max()
+
+    reliability = np.array([source_reliability(item.get('source')) for item in results])
+    if is_tech_query:
+        # Technical material from technical sources beats news coverage of the same topic
+        reliability += np.array([0.2 if '(Technical)' in (item.get('source') or '') else 0.0 for item in results])
+
+    half_life = Config.RANKING_RECENCY_HALF_LIFE_HOURS
+    recency = []
+    for item in results:
+        posted = parse_timestamp(item.get('time'), now)
+        if posted is None:
+            recency.append(0.3)
+        else:
+            age_hours = max((now - posted).total_seconds() / 3600, 0.0)
+            recency.append(math.pow(0.5, age_hours / half_life))
+    recency = np.array(recency)
+
+    # Freshness matters much less for reference material than for news
+    recency_weight = Config.RANKING_RECENCY_WEIGHT * (0.25 if is_tech_query else 1.0)
+    scores = (
+        Config.RANKING_RELEVANCE_WEIGHT * relevance
+        + Config.RANKING_RELIABILITY_WEIGHT * reliability
+        + recency_weight * recency
+    )
+    order = np.argsort(-scores, kind='stable')[:top_k]
+    return [results[i] for i in order]
+
+
+class EvidencePolicy:
+    """
+    Early-exit policy for scrape_news.
+
+    Each result scores relevance (share of query terms it mentions) times source
+    reliability; only results at least DEEP_SEARCH_MIN_RELEVANCE relevant count
+    as evidence. The pipeline stops once the evidence reaches
+    DEEP_SEARCH_EVIDENCE_THRESHOLD with the collected results covering
+    DEEP_SEARCH_MIN_COVERAGE of the query terms, or when DEEP_SEARCH_TIME_BUDGET
+    seconds have passed, or at the DEEP_SEARCH_MAX_RESULTS hard cap, or as soon
+    as the `cancelled` event is set. It also gives up on junk: once
+    DEEP_SEARCH_LOW_YIELD_RESULTS results in a row mention none of the query
+    terms, the remaining phases are unlikely to do better.
+    """
+
+    def __init__(self, query, is_tech_query=False, clock=time.monotonic, cancelled=None):
+        self.terms = set(tokenize(query))
+        self.is_tech_query = is_tech_query
+        self.clock = clock
+        # Event that, once set, stops the scrape (an abandoned speculative search)
+        self.cancelled = cancelled
+        self.started = clock()
+        self.evidence = 0.0
+        self.covered = set()
+        self.results = 0
+        # Results in a row that matched no query term
+        self.misses = 0
+        self.stop_reason = None
+        self.phases_run = []
+        self.phases_skipped = []
+
+    def add(self, item):
+        """Score a newly collected result."""
+        self.results += 1
+        matched = self.terms.intersection(document_tokens(item))
+        self.covered |= matched
+        self.misses = 0 if matched else self.misses + 1
+        # Nothing specific to match (e.g. "latest news today"): any article is on topic
+        relevance = len(matched) / len(self.terms) if self.terms else 1.0
+        if relevance >= Config.DEEP_SEARCH_MIN_RELEVANCE:
+            reliability = source_reliability(item.get('source'))
+            if self.is_tech_query and '(Technical)' in (item.get('source') or ''):
+                reliability = min(reliability + 0.2, 1.0)
+            self.evidence += relevance * reliability
+
+    def extend(self, items):
+        for item in items:
+            self.add(item)
+
+    @property
+    def coverage(self):
+        return len(self.covered) / len(self.terms) if self.terms else 1.0
+
+    @property
+    def elapsed(self):
+        return self.clock() - self.started
+
+    def should_stop(self):
+        """True once enough evidence is in or a budget is spent; the first reason sticks."""
+        if self.stop_reason is None:
+            if self.cancelled is not None and self.cancelled.is_set():
+                self.stop_reason = 'cancelled'
+            elif self.evidence >= Config.DEEP_SEARCH_EVIDENCE_THRESHOLD and self.coverage >= Config.DEEP_SEARCH_MIN_COVERAGE:
+                self.stop_reason = 'evidence'
+            elif self.elapsed >= Config.DEEP_SEARCH_TIME_BUDGET:
+                self.stop_reason = 'time_budget'
+            elif self.results >= Config.DEEP_SEARCH_MAX_RESULTS:
+                self.stop_reason = 'max_results'
+            elif self.terms and 0 < Config.DEEP_SEARCH_LOW_YIELD_RESULTS <= self.misses:
+                self.stop_reason = 'low_yield'
+        return self.stop_reason is not None
+
+    def enter(self, phase):
+        """Return whether `phase` should run, recording it as run or skipped."""
+        if self.should_stop():
+            self.phases_skipped.append(phase)
+            return False
+        self.phases_run.append(phase)
+        return True
+
+    def report(self):
+        return {
+            'stop_reason': self.stop_reason or 'exhausted',
+            'evidence': round(self.evidence, 2),
+            'coverage': round(self.coverage, 2),
+            'results': self.results,
+            'elapsed_ms': round(self.elapsed * 1000, 1),
+            'phases_run': list(self.phases_run),
+            'phases_skipped': list(self.phases_skipped),
+        }
@@ -0,0 +1,112 @@
+"""
+Compact representation of scraped sources and their one-time serialization.
+
+`SourceResult` is a slotted record for one scraped item. It still reads like
+the dicts it replaced (`item['title']`, `item.get('time')`), so ranking, prompt
+building and benchmark stubs work with either. The record holds a reference to
+its content string, which is shared with the scraper's article caches, so
+passing a record along never copies the body. `preview()` is the truncated
+view the prompt uses; it is cut on use and never stored on the record.
+
+A deep search's sources are encoded once with `encode_sources`. orjson reads
+the records' slots directly, so no intermediate dicts are built. The bytes
+are stored on the message and search-history rows and spliced into the JSON
+response with `dumps_with_raw`, so nothing is serialized twice. Content is
+serialized in full, as the dicts were; only the prompt previews it.
+
+Stored payloads older than RETENTION_COMPRESS_DAYS are rewritten by
+retention.py as ``z:`` plus base64 zlib data. Anything that reads a stored
+`sources` column goes through `unpack_payload`.
+"""
+import base64
+import zlib
+from dataclasses import dataclass
+
+import orjson
+
+from config import Config
+
+
+# A dataclass only so orjson can encode it natively; compared and hashed by identity, like the dicts were
+@dataclass(slots=True, repr=False, eq=False)
+class SourceResult:
+    title: str
+    link: str
+    source: str
+    time: str
+    content: str = ''
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __repr__(self):
+        return f"SourceResult({self.title!r}, {self.source!r}, {len(self.content or '')} chars)"
+
+    def preview(self, limit=None):
+        """The first `limit` (default PROMPT_SOURCE_CHARS) characters of the content."""
+        limit = Config.PROMPT_SOURCE_CHARS if limit is None else limit
+        content = self.content or ''
+        return content if len(content) <= limit else content[:limit]
+
+    def to_dict(self):
+        """A plain dict, for stores that encode with the json module (headline store, shared cache)."""
+        return {
+            'title': self.title,
+            'link': self.link,
+            'source': self.source,
+            'time': self.time,
+            'content': self.content or '',
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('title'), data.get('link'), data.get('source'), data.get('time'), data.get('content') or '')
+
+
+def as_record(item):
+    return item if isinstance(item, SourceResult) else SourceResult.from_dict(item)
+
+
+def encode_sources(results):
+    """JSON bytes for a list of sources (records or dicts), without building a dict per record."""
+    return orjson.dumps([as_record(item) for item in results])
+
+
+def dumps_with_raw(obj, **raw):
+    """
+    Encode a dict and append already-encoded JSON values under the given keys,
+    so a payload serialized earlier (e.g. by encode_sources) is not re-encoded.
+    """
+    encoded = orjson.dumps(obj)
+    if not raw:
+        return encoded
+    parts = [encoded[:-1]]
+    separator = b',' if obj else b''
+    for key, value in raw.items():
+        parts.append(separator + orjson.dumps(key) + b':' + (value if value is not None else b'null'))
+        separator = b','
+    parts.append(b'}')
+    return b''.join(parts)
+
+
+PACKED_PREFIX = 'z:'
+
+
+def pack_payload(text):
+    """Compressed form of a stored JSON payload, or the text itself if that is no smaller."""
+    if not text or text.startswith(PACKED_PREFIX):
+        return text
+    packed = PACKED_PREFIX + base64.b64encode(zlib.compress(text.encode(), 9)).decode('ascii')
+    return packed if len(packed) < len(text) else text
+
+
+def unpack_payload(value):
+    """The JSON text of a stored payload, whether or not it was packed."""
+    if value and value.startswith(PACKED_PREFIX):
+        return zlib.decompress(base64.b64decode(value[len(PACKED_PREFIX):])).decode()
+    return value
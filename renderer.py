@@ -0,0 +1,227 @@
+"""
+Rendering of AI replies from the model's Markdown to the chat's HTML.
+
+Replies are stored as the Markdown the model wrote, with the RENDERER_VERSION
+current at the time (`Message.renderer_version`), and rendered when read.
+`render_message` memoizes renders in an LRU cache keyed by a hash of the
+stored Markdown and RENDERER_VERSION, never by message id: ids are reused
+after deletes, content is rewritten by imports and backfills, and each worker
+keeps its own cache, so an entry must only ever match the text it was
+rendered from. Bump RENDERER_VERSION whenever the output of
+`format_ai_response` changes: every reply then renders with the new
+formatter, and entries from the old one age out of the cache.
+
+Replies stored before this hold the formatter's HTML and have no version.
+`html_to_markdown` reverses that HTML. `backfill_markdown` moves such rows
+over in batches, and only when rendering the recovered Markdown reproduces
+the stored HTML exactly. Rows it cannot recover stay HTML and are served as
+they are.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import bindparam, select, update
+
+from config import Config
+from metrics import RENDER_CACHE_LOOKUPS
+from models import db, Message
+
+RENDERER_VERSION = 1
+
+def format_ai_response(text):
+    """
+    Enhanced formatting for AI responses with proper HTML structure for the chat interface
+    Includes special handling for source citations and better visual formatting
+    """
+    # Convert markdown to HTML-like structure for the frontend
+    formatted_lines = []
+    in_list = False
+    in_code = False
+    
+    # Split into lines and process each one
+    lines = text.split('\n')
+    for line in lines:
+        line = line.strip()
+        
+        # Skip empty lines (we'll handle spacing later)
+        if not line:
+            continue
+            
+        # Headers (## Header)
+        if line.startswith('## '):
+            if in_list:
+                formatted_lines.append('</ul>' if not line.startswith('- ') else '')
+                in_list = False
+            formatted_lines.append(f'<h3 class="ai-response-heading">{line[3:]}</h3>')
+            
+        # Subheaders (### Subheader)
+        elif line.startswith('### '):
+            if in_list:
+                formatted_lines.append('</ul>' if not line.startswith('- ') else '')
+                in_list = False
+            formatted_lines.append(f'<h4 class="ai-response-subheading">{line[4:]}</h4>')
+            
+        # Bullet points (- or *)
+        elif line.startswith('- ') or line.startswith('* '):
+            if not in_list:
+                formatted_lines.append('<ul>')
+                in_list = True
+            formatted_lines.append(f'<li>{line[2:]}</li>')
+            
+        # Numbered lists (1. 2. etc)
+        elif re.match(r'^\d+\.\s', line):
+            if not in_list:
+                formatted_lines.append('<ol>')
+                in_list = True
+            formatted_lines.append(f'<li>{line[line.find(" ")+1:]}</li>')
+            
+        # Code blocks (```)
+        elif line.startswith('```'):
+            if in_code:
+                formatted_lines.append('</pre></code>')
+                in_code = False
+            else:
+                formatted_lines.append('<code><pre>')
+                in_code = True
+                  # Regular paragraphs
+        else:
+            if in_list:
+                formatted_lines.append('</ul>' if not line.startswith('- ') else '</ol>' if re.match(r'^\d+\.\s', line) else '')
+                in_list = False
+            if in_code:
+                formatted_lines.append(line)
+            else:
+                # Highlight source citations [Source X]
+                line_with_citations = re.sub(
+                    r'\[Source\s*(\d+)\]', 
+                    r'<span class="source-citation">[Source \1]</span>', 
+                    line
+                )
+                
+                # Split long paragraphs into shorter ones for readability
+                if len(line) > 120:
+                    parts = [line_with_citations[i:i+120] for i in range(0, len(line_with_citations), 120)]
+                    for part in parts:
+                        formatted_lines.append(f'<p>{part}</p>')
+                else:
+                    formatted_lines.append(f'<p>{line_with_citations}</p>')
+    
+    # Close any open tags
+    if in_list:
+        formatted_lines.append('</ul>')
+    if in_code:
+        formatted_lines.append('</pre></code>')
+    
+    # Combine with line breaks for readability
+    return '\n'.join(formatted_lines)
+
+
+class RenderCache:
+    """Thread-safe LRU of rendered HTML."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+RENDER_CACHE = RenderCache(Config.RENDER_CACHE_SIZE)
+
+
+def render_key(markdown):
+    """Cache key for the HTML of some reply Markdown under the current renderer."""
+    return hashlib.sha1((markdown or '').encode()).digest(), RENDERER_VERSION
+
+
+def render_message(message):
+    """HTML for a message's content: AI Markdown rendered (memoized), anything else as stored."""
+    if message.is_user or message.renderer_version is None:
+        return message.content
+    key = render_key(message.content)
+    html = RENDER_CACHE.get(key)
+    RENDER_CACHE_LOOKUPS.inc(result='miss' if html is None else 'hit')
+    if html is None:
+        html = format_ai_response(message.content or '')
+        RENDER_CACHE.put(key, html)
+    return html
+
+
+HEADING_RE = re.compile(r'^<h3 class="ai-response-heading">(.*)</h3>$')
+SUBHEADING_RE = re.compile(r'^<h4 class="ai-response-subheading">(.*)</h4>$')
+ITEM_RE = re.compile(r'^<li>(.*)</li>$')
+PARAGRAPH_RE = re.compile(r'^<p>(.*)</p>$')
+CITATION_RE = re.compile(r'<span class="source-citation">(\[Source \d+\])</span>')
+
+
+def html_to_markdown(html):
+    """Markdown that renders (with RENDERER_VERSION 1) to the given stored reply HTML."""
+    lines = []
+    numbered = in_code = False
+    number = 0
+    for line in html.split('\n'):
+        if line in ('<ul>', '<ol>'):
+            numbered, number = line == '<ol>', 0
+        elif line in ('</ul>', '</ol>', ''):
+            continue
+        elif line in ('<code><pre>', '</pre></code>'):
+            in_code = line == '<code><pre>'
+            lines.append('```')
+        elif HEADING_RE.match(line):
+            lines.append('## ' + HEADING_RE.match(line).group(1))
+        elif SUBHEADING_RE.match(line):
+            lines.append('### ' + SUBHEADING_RE.match(line).group(1))
+        elif ITEM_RE.match(line):
+            number += 1
+            lines.append(f"{number}. " if numbered else '- ')
+            lines[-1] += ITEM_RE.match(line).group(1)
+        elif PARAGRAPH_RE.match(line) and not in_code:
+            lines.append(CITATION_RE.sub(r'\1', PARAGRAPH_RE.match(line).group(1)))
+        else:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def backfill_markdown(after_id=0, batch_size=200):
+    """
+    Convert one batch of HTML replies with ids above `after_id` to Markdown;
+    returns (last id visited, or None once there are none left, rows converted).
+    """
+    table = Message.__table__
+    with db.engine.connect() as conn:
+        rows = conn.execute(
+            select(table.c.id, table.c.content)
+            .where(table.c.id > after_id, table.c.is_user.is_(False), table.c.renderer_version.is_(None))
+            .order_by(table.c.id).limit(batch_size)
+        ).all()
+    if not rows:
+        return None, 0
+    changes = []
+    for row_id, content in rows:
+        markdown = html_to_markdown(content or '')
+        # Only rows whose HTML the Markdown reproduces exactly; the rest stay HTML
+        if format_ai_response(markdown) == (content or ''):
+            changes.append({'row_id': row_id, 'markdown': markdown})
+    if changes:
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(table).where(table.c.id == bindparam('row_id'), table.c.renderer_version.is_(None))
+                .values(content=bindparam('markdown'), renderer_version=RENDERER_VERSION),
+                changes
+            )
+    return rows[-1][0], len(changes)
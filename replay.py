@@ -0,0 +1,313 @@
+"""
+Recorded-fixture backend for the web scraper.
+
+Pages are kept in an archive directory (index.json plus one HTML file per URL)
+and served back over a local HTTP server, so `WebScraper.scrape_news` can run
+offline with reproducible timings:
+
+    archive = ReplayArchive('fixtures/replay')
+    with ReplayServer(archive) as server:
+        scraper = WebScraper(url_rewriter=server.rewrite, seed=0, limiter=None)
+        results = scraper.scrape_news("python list comprehension")
+
+Search URLs for "today"/"latest" queries embed the current date; archive keys
+ignore it, so an archive recorded on one day replays on any other.
+
+Archives are filled either by recording a live run or by synthesizing pages
+that match the configured selectors (for CI, where the live web is off-limits):
+
+    python replay.py record --archive fixtures/replay "latest news india"
+    python replay.py synthesize --archive fixtures/replay "python decorators"
+    python replay.py serve --archive fixtures/replay --port 8765
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+SCRIPT_RE = re.compile(r'<script\b.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+HEAD_RE = re.compile(r'<head\b[^>]*>', re.IGNORECASE)
+# The date encode_search_query adds to "today"/"latest" queries (e.g. "October+19+2026")
+SEARCH_DATE_RE = re.compile(
+    r'(?:January|February|March|April|May|June|July|August|September|October|November|December)'
+    r'(?:\+|%20| )\d{2}(?:\+|%20| )\d{4}'
+)
+
+
+class ReplayArchive:
+    """Directory of recorded pages; index.json maps each URL key to its original URL and file."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.index = {}
+        index_path = os.path.join(path, 'index.json')
+        if os.path.exists(index_path):
+            with open(index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+
+    @staticmethod
+    def key(url):
+        # Search URLs carry the day they were made; without the date an archive
+        # recorded on one day still matches the same search on any later day
+        url = SEARCH_DATE_RE.sub('DATE', url)
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+    def save(self, url, html):
+        key = self.key(url)
+        filename = f"{key}.html"
+        with self._lock:
+            with open(os.path.join(self.path, filename), 'w', encoding='utf-8') as f:
+                f.write(html)
+            self.index[key] = {'url': url, 'file': filename}
+            with open(os.path.join(self.path, 'index.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, indent=1, sort_keys=True)
+
+    def load(self, key):
+        """Return (original_url, html) for a key, or None if it was never recorded."""
+        entry = self.index.get(key)
+        if not entry:
+            return None
+        with open(os.path.join(self.path, entry['file']), encoding='utf-8') as f:
+            return entry['url'], f.read()
+
+    def __contains__(self, url):
+        return self.key(url) in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+
+class FixtureRecorder:
+    """WebScraper recorder hook that captures every fetched page into an archive."""
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def record(self, url, html, rendered=False):
+        # Browser snapshots are already rendered; replaying their scripts would
+        # only mutate the DOM again and make runs non-deterministic
+        if rendered:
+            html = SCRIPT_RE.sub('', html)
+        self.archive.save(url, html)
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        match = re.match(r'^/replay/([0-9a-f]+)', self.path)
+        entry = self.server.archive.load(match.group(1)) if match else None
+        if entry is None:
+            self.server.misses.append(self.path)
+            self.send_error(404, 'Not recorded')
+            return
+        url, html = entry
+        # Resolve relative links against the original site so scraped hrefs
+        # match the recorded URLs and can be rewritten again
+        base = f'<base href="{url}">'
+        html, count = HEAD_RE.subn(lambda m: m.group(0) + base, html, count=1)
+        if not count:
+            html = base + html
+        body = html.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer:
+    """Serves an archive over local HTTP. Pass `rewrite` as WebScraper's url_rewriter."""
+
+    def __init__(self, archive, host='127.0.0.1', port=0):
+        self.archive = archive
+        self._server = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self._server.daemon_threads = True
+        self._server.archive = archive
+        self._server.misses = []
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def misses(self):
+        """Request paths that had no recording (i.e. would have gone to the live web)."""
+        return self._server.misses
+
+    def rewrite(self, url):
+        return f"{self.base_url}/replay/{ReplayArchive.key(url)}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='replay-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Synthetic archives
+
+FILLER_WORDS = (
+    "report government minister officials statement according week sources "
+    "policy development system data analysis performance update support "
+    "example function value result approach method implementation feature"
+).split()
+
+
+def _element(selector, inner='', href=None):
+    """Build nested HTML matching a simple descendant selector such as 'h3 a' or 'div.nDgy9d'."""
+    html = inner
+    parts = selector.split()
+    for i, part in enumerate(reversed(parts)):
+        tag, _, classes = part.partition('.')
+        tag = tag or 'div'
+        attrs = f' class="{classes.replace(".", " ")}"' if classes else ''
+        if tag == 'a' and href:
+            attrs += f' href="{href}"'
+        if tag == 'tr':
+            html = f"<table><tbody><tr{attrs}><td>{html}</td></tr></tbody></table>"
+        else:
+            html = f"<{tag}{attrs}>{html}</{tag}>"
+    if href and ' href=' not in html:
+        html = f'<a href="{href}">{html}</a>'
+    return html
+
+
+def _first(selectors):
+    return selectors.split(', ')[0]
+
+
+def _text(rng, query, words):
+    vocabulary = [w for w in re.findall(r'[a-zA-Z]+', query.lower())] + FILLER_WORDS
+    return ' '.join(rng.choice(vocabulary) for _ in range(words)).capitalize() + '.'
+
+
+def _article_page(rng, query, title):
+    paragraphs = ''.join(f"<p>{_text(rng, query, rng.randint(40, 90))}</p>" for _ in range(rng.randint(4, 8)))
+    return f"<html><head><title>{title}</title></head><body><article><h1>{title}</h1>{paragraphs}</article></body></html>"
+
+
+def _page(body):
+    return f"<html><head><title>Results</title></head><body>{body}</body></html>"
+
+
+def synthesize_archive(archive, queries, items_per_page=5):
+    """
+    Fill `archive` with synthetic pages for every configured source, search page
+    and article link `scrape_news` can visit for `queries`.
+    """
+    from scraper import (
+        SOURCE_CONFIGS, TECH_SOURCE_CONFIGS, TECH_SEARCH_SITES, NEWS_SEARCH_SITES,
+        encode_search_query, tech_search_url, site_search_url, general_search_urls
+    )
+
+    def article(url, query, title):
+        if url not in archive:
+            archive.save(url, _article_page(random.Random(url), query, title))
+
+    # Direct-scrape index pages don't depend on the query
+    for name, config in SOURCE_CONFIGS.items():
+        rng = random.Random(name)
+        items = []
+        for i in range(items_per_page):
+            title = _text(rng, 'india news', 8).rstrip('.')
+            link = f"{config['base_url']}/articles/{name}-{i}.html"
+            inner = _element(_first(config['title_selector']), title) + _element(config['link_selector'], title, href=link)
+            items.append(_element(_first(config['article_selector']), inner))
+            article(link, 'india news', title)
+        archive.save(config['url'], _page(''.join(items)))
+
+    now = datetime.now()
+    for query in queries:
+        slug = re.sub(r'[^a-z0-9]+', '-', query.lower()).strip('-')
+        rng = random.Random(query)
+
+        for name, config in TECH_SOURCE_CONFIGS.items():
+            items = []
+            for i in range(3):
+                title = f"{query.title()} - {_text(rng, query, 5).rstrip('.')}"
+                link = f"{config['base_url']}/{slug}-{i}"
+                title_selector, link_selector = _first(config['title_selector']), _first(config['link_selector'])
+                if title_selector == link_selector:
+                    inner = _element(title_selector, title, href=link)
+                else:
+                    inner = _element(title_selector, title) + _element(link_selector, title, href=link)
+                # Alternate long and short snippets to exercise both content paths
+                snippet = _text(rng, query, 40 if i % 2 == 0 else 10)
+                inner += _element(_first(config['snippet_selector']), snippet)
+                items.append(_element(_first(config['result_selector']), inner))
+                article(link, query, title)
+            archive.save(tech_search_url(name, query), _page(''.join(items)))
+
+        encoded_query = encode_search_query(query, now)
+        search_pages = [(site_search_url(encoded_query, site), site) for site in TECH_SEARCH_SITES + NEWS_SEARCH_SITES]
+        search_pages += [(url, None) for url in general_search_urls(encoded_query)]
+        for url, site in search_pages:
+            items = []
+            for i in range(items_per_page):
+                publisher = site or rng.choice(NEWS_SEARCH_SITES)
+                title = f"{query.title()}: {_text(rng, query, 7).rstrip('.')}"
+                link = f"https://{publisher}/{slug}-{ReplayArchive.key(url)[:6]}-{i}"
+                posted = rng.choice(['12 mins ago', '3 hours ago', '1 day ago', '2 weeks ago'])
+                inner = (
+                    f'<a href="{link}"><div class="nDgy9d">{title}</div></a>'
+                    f'<div class="XTjFC WF4CUc">{publisher}</div>'
+                    f'<div class="WG9SHc"><span>{posted}</span></div>'
+                )
+                items.append(f'<div class="dbsr">{inner}</div>')
+                article(link, query, title)
+            archive.save(url, _page(''.join(items)))
+    return archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record, synthesize or serve scraper replay fixtures.")
+    parser.add_argument('command', choices=['record', 'synthesize', 'serve'])
+    parser.add_argument('queries', nargs='*')
+    parser.add_argument('--archive', default=os.path.join('fixtures', 'replay'))
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0, help="Source shuffle seed; replay with the same seed")
+    args = parser.parse_args()
+
+    archive = ReplayArchive(args.archive)
+    if args.command == 'record':
+        from scraper import WebScraper
+        for query in args.queries:
+            scraper = WebScraper(recorder=FixtureRecorder(archive), seed=args.seed,
+                                 headline_store=None, article_cache=None)
+            results = scraper.scrape_news(query)
+            print(f"Recorded '{query}': {len(results)} results, {len(archive)} pages in archive")
+    elif args.command == 'synthesize':
+        synthesize_archive(archive, args.queries)
+        print(f"Synthesized {len(archive)} pages into {args.archive}")
+    else:
+        server = ReplayServer(archive, port=args.port)
+        print(f"Serving {len(archive)} recorded pages at {server.base_url}/replay/<key>")
+        try:
+            server._server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
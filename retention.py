@@ -0,0 +1,289 @@
+"""
+Retention and compaction of stored source payloads.
+
+Deep-search answers keep their scraped sources, article bodies included, in
+`Message.sources` and `SearchHistory.sources`, so chat.db would otherwise grow
+without limit. `RetentionTask` runs in a background thread every
+RETENTION_INTERVAL seconds. The shared store gives the task to one worker at
+a time. Each run has three steps:
+
+* Payloads older than RETENTION_COMPRESS_DAYS are packed (records.pack_payload).
+* Payloads older than RETENTION_BODY_DAYS lose their article bodies. Titles,
+  links, publishers and times are kept.
+* Freed pages go back to the filesystem with ``PRAGMA incremental_vacuum``.
+
+Before vacuuming, it also moves AI replies stored as HTML to Markdown
+(renderer.backfill_markdown).
+
+Rows are read and rewritten RETENTION_BATCH_SIZE at a time, each batch in its
+own short transaction, with RETENTION_PAUSE seconds between batches, so chats
+are never blocked for long. Per-table id watermarks mean a run only visits
+rows that crossed a cutoff since the last one. The same goes for vacuum
+steps of RETENTION_VACUUM_PAGES pages. The watermarks live in chat.db's
+`retention_state` table and are written in the same transaction as the batch
+they cover, so they cannot drift from the rows. Ids are taken to follow creation
+order, so old rows imported with new ids (transfer.py) are reached once the
+rows before them age past the cutoff.
+
+Each run reports the payload bytes saved, the file size before and after, and
+the latency of a probe of typical chat queries before and after. The report
+is printed, counted in crm_retention_bytes_total and kept in the shared store
+for `flask retention`.
+
+Incremental vacuum needs ``auto_vacuum=INCREMENTAL``, which SQLite only
+applies on a full VACUUM. That holds an exclusive lock for the whole rewrite,
+so the background task never runs it: the vacuum step is skipped until
+``flask retention --convert`` is run during a quiet period.
+
+The background run holds the shared store's `retention` lease and renews it
+after every batch, so however long a run takes, no other worker starts one
+alongside it.
+"""
+import os
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from sqlalchemy import bindparam, insert, select, update
+
+from config import Config
+from metrics import RETENTION_BYTES
+from models import db, Conversation, Message, RetentionState, SearchHistory
+from records import pack_payload, unpack_payload
+from renderer import backfill_markdown
+from shared import SHARED
+
+TABLES = {'message': Message.__table__, 'search_history': SearchHistory.__table__}
+STATE = RetentionState.__table__
+REPORT_KEY = 'retention:last_report'
+# Reports outlive any realistic gap between runs
+STATE_TTL = 365 * 86400
+
+
+def strip_bodies(text):
+    """The payload with each source's content emptied, or unchanged if it is not a source list."""
+    try:
+        items = orjson.loads(unpack_payload(text))
+    except (ValueError, TypeError):
+        return text
+    if not isinstance(items, list) or not any(isinstance(item, dict) and item.get('content') for item in items):
+        return text
+    for item in items:
+        if isinstance(item, dict) and 'content' in item:
+            item['content'] = ''
+    return pack_payload(orjson.dumps(items).decode())
+
+
+class RetentionTask:
+    """Background thread applying the retention policy to the chat database."""
+
+    def __init__(self, app, store=SHARED, interval=None):
+        self.app = app
+        self.store = store
+        self.interval = interval or Config.RETENTION_INTERVAL
+        # Lease held by a background run, renewed after every batch (None when run directly)
+        self._lease_ttl = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # State kept across runs and workers
+
+    def _watermark(self, name):
+        with db.engine.connect() as conn:
+            return conn.execute(select(STATE.c.last_id).where(STATE.c.name == name)).scalar() or 0
+
+    def _set_watermark(self, conn, name, value):
+        """Record the watermark in `conn`'s transaction, so it moves with the rows it covers."""
+        if not conn.execute(update(STATE).where(STATE.c.name == name).values(last_id=value)).rowcount:
+            conn.execute(insert(STATE).values(name=name, last_id=value))
+
+    def _pause(self):
+        """Wait between batches and renew the lease; False if the run should stop."""
+        if self._stop.wait(Config.RETENTION_PAUSE):
+            return False
+        if self._lease_ttl and not self.store.try_lease('retention', os.getpid(), ttl=self._lease_ttl):
+            print("Retention: lost the lease to another worker, stopping this run")
+            return False
+        return True
+
+    # Steps
+
+    def _sweep(self, step, table_name, cutoff, transform):
+        """Rewrite `sources` of rows created before `cutoff`, oldest first; returns (rows, bytes saved)."""
+        table = TABLES[table_name]
+        name = f"{step}:{table_name}"
+        last_id = self._watermark(name)
+        statement = update(table).where(table.c.id == bindparam('row_id')).values(sources=bindparam('packed'))
+        rows_changed = saved = 0
+        while not self._stop.is_set():
+            with db.engine.connect() as conn:
+                rows = conn.execute(
+                    select(table.c.id, table.c.created_at, table.c.sources)
+                    .where(table.c.id > last_id).order_by(table.c.id).limit(Config.RETENTION_BATCH_SIZE)
+                ).all()
+            changes = []
+            reached_cutoff = len(rows) < Config.RETENTION_BATCH_SIZE
+            for row_id, created_at, sources in rows:
+                # Ids follow creation order, so the first row past the cutoff ends the sweep
+                if created_at is not None and created_at >= cutoff:
+                    reached_cutoff = True
+                    break
+                last_id = row_id
+                if sources:
+                    packed = transform(sources)
+                    if packed != sources:
+                        changes.append({'row_id': row_id, 'packed': packed})
+                        saved += len(sources) - len(packed)
+            with db.engine.begin() as conn:
+                if changes:
+                    conn.execute(statement, changes)
+                self._set_watermark(conn, name, last_id)
+            rows_changed += len(changes)
+            if reached_cutoff or not self._pause():
+                break
+        return rows_changed, saved
+
+    def _backfill(self):
+        """Move HTML replies to Markdown a batch at a time; returns rows converted."""
+        last_id = self._watermark('markdown')
+        converted = 0
+        while not self._stop.is_set():
+            visited, count = backfill_markdown(last_id, Config.RETENTION_BATCH_SIZE)
+            if visited is None:
+                break
+            last_id = visited
+            converted += count
+            with db.engine.begin() as conn:
+                self._set_watermark(conn, 'markdown', last_id)
+            if not self._pause():
+                break
+        return converted
+
+    def _pragma(self, conn, name):
+        return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+    def file_size(self):
+        with db.engine.connect() as conn:
+            return self._pragma(conn, 'page_count') * self._pragma(conn, 'page_size')
+
+    def convert(self):
+        """Switch the database to auto_vacuum=INCREMENTAL; runs a full VACUUM, which locks it throughout."""
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.exec_driver_sql('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.exec_driver_sql('VACUUM')
+
+    def _vacuum(self):
+        """Release free pages in RETENTION_VACUUM_PAGES steps; returns pages released, or None if unavailable."""
+        with db.engine.connect() as conn:
+            mode = self._pragma(conn, 'auto_vacuum')
+        if mode != 2:
+            print("Retention: incremental vacuum is off for this database; run `flask retention --convert` to enable it")
+            return None
+        released = 0
+        while not self._stop.is_set():
+            with db.engine.begin() as conn:
+                free = self._pragma(conn, 'freelist_count')
+                if not free:
+                    break
+                conn.exec_driver_sql(f"PRAGMA incremental_vacuum({Config.RETENTION_VACUUM_PAGES})")
+                released += free - self._pragma(conn, 'freelist_count')
+            if not self._pause():
+                break
+        return released
+
+    def probe(self, repeat=5):
+        """Median milliseconds for the queries behind the sidebar and opening the latest conversation."""
+        sidebar = select(Conversation.__table__).order_by(Conversation.updated_at.desc()).limit(50)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with db.engine.connect() as conn:
+                latest = conn.execute(sidebar).first()
+                if latest is not None:
+                    conn.execute(
+                        select(Message.__table__).where(Message.conversation_id == latest.id)
+                        .order_by(Message.id.desc()).limit(50)
+                    ).all()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def run_once(self):
+        """Apply the policy once and return the report."""
+        started = time.monotonic()
+        sqlite = db.engine.dialect.name == 'sqlite'
+        report = {
+            'finished_at': None,
+            'compressed_rows': 0,
+            'pruned_rows': 0,
+            'markdown_rows': 0,
+            'payload_bytes_saved': 0,
+            'pages_released': None,
+            'file_bytes_before': self.file_size() if sqlite else None,
+            'file_bytes_after': None,
+            'probe_ms_before': round(self.probe(), 3),
+            'probe_ms_after': None,
+        }
+        now = datetime.utcnow()
+        for table_name in TABLES:
+            if Config.RETENTION_COMPRESS_DAYS > 0:
+                rows, saved = self._sweep('compress', table_name, now - timedelta(days=Config.RETENTION_COMPRESS_DAYS), pack_payload)
+                report['compressed_rows'] += rows
+                report['payload_bytes_saved'] += saved
+                RETENTION_BYTES.inc(saved, kind='compressed')
+            if Config.RETENTION_BODY_DAYS > 0:
+                rows, saved = self._sweep('prune', table_name, now - timedelta(days=Config.RETENTION_BODY_DAYS), strip_bodies)
+                report['pruned_rows'] += rows
+                report['payload_bytes_saved'] += saved
+                RETENTION_BYTES.inc(saved, kind='pruned')
+        report['markdown_rows'] = self._backfill()
+        if sqlite:
+            report['pages_released'] = self._vacuum()
+            report['file_bytes_after'] = self.file_size()
+            RETENTION_BYTES.inc(max(report['file_bytes_before'] - report['file_bytes_after'], 0), kind='file')
+        report['probe_ms_after'] = round(self.probe(), 3)
+        report['duration_s'] = round(time.monotonic() - started, 3)
+        report['finished_at'] = datetime.utcnow().isoformat()
+        if self.store is not None:
+            self.store.cache_set(REPORT_KEY, report, STATE_TTL)
+            self.store.purge_expired()
+        return report
+
+    def _run(self):
+        # Renewed after every batch, so this only has to outlast the longest batch and pause
+        lease_ttl = min(self.interval / 2, 600)
+        while not self._stop.wait(self.interval):
+            if self.store is not None and not self.store.try_lease('retention', os.getpid(), ttl=lease_ttl):
+                # Another worker has this interval
+                continue
+            self._lease_ttl = lease_ttl if self.store is not None else None
+            try:
+                with self.app.app_context():
+                    report = self.run_once()
+                print(f"Retention: {report['compressed_rows']} payloads compressed, {report['pruned_rows']} pruned, "
+                      f"{report['payload_bytes_saved']} bytes saved, file {report['file_bytes_before']} -> "
+                      f"{report['file_bytes_after']} bytes, probe {report['probe_ms_before']} -> {report['probe_ms_after']} ms")
+            except Exception as e:
+                print(f"Error applying retention policy: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='retention', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def last_report(store=SHARED):
+    return store.cache_get(REPORT_KEY) if store is not None else None
+
+
+def start_retention(app):
+    """Start the background retention task if RETENTION_ENABLED; returns it or None."""
+    if not Config.RETENTION_ENABLED:
+        return None
+    return RetentionTask(app).start()
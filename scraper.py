@@ -1,366 +1,678 @@
+import atexit
+import os
+import threading
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import random
 import re
+from urllib.parse import urlsplit
+from metrics import span, current_trace, SOURCE_RESULTS, DEEP_SEARCH_STOPS, DEEP_SEARCH_SKIPPED_PHASES, HEADLINE_LOOKUPS, HTTP_BYTES
+from profiler import profile_thread
+from ranking import rank_results, EvidencePolicy
+from config import Config
+from headlines import HEADLINE_STORE
+from shared import SHARED
+from records import SourceResult
+from politeness import LIMITER, HostBusyError, host_key
+
+# selenium, webdriver_manager, requests and bs4 are imported on first use, so
+# importing this module (and plain chat) never pays for them
+
+class By:
+    """Selenium locator strategies (same values as selenium's By) without importing selenium."""
+    CSS_SELECTOR = "css selector"
+    TAG_NAME = "tag name"
+
+# Direct-scrape configuration for the major Indian news sources
+SOURCE_CONFIGS = {
+    "times_of_india": {
+        "url": "https://timesofindia.indiatimes.com/india",
+        "article_selector": ".w_tle, .list5 li, .w_img_title",
+        "title_selector": "h3, a span, figcaption",
+        "link_selector": "a",
+        "base_url": "https://timesofindia.indiatimes.com"
+    },
+    "hindustan_times": {
+        "url": "https://www.hindustantimes.com/latest-news",
+        "article_selector": ".hdg3, .media, .storyCard, .cartHolder",
+        "title_selector": "h3, .hdg3-text, .media-heading",
+        "link_selector": "a",
+        "base_url": "https://www.hindustantimes.com"
+    },
+    "the_hindu": {
+        "url": "https://www.thehindu.com/latest-news/",
+        "article_selector": ".element, .story-card, .story-card-33, .ES2-100x4-text1",
+        "title_selector": "h3, .title, .card-title",
+        "link_selector": "a",
+        "base_url": "https://www.thehindu.com"
+    },
+    "ndtv": {
+        "url": "https://www.ndtv.com/india",
+        "article_selector": ".news_item, .lisingNews, .new_storylisting_img, .src_itm-ptb",
+        "title_selector": "h2, .newsHdng, .item-title",
+        "link_selector": "a",
+        "base_url": "https://www.ndtv.com"
+    },
+    "india_today": {
+        "url": "https://www.indiatoday.in/india",
+        "article_selector": ".detail, .B1S3_story__card, .catagory-listing, .view-content",
+        "title_selector": ".title, h3, .section_title",
+        "link_selector": "a",
+        "base_url": "https://www.indiatoday.in"
+    }
+}
+
+# Search configuration for technical learning platforms; {query} is filled in per request
+TECH_SOURCE_CONFIGS = {
+    "geeksforgeeks": {
+        "search_url": "https://www.geeksforgeeks.org/search/?q={query}",
+        "result_selector": ".article-card, .gfg_home_page_article_card, .g-card, .gs-webResult",
+        "title_selector": "a.gs-title, .title, h2, .head",
+        "link_selector": "a.gs-title, .title a, h2 a, a.head",
+        "snippet_selector": ".gs-snippet, .content, .entry-content, .text",
+        "base_url": "https://www.geeksforgeeks.org"
+    },
+    "javatpoint": {
+        "search_url": "https://www.javatpoint.com/search.php?search={query}",
+        "result_selector": "tr.mx-auto, .gsc-webResult, .gs-webResult",
+        "title_selector": "a.gsc-result-info-title, .gs-title, .link-title, h3",
+        "link_selector": "a.gsc-result-info-title, .gs-title, h3 a",
+        "snippet_selector": ".gs-snippet, .gsc-table-result, .overview",
+        "base_url": "https://www.javatpoint.com"
+    },
+    "tutorialspoint": {
+        "search_url": "https://www.tutorialspoint.com/search.htm?search={query}",
+        "result_selector": ".gsc-webResult, .result-box, .search_result",
+        "title_selector": ".gs-title, .result-title, h3 a",
+        "link_selector": ".gs-title a, .result-title a",
+        "snippet_selector": ".gs-snippet, .result-text",
+        "base_url": "https://www.tutorialspoint.com"
+    },
+    "w3schools": {
+        "search_url": "https://www.w3schools.com/search.php?q={query}",
+        "result_selector": ".search_item, .gs-webResult, .ws-table-all tr",
+        "title_selector": ".search_item_title, .gs-title, td a",
+        "link_selector": ".search_item_title a, .gs-title a",
+        "snippet_selector": ".search_item_text, .gs-snippet",
+        "base_url": "https://www.w3schools.com"
+    },
+    "stackoverflow": {
+        "search_url": "https://stackoverflow.com/search?q={query}",
+        "result_selector": ".s-post-summary, .question-summary, .search-result",
+        "title_selector": "h3 a, .question-hyperlink, .result-link a",
+        "link_selector": "h3 a, .question-hyperlink, .result-link a",
+        "snippet_selector": ".s-post-summary--content-excerpt, .excerpt, .result-excerpt",
+        "base_url": "https://stackoverflow.com"
+    },
+    "github": {
+        "search_url": "https://github.com/search?q={query}&type=repositories",
+        "result_selector": ".repo-list-item, .hx_hit-repo, .Code-searchResults-result",
+        "title_selector": "a.v-align-middle, .hx_hit-repo-path, h3 a",
+        "link_selector": "a.v-align-middle, .hx_hit-repo-path, h3 a",
+        "snippet_selector": "p.mb-1, .hx_hit-repo-desc, .description",
+        "base_url": "https://github.com"
+    },
+    "mdn": {
+        "search_url": "https://developer.mozilla.org/en-US/search?q={query}",
+        "result_selector": ".result, .search-result, .search-results-entry",
+        "title_selector": ".result-title, h3 a, .entry-title",
+        "link_selector": ".result-title a, h3 a, .entry-title a",
+        "snippet_selector": ".result-excerpt, .search-item-excerpt, .entry-summary",
+        "base_url": "https://developer.mozilla.org"
+    },
+    "freecodecamp": {
+        "search_url": "https://www.freecodecamp.org/news/?s={query}",
+        "result_selector": "article, .article-card, .post-card",
+        "title_selector": "h2.title, .post-card-title, .post-title",
+        "link_selector": "h2.title a, .post-card-title a",
+        "snippet_selector": ".excerpt, .post-card-excerpt, .post-excerpt",
+        "base_url": "https://www.freecodecamp.org"
+    },
+    "dev_to": {
+        "search_url": "https://dev.to/search?q={query}",
+        "result_selector": ".crayons-story, .search-results-item, .single-article",
+        "title_selector": "h2 a, .crayons-story__title a, .title a",
+        "link_selector": "h2 a, .crayons-story__title a",
+        "snippet_selector": ".crayons-story__snippet, .body, .content",
+        "base_url": "https://dev.to"
+    },
+    "python_docs": {
+        "search_url": "https://docs.python.org/3/search.html?q={query}&check_keywords=yes&area=default",
+        "result_selector": "ul.search li, .search-result, .search-item",
+        "title_selector": "a, .search-title, .result-title",
+        "link_selector": "a, .search-title a",
+        "snippet_selector": ".context, .search-summary, .result-context",
+        "base_url": "https://docs.python.org/3"
+    }
+}
+
+# Sites searched through Google News when direct sources don't yield enough results
+TECH_SEARCH_SITES = [
+    "geeksforgeeks.org",
+    "javatpoint.com",
+    "tutorialspoint.com",
+    "w3schools.com",
+    "stackoverflow.com",
+    "github.com",
+    "developer.mozilla.org",
+    "freecodecamp.org",
+    "dev.to",
+    "docs.python.org"
+]
+
+NEWS_SEARCH_SITES = [
+    "timesofindia.indiatimes.com",
+    "hindustantimes.com", 
+    "thehindu.com",
+    "ndtv.com",
+    "indiatoday.in",
+    "indianexpress.com",
+    "news18.com",
+    "economictimes.indiatimes.com",
+    "bbc.com/news/world/asia/india",
+    "livemint.com"
+]
+
+def encode_search_query(query, current_time):
+    """Add freshness hints to a query and encode it for search URLs."""
+    # Handle "today news" query specifically
+    if query.lower() == "today news" or query.lower() == "latest news":
+        query = "latest news today"
+        # Add date to ensure freshness
+        query += f" {current_time.strftime('%B %d %Y')}"
+    
+    # Always add freshness indicators to query
+    if "latest" not in query.lower() and "recent" not in query.lower():
+        query += " latest"
+    
+    return query.replace(' ', '+')
+
+def tech_search_url(source_name, query):
+    """Search page URL for a technical source."""
+    return TECH_SOURCE_CONFIGS[source_name]["search_url"].format(query=query.replace(' ', '+'))
+
+def is_general_news_query(query):
+    """Whether the query asks for general headlines rather than a topic."""
+    general_news_keywords = ["today news", "latest news", "india news", "current news", 
+                             "breaking news", "top news", "recent news", "headlines"]
+    query_lower = query.lower()
+    return any(keyword in query_lower for keyword in general_news_keywords)
+
+def site_search_url(encoded_query, site):
+    """Google News search URL restricted to one site."""
+    return f"https://www.google.com/search?q={encoded_query} site:{site}&tbm=nws"
+
+def general_search_urls(encoded_query):
+    """Search engine URLs used for the general news fallback."""
+    return [
+        f"https://www.google.com/search?q={encoded_query}&tbm=nws",
+        f"https://news.google.com/search?q={encoded_query}&hl=en-US"
+    ]
+
+_driver_path_lock = threading.Lock()
+_driver_path_resolved = False
+
+def chromedriver_path():
+    """
+    Path of the chromedriver binary, resolved through webdriver_manager once per
+    process (or taken from CHROME_DRIVER_PATH); '' if it could not be resolved.
+    """
+    global _driver_path_resolved
+    with _driver_path_lock:
+        if not Config.CHROME_DRIVER_PATH and not _driver_path_resolved:
+            _driver_path_resolved = True
+            try:
+                from webdriver_manager.chrome import ChromeDriverManager
+                # Exported so processes started from this one skip the lookup too
+                Config.CHROME_DRIVER_PATH = os.environ['CHROME_DRIVER_PATH'] = ChromeDriverManager().install()
+            except Exception as e:
+                print(f"Error resolving chromedriver: {e}")
+        return Config.CHROME_DRIVER_PATH
+
+# Scrapers with a running Chrome in this process, quit on shutdown (see close_all_scrapers)
+_open_scrapers = set()
+_open_scrapers_lock = threading.Lock()
+
+def close_all_scrapers():
+    """Quit every Chrome this process still has open."""
+    with _open_scrapers_lock:
+        scrapers = list(_open_scrapers)
+    for scraper in scrapers:
+        try:
+            scraper.close()
+        except Exception as e:
+            print(f"Error closing Chrome driver: {e}")
+
+atexit.register(close_all_scrapers)
 
 class WebScraper:
-    def __init__(self):
-        """Initialize the WebScraper with Chrome webdriver."""
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
+    def __init__(self, url_rewriter=None, recorder=None, seed=None, wait_scale=1.0,
+                 headline_store=HEADLINE_STORE, article_cache=SHARED, limiter=LIMITER, max_host_wait=None):
+        """
+        Initialize the WebScraper. Chrome is started on first use.
         
+        url_rewriter maps every outgoing URL (e.g. onto a local replay server),
+        recorder captures fetched pages into a fixture archive, seed makes source
+        shuffling reproducible and wait_scale scales the fixed page-load waits.
+        headline_store serves general-news sources prefetched in the background
+        (None always scrapes live), article_cache shares article bodies between
+        workers (None disables it) and limiter paces requests per host across
+        all workers (None disables it, e.g. against a replay server);
+        max_host_wait overrides how long a fetch may queue for its host.
+        """
+        self.url_rewriter = url_rewriter
+        self.recorder = recorder
+        self.random = random.Random(seed)
+        self.wait_scale = wait_scale
+        self.headline_store = headline_store
+        self.limiter = limiter
+        self.max_host_wait = max_host_wait
+        self.article_cache = article_cache
+        # Query being scraped, so block-page detection can ignore text that echoes it
+        self._query = ''
+        # Early-exit report of the last scrape_news run (see ranking.EvidencePolicy)
+        self.last_report = None
+        # Hosts the limiter turned away during the current scrape_news run
+        self._hosts_skipped = set()
+        self._driver = None
+        # Kept open across scrape_news calls while used as a context manager
+        self.persistent = False
+        # Article bodies and direct-source listings already fetched by this
+        # scraper, so queries sharing it never fetch the same URL twice
+        self._content_cache = {}
+        self._direct_cache = {}
+        self.fetch_stats = {'fetched': 0, 'cache_hits': 0, 'revalidated': 0, 'bytes_saved': 0}
+    
+    @property
+    def driver(self):
+        # Started lazily so runs answered from the headline store never launch Chrome
+        if self._driver is None:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+            from selenium.webdriver.chrome.service import Service
+            
+            chrome_options = Options()
+            chrome_options.add_argument("--headless")
+            chrome_options.add_argument("--disable-gpu")
+            chrome_options.add_argument("--no-sandbox")
+            chrome_options.add_argument("--disable-dev-shm-usage")
+            
+            with span('driver_init', source=''):
+                try:
+                    driver_path = chromedriver_path()
+                    if not driver_path:
+                        raise RuntimeError("chromedriver binary not available")
+                    self._driver = webdriver.Chrome(
+                        service=Service(driver_path),
+                        options=chrome_options
+                    )
+                except Exception as e:
+                    print(f"Error initializing Chrome driver: {e}")
+                    # Fallback to simple Chrome initialization
+                    self._driver = webdriver.Chrome(options=chrome_options)
+            self._track(self._driver)
+        return self._driver
+    
+    def _track(self, driver):
+        # Register chromedriver so its browser is reaped even if this process dies
+        with _open_scrapers_lock:
+            _open_scrapers.add(self)
         try:
-            self.driver = webdriver.Chrome(
-                service=Service(ChromeDriverManager().install()),
-                options=chrome_options
-            )
+            SHARED.register_browser(driver.service.process.pid)
         except Exception as e:
-            print(f"Error initializing Chrome driver: {e}")
-            # Fallback to simple Chrome initialization
-            self.driver = webdriver.Chrome(options=chrome_options)
+            print(f"Error registering Chrome driver: {e}")
     
-    def scrape_news_content(self, url):
-        """Scrape content from a news article URL."""
+    def close(self):
+        """Quit Chrome if it was started."""
+        driver, self._driver = self._driver, None
+        if driver is None:
+            return
+        with _open_scrapers_lock:
+            _open_scrapers.discard(self)
         try:
-            # First try with requests + BeautifulSoup as it's faster
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+            pid = driver.service.process.pid
+        except Exception:
+            pid = None
+        driver.quit()
+        if pid is not None:
+            SHARED.unregister_browser(pid)
+    
+    def __enter__(self):
+        self.persistent = True
+        return self
+    
+    def __exit__(self, *exc):
+        self.persistent = False
+        self.close()
+    
+    def _resolve(self, url):
+        return self.url_rewriter(url) if self.url_rewriter else url
+    
+    def _pace(self, url):
+        """Wait for the host's turn under the shared per-host limiter; raises HostBusyError if it is throttled."""
+        if self.limiter:
+            with span('host_wait'):
+                try:
+                    self.limiter.acquire(url, self.max_host_wait)
+                except HostBusyError:
+                    self._hosts_skipped.add(host_key(url))
+                    raise
+    
+    def _schedule(self, items, url_of):
+        """Items in the order the limiter can serve their hosts soonest (as given without a limiter)."""
+        return self.limiter.schedule(items, url_of) if self.limiter else iter(items)
+    
+    def _navigate(self, url, wait):
+        """Load a page in the browser and wait for it to render."""
+        self._pace(url)
+        with span('page_load'):
+            self.driver.get(self._resolve(url))
+        with span('page_wait'):
+            time.sleep(wait * self.wait_scale)
+        if self.limiter:
+            # The browser exposes no status code; block pages show up as a redirect or title
+            self.limiter.report(url, title=self.driver.title, final_url=self.driver.current_url, query=self._query)
+        if self.recorder:
+            self.recorder.record(url, self.driver.page_source, rendered=True)
+    
+    def _http_get(self, url, timeout=10, headers=None):
+        """Plain HTTP fetch, bypassing the browser, with gzip (and brotli, if installed) negotiated."""
+        self._pace(url)
+        import requests
+        from urllib3.util.request import ACCEPT_ENCODING
+        with span('http_fetch'):
+            response = requests.get(self._resolve(url), timeout=timeout,
+                                    headers={'Accept-Encoding': ACCEPT_ENCODING, **(headers or {})})
+        if self.limiter:
+            self.limiter.report(url, status=response.status_code,
+                                retry_after=response.headers.get('Retry-After'),
+                                final_url=response.url, query=self._query)
+        if self.recorder and response.status_code == 200:
+            self.recorder.record(url, response.text)
+        return response
+    
+    def _count_bytes(self, url, kind, amount):
+        if amount > 0:
+            HTTP_BYTES.inc(amount, source=host_key(url), kind=kind)
+            if kind.startswith('saved'):
+                self.fetch_stats['bytes_saved'] += amount
+    
+    def scrape_news_content(self, url):
+        """Scrape content from a news article URL, at most once per scraper."""
+        if url in self._content_cache:
+            self.fetch_stats['cache_hits'] += 1
+            return self._content_cache[url]
+        entry = self.article_cache.cache_get(f"article:{url}") if self.article_cache else None
+        if not isinstance(entry, dict):
+            entry = None
+        if entry and time.time() - entry['fetched_at'] < Config.ARTICLE_CACHE_TTL:
+            self.fetch_stats['cache_hits'] += 1
+            content = entry['content']
+        else:
+            self.fetch_stats['fetched'] += 1
+            content, validators = self._scrape_news_content(url, entry)
+            # Failures are only remembered by this scraper, so other requests retry them
+            if self.article_cache and not content.startswith('Could not extract content'):
+                # Kept past its freshness so a stale body can still be revalidated with a 304
+                self.article_cache.cache_set(f"article:{url}", {
+                    'content': content, 'fetched_at': time.time(), **validators
+                }, Config.ARTICLE_REVALIDATE_TTL)
+        self._content_cache[url] = content
+        return content
+    
+    def _scrape_news_content(self, url, cached=None):
+        """Fetch an article body; returns (content, validators), revalidating `cached` when given."""
+        from bs4 import BeautifulSoup
+        with span('content_fetch'):
+            try:
+                # First try with requests + BeautifulSoup as it's faster
+                headers = {}
+                if cached and cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached and cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
+                response = self._http_get(url, timeout=10, headers=headers)
+                if response.status_code == 304 and headers:
+                    self.fetch_stats['revalidated'] += 1
+                    self._count_bytes(url, 'saved_revalidation', cached.get('size', 0))
+                    return cached['content'], {k: cached[k] for k in ('etag', 'last_modified', 'size') if k in cached}
+                if response.status_code == 200:
+                    size = len(response.content)
+                    # Bytes actually read off the wire, before decompression
+                    transferred = response.raw.tell() or int(response.headers.get('Content-Length') or size)
+                    self._count_bytes(url, 'transferred', transferred)
+                    self._count_bytes(url, 'saved_compression', size - transferred)
+                    validators = {'size': size}
+                    if response.headers.get('ETag'):
+                        validators['etag'] = response.headers['ETag']
+                    if response.headers.get('Last-Modified'):
+                        validators['last_modified'] = response.headers['Last-Modified']
+                    soup = BeautifulSoup(response.text, 'html.parser')
                 
-                # Look for article content in common containers
-                content = ""
-                for selector in ['article', '.article-content', '.story-body', '.entry-content', 'main', '.content']:
-                    elements = soup.select(selector)
-                    if elements:
-                        paragraphs = elements[0].find_all('p')
-                        if paragraphs:
-                            content = ' '.join([p.text for p in paragraphs])
-                            break
+                    # Look for article content in common containers
+                    content = ""
+                    for selector in ['article', '.article-content', '.story-body', '.entry-content', 'main', '.content']:
+                        elements = soup.select(selector)
+                        if elements:
+                            paragraphs = elements[0].find_all('p')
+                            if paragraphs:
+                                content = ' '.join([p.text for p in paragraphs])
+                                break
                 
-                # If we found content, return it
-                if content:
-                    return content
+                    # If we found content, return it
+                    if content:
+                        return content, validators
             
-            # If requests approach failed, try with Selenium
-            self.driver.get(url)
-            time.sleep(3)  # Wait for page to load
+                # If requests approach failed, try with Selenium
+                self._navigate(url, wait=3)
             
-            # Look for article content with Selenium
-            for selector in ['article', '.article-content', '.story-body', '.entry-content', 'main', '.content']:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements:
-                        paragraphs = elements[0].find_elements(By.TAG_NAME, 'p')
-                        if paragraphs:
-                            return ' '.join([p.text for p in paragraphs])
-                except:
-                    continue
+                # Look for article content with Selenium
+                for selector in ['article', '.article-content', '.story-body', '.entry-content', 'main', '.content']:
+                    try:
+                        elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                        if elements:
+                            paragraphs = elements[0].find_elements(By.TAG_NAME, 'p')
+                            if paragraphs:
+                                return ' '.join([p.text for p in paragraphs]), {}
+                    except:
+                        continue
             
-            # Last resort: grab whatever text we can
-            body = self.driver.find_element(By.TAG_NAME, 'body')
-            paragraphs = body.find_elements(By.TAG_NAME, 'p')
-            if paragraphs:
-                return ' '.join([p.text for p in paragraphs[:10]])  # Limit to first 10 paragraphs
-            else:
-                return body.text[:3000]  # Get first 3000 chars of body
+                # Last resort: grab whatever text we can
+                body = self.driver.find_element(By.TAG_NAME, 'body')
+                paragraphs = body.find_elements(By.TAG_NAME, 'p')
+                if paragraphs:
+                    return ' '.join([p.text for p in paragraphs[:10]]), {}  # Limit to first 10 paragraphs
+                else:
+                    return body.text[:3000], {}  # Get first 3000 chars of body
                 
-        except Exception as e:
-            print(f"Error scraping content from {url}: {e}")
-            return f"Could not extract content from this source. Error: {str(e)}"
+            except Exception as e:
+                print(f"Error scraping content from {url}: {e}")
+                return f"Could not extract content from this source. Error: {str(e)}", {}
 
     def scrape_direct_from_source(self, source_name):
         """Scrape news directly from specific news sources"""
-        try:
-            source_configs = {
-                "times_of_india": {
-                    "url": "https://timesofindia.indiatimes.com/india",
-                    "article_selector": ".w_tle, .list5 li, .w_img_title",
-                    "title_selector": "h3, a span, figcaption",
-                    "link_selector": "a",
-                    "base_url": "https://timesofindia.indiatimes.com"
-                },
-                "hindustan_times": {
-                    "url": "https://www.hindustantimes.com/latest-news",
-                    "article_selector": ".hdg3, .media, .storyCard, .cartHolder",
-                    "title_selector": "h3, .hdg3-text, .media-heading",
-                    "link_selector": "a",
-                    "base_url": "https://www.hindustantimes.com"
-                },
-                "the_hindu": {
-                    "url": "https://www.thehindu.com/latest-news/",
-                    "article_selector": ".element, .story-card, .story-card-33, .ES2-100x4-text1",
-                    "title_selector": "h3, .title, .card-title",
-                    "link_selector": "a",
-                    "base_url": "https://www.thehindu.com"
-                },
-                "ndtv": {
-                    "url": "https://www.ndtv.com/india",
-                    "article_selector": ".news_item, .lisingNews, .new_storylisting_img, .src_itm-ptb",
-                    "title_selector": "h2, .newsHdng, .item-title",
-                    "link_selector": "a",
-                    "base_url": "https://www.ndtv.com"
-                },
-                "india_today": {
-                    "url": "https://www.indiatoday.in/india",
-                    "article_selector": ".detail, .B1S3_story__card, .catagory-listing, .view-content",
-                    "title_selector": ".title, h3, .section_title",
-                    "link_selector": "a",
-                    "base_url": "https://www.indiatoday.in"
-                }
-            }
-            
-            source_config = source_configs.get(source_name)
-            if not source_config:
-                return []
+        if source_name in self._direct_cache:
+            return self._direct_cache[source_name]
+        results = self._scrape_direct_from_source(source_name)
+        if results:
+            self._direct_cache[source_name] = results
+        return results
+    
+    def _scrape_direct_from_source(self, source_name):
+        with span('source_scrape', source=source_name):
+            try:
+                source_config = SOURCE_CONFIGS.get(source_name)
+                if not source_config:
+                    return []
                 
-            self.driver.get(source_config["url"])
-            time.sleep(3)  # Wait for page to load
+                self._navigate(source_config["url"], wait=3)
             
-            # Find articles
-            articles = self.driver.find_elements(By.CSS_SELECTOR, source_config["article_selector"])
-            results = []
+                # Find articles
+                articles = self.driver.find_elements(By.CSS_SELECTOR, source_config["article_selector"])
+                results = []
             
-            # Process up to 5 articles
-            for article in articles[:5]:
-                try:
-                    # Get title
-                    title_elem = None
+                # Process up to 5 articles
+                for article in articles[:5]:
                     try:
-                        title_elem = article.find_element(By.CSS_SELECTOR, source_config["title_selector"])
-                    except:
-                        continue
+                        # Get title
+                        title_elem = None
+                        try:
+                            title_elem = article.find_element(By.CSS_SELECTOR, source_config["title_selector"])
+                        except:
+                            continue
                         
-                    title = title_elem.text.strip()
-                    if not title:
-                        continue
+                        title = title_elem.text.strip()
+                        if not title:
+                            continue
                     
-                    # Get link
-                    link_elem = article.find_element(By.CSS_SELECTOR, source_config["link_selector"])
-                    link = link_elem.get_attribute('href')
+                        # Get link
+                        link_elem = article.find_element(By.CSS_SELECTOR, source_config["link_selector"])
+                        link = link_elem.get_attribute('href')
                     
-                    if not link:
-                        continue
+                        if not link:
+                            continue
                         
-                    # Make sure it's an absolute URL
-                    if link.startswith('/'):
-                        link = source_config["base_url"] + link
+                        # Make sure it's an absolute URL
+                        if link.startswith('/'):
+                            link = source_config["base_url"] + link
                     
-                    # Get content
-                    content = self.scrape_news_content(link)
+                        # Get content
+                        content = self.scrape_news_content(link)
                     
-                    # Format source name for display
-                    display_name = source_name.replace('_', ' ').title()
+                        # Format source name for display
+                        display_name = source_name.replace('_', ' ').title()
                     
-                    results.append({
-                        'title': title,
-                        'link': link,
-                        'source': display_name,
-                        'time': f"Recent - {datetime.now().strftime('%B %d, %Y')}",
-                        'content': content
-                    })
+                        results.append(SourceResult(
+                            title=title,
+                            link=link,
+                            source=display_name,
+                            time=f"Recent - {datetime.now().strftime('%B %d, %Y')}",
+                            content=content
+                        ))
                     
-                except Exception as e:
-                    print(f"Error scraping article from {source_name}: {e}")
-                    continue
+                    except Exception as e:
+                        print(f"Error scraping article from {source_name}: {e}")
+                        continue
                     
-            return results
+                SOURCE_RESULTS.inc(len(results), source=source_name)
+                return results
             
-        except Exception as e:
-            print(f"Error scraping from {source_name}: {e}")
-            return []
+            except Exception as e:
+                print(f"Error scraping from {source_name}: {e}")
+                return []
+
+    def stored_headlines(self, source_name):
+        """Prefetched articles for a direct-scrape source, or None if the store is stale or off."""
+        if self.headline_store is None:
+            return None
+        with span('headline_store', source=source_name):
+            articles = self.headline_store.fresh(source_name)
+        HEADLINE_LOOKUPS.inc(source=source_name, result='miss' if articles is None else 'hit')
+        if articles is None:
+            return None
+        print(f"Serving {len(articles)} prefetched articles from {source_name}")
+        return [SourceResult.from_dict(article) for article in articles]
 
     def scrape_technical_source(self, source_name, query):
         """Scrape content from technical learning platforms"""
-        try:
-            # Technical sources configuration
-            tech_source_configs = {
-                "geeksforgeeks": {
-                    "search_url": f"https://www.geeksforgeeks.org/search/?q={query.replace(' ', '+')}",
-                    "result_selector": ".article-card, .gfg_home_page_article_card, .g-card, .gs-webResult",
-                    "title_selector": "a.gs-title, .title, h2, .head",
-                    "link_selector": "a.gs-title, .title a, h2 a, a.head",
-                    "snippet_selector": ".gs-snippet, .content, .entry-content, .text",
-                    "base_url": "https://www.geeksforgeeks.org"
-                },
-                "javatpoint": {
-                    "search_url": f"https://www.javatpoint.com/search.php?search={query.replace(' ', '+')}",
-                    "result_selector": "tr.mx-auto, .gsc-webResult, .gs-webResult",
-                    "title_selector": "a.gsc-result-info-title, .gs-title, .link-title, h3",
-                    "link_selector": "a.gsc-result-info-title, .gs-title, h3 a",
-                    "snippet_selector": ".gs-snippet, .gsc-table-result, .overview",
-                    "base_url": "https://www.javatpoint.com"
-                },
-                "tutorialspoint": {
-                    "search_url": f"https://www.tutorialspoint.com/search.htm?search={query.replace(' ', '+')}",
-                    "result_selector": ".gsc-webResult, .result-box, .search_result",
-                    "title_selector": ".gs-title, .result-title, h3 a",
-                    "link_selector": ".gs-title a, .result-title a",
-                    "snippet_selector": ".gs-snippet, .result-text",
-                    "base_url": "https://www.tutorialspoint.com"
-                },
-                "w3schools": {
-                    "search_url": f"https://www.w3schools.com/search.php?q={query.replace(' ', '+')}",
-                    "result_selector": ".search_item, .gs-webResult, .ws-table-all tr",
-                    "title_selector": ".search_item_title, .gs-title, td a",
-                    "link_selector": ".search_item_title a, .gs-title a",
-                    "snippet_selector": ".search_item_text, .gs-snippet",
-                    "base_url": "https://www.w3schools.com"
-                },
-                "stackoverflow": {
-                    "search_url": f"https://stackoverflow.com/search?q={query.replace(' ', '+')}",
-                    "result_selector": ".s-post-summary, .question-summary, .search-result",
-                    "title_selector": "h3 a, .question-hyperlink, .result-link a",
-                    "link_selector": "h3 a, .question-hyperlink, .result-link a",
-                    "snippet_selector": ".s-post-summary--content-excerpt, .excerpt, .result-excerpt",
-                    "base_url": "https://stackoverflow.com"
-                },
-                "github": {
-                    "search_url": f"https://github.com/search?q={query.replace(' ', '+')}&type=repositories",
-                    "result_selector": ".repo-list-item, .hx_hit-repo, .Code-searchResults-result",
-                    "title_selector": "a.v-align-middle, .hx_hit-repo-path, h3 a",
-                    "link_selector": "a.v-align-middle, .hx_hit-repo-path, h3 a",
-                    "snippet_selector": "p.mb-1, .hx_hit-repo-desc, .description",
-                    "base_url": "https://github.com"
-                },
-                "mdn": {
-                    "search_url": f"https://developer.mozilla.org/en-US/search?q={query.replace(' ', '+')}",
-                    "result_selector": ".result, .search-result, .search-results-entry",
-                    "title_selector": ".result-title, h3 a, .entry-title",
-                    "link_selector": ".result-title a, h3 a, .entry-title a",
-                    "snippet_selector": ".result-excerpt, .search-item-excerpt, .entry-summary",
-                    "base_url": "https://developer.mozilla.org"
-                },
-                "freecodecamp": {
-                    "search_url": f"https://www.freecodecamp.org/news/?s={query.replace(' ', '+')}",
-                    "result_selector": "article, .article-card, .post-card",
-                    "title_selector": "h2.title, .post-card-title, .post-title",
-                    "link_selector": "h2.title a, .post-card-title a",
-                    "snippet_selector": ".excerpt, .post-card-excerpt, .post-excerpt",
-                    "base_url": "https://www.freecodecamp.org"
-                },
-                "dev_to": {
-                    "search_url": f"https://dev.to/search?q={query.replace(' ', '+')}",
-                    "result_selector": ".crayons-story, .search-results-item, .single-article",
-                    "title_selector": "h2 a, .crayons-story__title a, .title a",
-                    "link_selector": "h2 a, .crayons-story__title a",
-                    "snippet_selector": ".crayons-story__snippet, .body, .content",
-                    "base_url": "https://dev.to"
-                },
-                "python_docs": {
-                    "search_url": f"https://docs.python.org/3/search.html?q={query.replace(' ', '+')}&check_keywords=yes&area=default",
-                    "result_selector": "ul.search li, .search-result, .search-item",
-                    "title_selector": "a, .search-title, .result-title",
-                    "link_selector": "a, .search-title a",
-                    "snippet_selector": ".context, .search-summary, .result-context",
-                    "base_url": "https://docs.python.org/3"
-                }
-            }
-            
-            source_config = tech_source_configs.get(source_name)
-            if not source_config:
-                return []
+        self._query = query
+        with span('source_scrape', source=source_name):
+            try:
+                source_config = TECH_SOURCE_CONFIGS.get(source_name)
+                if not source_config:
+                    return []
                 
-            self.driver.get(source_config["search_url"])
-            time.sleep(3)  # Wait for page to load
+                self._navigate(tech_search_url(source_name, query), wait=3)
             
-            # Find result items
-            results_found = []
-            try:
-                result_elements = self.driver.find_elements(By.CSS_SELECTOR, source_config["result_selector"])
+                # Find result items
+                results_found = []
+                try:
+                    result_elements = self.driver.find_elements(By.CSS_SELECTOR, source_config["result_selector"])
                 
-                # Process up to 3 results per technical source
-                for result in result_elements[:3]:
-                    try:
-                        # Extract title
-                        title = None
-                        for title_selector in source_config["title_selector"].split(", "):
-                            try:
-                                title_elem = result.find_element(By.CSS_SELECTOR, title_selector)
-                                if title_elem and title_elem.text.strip():
-                                    title = title_elem.text.strip()
-                                    break
-                            except:
-                                continue
-                                
-                        if not title:
-                            continue
-                        
-                        # Extract link
-                        link = None
-                        for link_selector in source_config["link_selector"].split(", "):
-                            try:
-                                link_elem = result.find_element(By.CSS_SELECTOR, link_selector)
-                                if link_elem:
-                                    link = link_elem.get_attribute("href")
-                                    if link:
+                    # Process up to 3 results per technical source
+                    for result in result_elements[:3]:
+                        try:
+                            # Extract title
+                            title = None
+                            for title_selector in source_config["title_selector"].split(", "):
+                                try:
+                                    title_elem = result.find_element(By.CSS_SELECTOR, title_selector)
+                                    if title_elem and title_elem.text.strip():
+                                        title = title_elem.text.strip()
                                         break
-                            except:
-                                continue
+                                except:
+                                    continue
                                 
-                        if not link:
-                            # Try to find any link in the result
-                            links = result.find_elements(By.TAG_NAME, "a")
-                            if links:
-                                link = links[0].get_attribute("href")
-                            else:
+                            if not title:
                                 continue
+                        
+                            # Extract link
+                            link = None
+                            for link_selector in source_config["link_selector"].split(", "):
+                                try:
+                                    link_elem = result.find_element(By.CSS_SELECTOR, link_selector)
+                                    if link_elem:
+                                        link = link_elem.get_attribute("href")
+                                        if link:
+                                            break
+                                except:
+                                    continue
                                 
-                        # Make sure it's an absolute URL
-                        if link and link.startswith('/'):
-                            link = source_config["base_url"] + link
+                            if not link:
+                                # Try to find any link in the result
+                                links = result.find_elements(By.TAG_NAME, "a")
+                                if links:
+                                    link = links[0].get_attribute("href")
+                                else:
+                                    continue
+                                
+                            # Make sure it's an absolute URL
+                            if link and link.startswith('/'):
+                                link = source_config["base_url"] + link
                             
-                        # Extract snippet if available
-                        snippet = None
-                        for snippet_selector in source_config["snippet_selector"].split(", "):
-                            try:
-                                snippet_elem = result.find_element(By.CSS_SELECTOR, snippet_selector)
-                                if snippet_elem and snippet_elem.text.strip():
-                                    snippet = snippet_elem.text.strip()
-                                    break
-                            except:
-                                continue
+                            # Extract snippet if available
+                            snippet = None
+                            for snippet_selector in source_config["snippet_selector"].split(", "):
+                                try:
+                                    snippet_elem = result.find_element(By.CSS_SELECTOR, snippet_selector)
+                                    if snippet_elem and snippet_elem.text.strip():
+                                        snippet = snippet_elem.text.strip()
+                                        break
+                                except:
+                                    continue
                                 
-                        # Format source name for display
-                        display_name = source_name.replace('_', ' ').title()
+                            # Format source name for display
+                            display_name = source_name.replace('_', ' ').title()
                         
-                        # If we have a link, try to get full content
-                        if snippet and len(snippet) > 150:
-                            # If snippet is substantial, use it instead of making another request
-                            content = snippet
-                        else:
-                            # Otherwise get full content
-                            content = self.scrape_news_content(link)
+                            # If we have a link, try to get full content
+                            if snippet and len(snippet) > 150:
+                                # If snippet is substantial, use it instead of making another request
+                                content = snippet
+                            else:
+                                # Otherwise get full content
+                                content = self.scrape_news_content(link)
                             
-                        results_found.append({
-                            'title': title,
-                            'link': link,
-                            'source': f"{display_name} (Technical)",
-                            'time': f"Technical Resource - {datetime.now().strftime('%B %d, %Y')}",
-                            'content': content
-                        })
+                            results_found.append(SourceResult(
+                                title=title,
+                                link=link,
+                                source=f"{display_name} (Technical)",
+                                time=f"Technical Resource - {datetime.now().strftime('%B %d, %Y')}",
+                                content=content
+                            ))
                         
-                    except Exception as e:
-                        print(f"Error extracting result from {source_name}: {e}")
-                        continue
+                        except Exception as e:
+                            print(f"Error extracting result from {source_name}: {e}")
+                            continue
                         
-            except Exception as e:
-                print(f"Error finding results in {source_name}: {e}")
+                except Exception as e:
+                    print(f"Error finding results in {source_name}: {e}")
             
-            return results_found
+                SOURCE_RESULTS.inc(len(results_found), source=source_name)
+                return results_found
             
-        except Exception as e:
-            print(f"Error in scrape_technical_source for {source_name}: {e}")
-            return []
+            except Exception as e:
+                print(f"Error in scrape_technical_source for {source_name}: {e}")
+                return []
 
     def is_technical_query(self, query):
         """Determine if a query is likely to be technical in nature"""
@@ -403,7 +715,26 @@ class WebScraper:
                 
         return False
 
-    def scrape_news(self, query):
+    def _report(self, policy):
+        """Publish why scrape_news stopped and which phases it skipped."""
+        self.last_report = policy.report()
+        self.last_report['hosts_skipped'] = sorted(self._hosts_skipped)
+        print(f"Deep search stopped ({self.last_report['stop_reason']}) with evidence "
+              f"{self.last_report['evidence']}, coverage {self.last_report['coverage']}; "
+              f"skipped phases: {', '.join(policy.phases_skipped) or 'none'}")
+        DEEP_SEARCH_STOPS.inc(reason=self.last_report['stop_reason'])
+        for phase in policy.phases_skipped:
+            DEEP_SEARCH_SKIPPED_PHASES.inc(phase=phase)
+        trace = current_trace()
+        if trace is not None:
+            trace.annotate('deep_search', self.last_report)
+
+    @profile_thread
+    def scrape_news(self, query, cancel=None):
+        """Deep search for `query`; setting the `cancel` event stops it at the next checkpoint."""
+        self._query = query
+        self.last_report = None
+        self._hosts_skipped = set()
         try:
             # Add time parameter for fresh results
             current_time = datetime.now()
@@ -436,378 +767,329 @@ class WebScraper:
             # Check if this is a technical query
             is_tech_query = self.is_technical_query(query)
             
+            # Scores results as they arrive and decides when to stop scraping
+            policy = EvidencePolicy(query, is_tech_query, cancelled=cancel)
+            
             # For technical queries, prioritize technical sources
-            if is_tech_query:
+            if is_tech_query and policy.enter('technical_sources'):
                 print(f"Detected technical query: '{query}' - prioritizing technical sources")
                 
                 # Randomize the order of technical sources to vary results
-                random.shuffle(technical_sources)
+                self.random.shuffle(technical_sources)
                 
-                # Scrape from technical sources
-                for source in technical_sources[:5]:  # Limit to 5 sources to avoid too many requests
+                # Scrape from technical sources, idle hosts first
+                for source in self._schedule(technical_sources[:5], lambda name: tech_search_url(name, query)):  # Limit to 5 sources to avoid too many requests
                     print(f"Scraping technical content from {source}...")
                     tech_results = self.scrape_technical_source(source, query)
                     
                     if tech_results:
                         all_results.extend(tech_results)
+                        policy.extend(tech_results)
                         print(f"Found {len(tech_results)} results from {source}")
                         
-                    # If we have enough results, stop searching
-                    if len(all_results) >= 10:
+                    # If we have enough evidence, stop searching
+                    if policy.should_stop():
                         break
                         
             # If it's a general news query, include direct scraping from top sources
-            is_general_news_query = False
-            general_news_keywords = ["today news", "latest news", "india news", "current news", 
-                                     "breaking news", "top news", "recent news", "headlines"]
-                                     
-            for keyword in general_news_keywords:
-                if keyword in query.lower():
-                    is_general_news_query = True
-                    break
+            is_general_news = is_general_news_query(query)
             
             # For general news queries, directly scrape from top sources
-            if is_general_news_query:
+            if is_general_news and policy.enter('direct_sources'):
                 print("Detected general news query - scraping directly from top sources")
                 # Randomize the order of sources to vary results
-                random.shuffle(indian_news_sources)
+                self.random.shuffle(indian_news_sources)
                 
-                # Scrape from each source
-                for source in indian_news_sources:
-                    print(f"Scraping directly from {source}...")
-                    source_results = self.scrape_direct_from_source(source)
+                # Scrape from each source, preferring the warm headline store, idle hosts first
+                for source in self._schedule(indian_news_sources, lambda name: SOURCE_CONFIGS[name]["url"]):
+                    source_results = self.stored_headlines(source)
+                    if source_results is None:
+                        print(f"Scraping directly from {source}...")
+                        source_results = self.scrape_direct_from_source(source)
+                        if source_results and self.headline_store is not None:
+                            self.headline_store.save(source, source_results)
                     if source_results:
                         all_results.extend(source_results)
+                        policy.extend(source_results)
                         print(f"Found {len(source_results)} articles from {source}")
                     
-                    # If we have enough results, stop scraping
-                    if len(all_results) >= 20:
+                    # If we have enough evidence, stop scraping
+                    if policy.should_stop():
                         break
             
-            # Handle "today news" query specifically
-            if query.lower() == "today news" or query.lower() == "latest news":
-                query = "latest news today"
-                # Add date to ensure freshness
-                query += f" {current_time.strftime('%B %d %Y')}"
-            
-            # Always add freshness indicators to query
-            if "latest" not in query.lower() and "recent" not in query.lower():
-                query += " latest"
-
             # Encode the query for URL
-            encoded_query = query.replace(' ', '+')
+            encoded_query = encode_search_query(query, current_time)
             
-            # Add specific site search for major news sources if we need more results
-            if len(all_results) < 20:
+            # Add specific site search for major news sources if we need more evidence
+            if policy.enter('site_search'):
                 # Define sources to search based on query type
-                if is_tech_query:
-                    search_sites = [
-                        "geeksforgeeks.org",
-                        "javatpoint.com",
-                        "tutorialspoint.com",
-                        "w3schools.com",
-                        "stackoverflow.com",
-                        "github.com",
-                        "developer.mozilla.org",
-                        "freecodecamp.org",
-                        "dev.to",
-                        "docs.python.org"
-                    ]
-                else:
-                    search_sites = [
-                        "timesofindia.indiatimes.com",
-                        "hindustantimes.com", 
-                        "thehindu.com",
-                        "ndtv.com",
-                        "indiatoday.in",
-                        "indianexpress.com",
-                        "news18.com",
-                        "economictimes.indiatimes.com",
-                        "bbc.com/news/world/asia/india",
-                        "livemint.com"
-                    ]
+                search_sites = TECH_SEARCH_SITES if is_tech_query else NEWS_SEARCH_SITES
                 
                 # Search specifically on these sites
                 for site in search_sites[:5]:  # Limit to 5 sites
-                    site_query = f"{encoded_query} site:{site}"
-                    search_url = f"https://www.google.com/search?q={site_query}&tbm=nws"
-                    print(f"Searching for {'technical content' if is_tech_query else 'news'} on {site}...")
-                    
-                    self.driver.get(search_url)
-                    time.sleep(2)  # Shorter wait to avoid timeouts
+                    source_label = f"google:{site}"
+                    with span('source_scrape', source=source_label):
+                        results_before = len(all_results)
+                        search_url = site_search_url(encoded_query, site)
+                        print(f"Searching for {'technical content' if is_tech_query else 'news'} on {site}...")
                     
-                    # Try multiple possible selectors for news items
-                    selectors = ['.dbsr', 'g', '.mnr-c', 'article', '.ddle5', '.WlydOe', '.n6jlAc']
-                    news_items = []
-                    
-                    for selector in selectors:
                         try:
-                            elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                            if elements and len(elements) > 0:
-                                news_items = elements[:5]  # Limit to 5 news items per site
-                                print(f"Found {len(news_items)} items from {site}")
-                                break
-                        except:
+                            self._navigate(search_url, wait=2)  # Shorter wait to avoid timeouts
+                        except HostBusyError as e:
+                            print(f"Skipping {site}: {e}")
                             continue
                     
-                    # Process the news items
-                    for item in news_items:
-                        try:
-                            title = None
-                            link = None
-                            source = None
-                            time_posted = None
+                        # Try multiple possible selectors for news items
+                        selectors = ['.dbsr', 'g', '.mnr-c', 'article', '.ddle5', '.WlydOe', '.n6jlAc']
+                        news_items = []
+                    
+                        for selector in selectors:
+                            try:
+                                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                                if elements and len(elements) > 0:
+                                    news_items = elements[:5]  # Limit to 5 news items per site
+                                    print(f"Found {len(news_items)} items from {site}")
+                                    break
+                            except:
+                                continue
+                    
+                        # Process the news items
+                        for item in news_items:
+                            try:
+                                title = None
+                                link = None
+                                source = None
+                                time_posted = None
                             
-                            # Extract title with expanded selectors
-                            for title_selector in ['div.nDgy9d', 'h3', 'h4', '.JheGif', '.DY5T1d', '.vF3A6c']:
-                                try:
-                                    title_elem = item.find_element(By.CSS_SELECTOR, title_selector)
-                                    if title_elem:
-                                        title = title_elem.text
-                                        break
-                                except:
-                                    continue
+                                # Extract title with expanded selectors
+                                for title_selector in ['div.nDgy9d', 'h3', 'h4', '.JheGif', '.DY5T1d', '.vF3A6c']:
+                                    try:
+                                        title_elem = item.find_element(By.CSS_SELECTOR, title_selector)
+                                        if title_elem:
+                                            title = title_elem.text
+                                            break
+                                    except:
+                                        continue
                                     
-                            if not title:
-                                title = item.text.split('\n')[0] if item.text else "Untitled Article"
+                                if not title:
+                                    title = item.text.split('\n')[0] if item.text else "Untitled Article"
                                 
-                            # Extract link
-                            for link_selector in ['a', '.WlydOe', '.DY5T1d', '.tHmfQe']:
-                                try:
-                                    link_elem = item.find_element(By.CSS_SELECTOR, link_selector)
-                                    if link_elem:
-                                        link = link_elem.get_attribute('href')
-                                        break
-                                except:
-                                    continue
+                                # Extract link
+                                for link_selector in ['a', '.WlydOe', '.DY5T1d', '.tHmfQe']:
+                                    try:
+                                        link_elem = item.find_element(By.CSS_SELECTOR, link_selector)
+                                        if link_elem:
+                                            link = link_elem.get_attribute('href')
+                                            break
+                                    except:
+                                        continue
                                     
-                            if not link:
-                                links = item.find_elements(By.TAG_NAME, 'a')
-                                if links:
-                                    link = links[0].get_attribute('href')
-                                else:
-                                    continue
+                                if not link:
+                                    links = item.find_elements(By.TAG_NAME, 'a')
+                                    if links:
+                                        link = links[0].get_attribute('href')
+                                    else:
+                                        continue
                                     
-                            # Set source from the site we're searching
-                            source = site.replace("www.", "").replace(".com", "").replace(".in", "").replace(".org", "").title()
-                            if is_tech_query:
-                                source += " (Technical)"
+                                # Set source from the site we're searching
+                                source = site.replace("www.", "").replace(".com", "").replace(".in", "").replace(".org", "").title()
+                                if is_tech_query:
+                                    source += " (Technical)"
                                 
-                            # Extract time posted
-                            for time_selector in ['.WG9SHc span', '.ZE0LJd', '.LfVVr', 'time', '.OSrXXb']:
-                                try:
-                                    time_elem = item.find_element(By.CSS_SELECTOR, time_selector)
-                                    if time_elem:
-                                        time_posted = time_elem.text
-                                        break
-                                except:
-                                    continue
+                                # Extract time posted
+                                for time_selector in ['.WG9SHc span', '.ZE0LJd', '.LfVVr', 'time', '.OSrXXb']:
+                                    try:
+                                        time_elem = item.find_element(By.CSS_SELECTOR, time_selector)
+                                        if time_elem:
+                                            time_posted = time_elem.text
+                                            break
+                                    except:
+                                        continue
                                     
-                            time_posted = time_posted or f"Recent - {current_time.strftime('%B %d, %Y')}"
+                                time_posted = time_posted or f"Recent - {current_time.strftime('%B %d, %Y')}"
                             
-                            # Get content
-                            content = self.scrape_news_content(link)
+                                # Get content
+                                content = self.scrape_news_content(link)
                             
-                            # Check for duplicates
-                            duplicate = False
-                            for existing in all_results:
-                                if title.lower() == existing['title'].lower():
-                                    duplicate = True
-                                    break
+                                # Check for duplicates
+                                duplicate = False
+                                for existing in all_results:
+                                    if title.lower() == existing.title.lower():
+                                        duplicate = True
+                                        break
                                     
-                            if not duplicate:
-                                all_results.append({
-                                    'title': title,
-                                    'link': link,
-                                    'source': source,
-                                    'time': time_posted,
-                                    'content': content
-                                })
+                                if not duplicate:
+                                    result = SourceResult(
+                                        title=title,
+                                        link=link,
+                                        source=source,
+                                        time=time_posted,
+                                        content=content
+                                    )
+                                    all_results.append(result)
+                                    policy.add(result)
                                 
-                            # If we have enough results, break
-                            if len(all_results) >= 20:
-                                break
+                                # If we have enough evidence, break
+                                if policy.should_stop():
+                                    break
                                 
-                        except Exception as e:
-                            print(f"Error processing item from {site}: {e}")
-                            continue
+                            except Exception as e:
+                                print(f"Error processing item from {site}: {e}")
+                                continue
+                        SOURCE_RESULTS.inc(len(all_results) - results_before, source=source_label)
                     
-                    # If we have enough results, break
-                    if len(all_results) >= 20:
+                    # If we have enough evidence, break
+                    if policy.should_stop():
                         break
             
-            # If we still need more results, use the general approach
-            if len(all_results) < 15:
+            # If we still need more evidence, use the general approach
+            if policy.enter('general_search'):
                 # Try multiple search engines for more diverse sources
-                search_urls = [
-                    f"https://www.google.com/search?q={encoded_query}&tbm=nws",
-                    f"https://news.google.com/search?q={encoded_query}&hl=en-US"
-                ]
-                
-                for search_url in search_urls:
-                    self.driver.get(search_url)
-                    # Wait for page to load
-                    time.sleep(3)
-                    
-                    # Try multiple possible selectors for news items
-                    selectors = [
-                        '.dbsr', 'g', '.mnr-c', 'article', '.ddle5', '.WlydOe', '.n6jlAc',
-                        '.NiLAwe', '.DY5T1d', '.qLBgNd', '.IBr9hb'
-                    ]
-                    news_items = []
-
-                    for selector in selectors:
+                for search_url in self._schedule(general_search_urls(encoded_query), lambda url: url):
+                    source_label = f"google:{urlsplit(search_url).netloc}"
+                    with span('source_scrape', source=source_label):
+                        results_before = len(all_results)
+                        # Wait for page to load
                         try:
-                            elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                            if elements and len(elements) > 0:
-                                news_items = elements[:20]
-                                break
-                        except:
+                            self._navigate(search_url, wait=3)
+                        except HostBusyError as e:
+                            print(f"Skipping {search_url}: {e}")
                             continue
+                    
+                        # Try multiple possible selectors for news items
+                        selectors = [
+                            '.dbsr', 'g', '.mnr-c', 'article', '.ddle5', '.WlydOe', '.n6jlAc',
+                            '.NiLAwe', '.DY5T1d', '.qLBgNd', '.IBr9hb'
+                        ]
+                        news_items = []
 
-                    if not news_items:
-                        continue
+                        for selector in selectors:
+                            try:
+                                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                                if elements and len(elements) > 0:
+                                    news_items = elements[:20]
+                                    break
+                            except:
+                                continue
+
+                        if not news_items:
+                            continue
                     
-                    # Process the news items
-                    for item in news_items:
-                        try:
-                            # Extract title, link, source, time_posted similar to above
-                            title = None
-                            link = None
-                            source = None
-                            time_posted = None
+                        # Process the news items
+                        for item in news_items:
+                            try:
+                                # Extract title, link, source, time_posted similar to above
+                                title = None
+                                link = None
+                                source = None
+                                time_posted = None
                             
-                            # Extract title with expanded selectors
-                            for title_selector in ['div.nDgy9d', 'h3', 'h4', '.JheGif', '.DY5T1d', '.vF3A6c', '.DFN7ze', '.RD0gLb']:
-                                try:
-                                    title_elem = item.find_element(By.CSS_SELECTOR, title_selector)
-                                    if title_elem:
-                                        title = title_elem.text
-                                        break
-                                except:
-                                    continue
+                                # Extract title with expanded selectors
+                                for title_selector in ['div.nDgy9d', 'h3', 'h4', '.JheGif', '.DY5T1d', '.vF3A6c', '.DFN7ze', '.RD0gLb']:
+                                    try:
+                                        title_elem = item.find_element(By.CSS_SELECTOR, title_selector)
+                                        if title_elem:
+                                            title = title_elem.text
+                                            break
+                                    except:
+                                        continue
 
-                            if not title:
-                                title = item.text.split('\n')[0] if item.text else "Untitled Article"
+                                if not title:
+                                    title = item.text.split('\n')[0] if item.text else "Untitled Article"
 
-                            # Extract link with expanded selectors
-                            for link_selector in ['a', '.WlydOe', '.DY5T1d', '.tHmfQe', '.VDXfz', '.SFllF']:
-                                try:
-                                    link_elem = item.find_element(By.CSS_SELECTOR, link_selector)
-                                    if link_elem:
-                                        link = link_elem.get_attribute('href')
-                                        break
-                                except:
-                                    continue
+                                # Extract link with expanded selectors
+                                for link_selector in ['a', '.WlydOe', '.DY5T1d', '.tHmfQe', '.VDXfz', '.SFllF']:
+                                    try:
+                                        link_elem = item.find_element(By.CSS_SELECTOR, link_selector)
+                                        if link_elem:
+                                            link = link_elem.get_attribute('href')
+                                            break
+                                    except:
+                                        continue
 
-                            if not link:
-                                links = item.find_elements(By.TAG_NAME, 'a')
-                                if links:
-                                    link = links[0].get_attribute('href')
-                                else:
-                                    continue
+                                if not link:
+                                    links = item.find_elements(By.TAG_NAME, 'a')
+                                    if links:
+                                        link = links[0].get_attribute('href')
+                                    else:
+                                        continue
 
-                            # Extract source with expanded selectors
-                            for source_selector in ['.XTjFC.WF4CUc', '.UPmit', '.CEMjEf', '.TVtOme', 'span', '.NUnG9d', '.wEwyrc', '.vr1PYe']:
-                                try:
-                                    source_elem = item.find_element(By.CSS_SELECTOR, source_selector)
-                                    if source_elem:
-                                        source = source_elem.text
-                                        break
-                                except:
-                                    continue
+                                # Extract source with expanded selectors
+                                for source_selector in ['.XTjFC.WF4CUc', '.UPmit', '.CEMjEf', '.TVtOme', 'span', '.NUnG9d', '.wEwyrc', '.vr1PYe']:
+                                    try:
+                                        source_elem = item.find_element(By.CSS_SELECTOR, source_selector)
+                                        if source_elem:
+                                            source = source_elem.text
+                                            break
+                                    except:
+                                        continue
 
-                            source = source or "News Source"
+                                source = source or "News Source"
 
-                            # Extract time posted
-                            for time_selector in ['.WG9SHc span', '.ZE0LJd', '.LfVVr', 'time', '.OSrXXb']:
-                                try:
-                                    time_elem = item.find_element(By.CSS_SELECTOR, time_selector)
-                                    if time_elem:
-                                        time_posted = time_elem.text
-                                        break
-                                except:
-                                    continue
+                                # Extract time posted
+                                for time_selector in ['.WG9SHc span', '.ZE0LJd', '.LfVVr', 'time', '.OSrXXb']:
+                                    try:
+                                        time_elem = item.find_element(By.CSS_SELECTOR, time_selector)
+                                        if time_elem:
+                                            time_posted = time_elem.text
+                                            break
+                                    except:
+                                        continue
 
-                            time_posted = time_posted or f"Recent - {current_time.strftime('%B %d, %Y')}"
+                                time_posted = time_posted or f"Recent - {current_time.strftime('%B %d, %Y')}"
                             
-                            content = self.scrape_news_content(link)
+                                content = self.scrape_news_content(link)
                             
-                            # Check for duplicates
-                            duplicate = False
-                            for existing in all_results:
-                                if title.lower() == existing['title'].lower():
-                                    duplicate = True
-                                    break
+                                # Check for duplicates
+                                duplicate = False
+                                for existing in all_results:
+                                    if title.lower() == existing.title.lower():
+                                        duplicate = True
+                                        break
                                 
-                            if not duplicate:
-                                all_results.append({
-                                    'title': title,
-                                    'link': link,
-                                    'source': source,
-                                    'time': time_posted,
-                                    'content': content
-                                })
+                                if not duplicate:
+                                    result = SourceResult(
+                                        title=title,
+                                        link=link,
+                                        source=source,
+                                        time=time_posted,
+                                        content=content
+                                    )
+                                    all_results.append(result)
+                                    policy.add(result)
                                 
-                            # If we have enough results, break early
-                            if len(all_results) >= 20:
-                                break
+                                # If we have enough evidence, break early
+                                if policy.should_stop():
+                                    break
                                 
-                        except Exception as e:
-                            print(f"Error scraping news item: {e}")
-                            continue
+                            except Exception as e:
+                                print(f"Error scraping news item: {e}")
+                                continue
+                        SOURCE_RESULTS.inc(len(all_results) - results_before, source=source_label)
                     
-                    # If we have enough results, don't try other search engines
-                    if len(all_results) >= 15:
+                    # If we have enough evidence, don't try other search engines
+                    if policy.should_stop():
                         break
             
-            # Sort results by recency and relevance
-            try:
-                def get_source_score(item):
-                    # Technical sources get higher priority for technical queries
-                    if is_tech_query and "(Technical)" in item.get('source', ''):
-                        return 0  # Highest priority
-                        
-                    source_lower = item.get('source', '').lower()
-                    # List of preferred sources
-                    if any(preferred in source_lower for preferred in [
-                        'geeksforgeeks', 'javatpoint', 'tutorialspoint', 'w3schools', 'stackoverflow',
-                        'github', 'mdn', 'mozilla', 'freecodecamp', 'python', 
-                        'times of india', 'hindustan', 'hindu', 'ndtv', 'india today'
-                    ]):
-                        return 1  # High priority
-                    return 2  # Normal priority
-                
-                def get_recency_score(item):
-                    time_str = item['time'].lower()
-                    if "min" in time_str:
-                        return 1
-                    elif "hour" in time_str:
-                        return 2
-                    elif "today" in time_str:
-                        return 3
-                    elif "yesterday" in time_str:
-                        return 4
-                    elif "day" in time_str:
-                        return 5
-                    elif "week" in time_str:
-                        return 6
-                    else:
-                        return 7
-                
-                # Sort first by source quality then by recency
-                all_results.sort(key=lambda x: (get_source_score(x), get_recency_score(x)))
-            except:
-                # If sorting fails, leave as is
-                pass
-                
             print(f"Total unique items found: {len(all_results)}")
+            self._report(policy)
+            
+            # Rank by query relevance, source reliability and recency, keeping the top-k
+            with span('ranking'):
+                try:
+                    all_results = rank_results(query, all_results, is_tech_query)
+                except Exception as e:
+                    # If ranking fails, fall back to collection order
+                    print(f"Error ranking results: {e}")
+                    all_results = all_results[:Config.RANKING_TOP_K]
+                
+            print(f"Keeping top {len(all_results)} ranked items")
             
-            # Limit to 20 results maximum
-            return all_results[:20]
+            return all_results
 
         except Exception as e:
             print(f"Error in scrape_news: {e}")
             return []
         finally:
-            self.driver.quit()
+            if not self.persistent:
+                self.close()
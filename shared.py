@@ -0,0 +1,190 @@
+"""
+SQLite-backed state shared by every worker process on a host.
+
+With several pre-forked workers (see gunicorn.conf.py), in-process dicts and
+semaphores only see one worker's traffic. `SharedStore` keeps the pieces that
+must be global in one local SQLite file (WAL mode, one connection per thread):
+
+* a TTL cache (e.g. scraped article bodies),
+* token buckets for rate limits (e.g. per-host politeness, Gemini requests),
+* leases, so only one worker runs a given background job at a time,
+* the Chrome processes each worker has started, so a crashed worker's
+  browsers can be reaped.
+
+Expired cache entries and leases, and buckets idle for BUCKET_IDLE_SECONDS,
+are purged every SHARED_PURGE_EVERY `cache_set` calls in each process and on
+every retention run, so the file stays the size of the live state.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import Config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL);
+CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tokens REAL, updated_at REAL);
+CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT, expires_at REAL);
+CREATE TABLE IF NOT EXISTS browsers (pid INTEGER PRIMARY KEY, owner INTEGER, started_at REAL);
+"""
+
+# A bucket idle this long has refilled at any configured rate, so dropping it changes nothing
+BUCKET_IDLE_SECONDS = 3600
+
+
+class SharedStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    @property
+    def _conn(self):
+        # Connections are per thread and per process, so one opened before a fork is never reused
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            # The directory is made on first use, not when the module is imported
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        return conn
+
+    # Cache
+
+    def cache_get(self, key):
+        row = self._conn.execute(
+            'SELECT value FROM cache WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def cache_set(self, key, value, ttl):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value), time.time() + ttl)
+        )
+        with self._writes_lock:
+            self._writes += 1
+            purge = self._writes % Config.SHARED_PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    def cache_delete(self, key):
+        self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def purge_expired(self):
+        """Delete expired cache entries and leases, and buckets idle for BUCKET_IDLE_SECONDS."""
+        now = time.time()
+        conn = self._conn
+        conn.execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+        conn.execute('DELETE FROM leases WHERE expires_at <= ?', (now,))
+        conn.execute('DELETE FROM rate_limits WHERE updated_at <= ?', (now - BUCKET_IDLE_SECONDS,))
+
+    # Rate limits
+
+    def take(self, key, rate, burst, cost=1.0):
+        """
+        Take `cost` tokens from the bucket `key` (refilled at `rate` per second up
+        to `burst`). Returns 0 if they were taken, else the seconds to wait before
+        trying again.
+        """
+        now = time.time()
+        conn = self._transaction()
+        try:
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limits (key, tokens, updated_at) VALUES (?, ?, ?)',
+                (key, tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def peek(self, key, rate, burst, cost=1.0):
+        """Seconds before `take` of `cost` from bucket `key` would succeed, without taking anything."""
+        row = self._conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE key = ?', (key,)).fetchone()
+        tokens = burst if row is None else min(burst, row[0] + (time.time() - row[1]) * rate)
+        return max(0.0, (cost - tokens) / rate)
+
+    def acquire(self, key, rate, burst, timeout=None):
+        """Block until a token from bucket `key` is available; False if `timeout` runs out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.take(key, rate, burst)
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    # Leases
+
+    def try_lease(self, name, owner, ttl):
+        """Hold lease `name` for `ttl` seconds if it is free, expired or already ours."""
+        now = time.time()
+        conn = self._transaction()
+        try:
+            row = conn.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+            granted = row is None or row[1] <= now or row[0] == str(owner)
+            if granted:
+                conn.execute(
+                    'INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)',
+                    (name, str(owner), now + ttl)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return granted
+
+    def lease_holder(self, name):
+        """Owner of lease `name`, or None if it is free or expired."""
+        row = self._conn.execute(
+            'SELECT owner FROM leases WHERE name = ? AND expires_at > ?', (name, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def release_lease(self, name, owner):
+        """Give up lease `name` if `owner` holds it."""
+        self._conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, str(owner)))
+
+    # Browser processes
+
+    def register_browser(self, pid, owner=None):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO browsers (pid, owner, started_at) VALUES (?, ?, ?)',
+            (pid, owner or os.getpid(), time.time())
+        )
+
+    def unregister_browser(self, pid):
+        self._conn.execute('DELETE FROM browsers WHERE pid = ?', (pid,))
+
+    def browsers(self, owner=None):
+        """(pid, owner) of registered chromedriver processes, optionally only one owner's."""
+        if owner is None:
+            return self._conn.execute('SELECT pid, owner FROM browsers').fetchall()
+        return self._conn.execute('SELECT pid, owner FROM browsers WHERE owner = ?', (owner,)).fetchall()
+
+
+SHARED = SharedStore(Config.SHARED_STORE_PATH)
@@ -17,14 +17,54 @@ document.addEventListener('DOMContentLoaded', function() {
     const closeSourcesModal = sourcesModal.querySelector('.close');
     const sourcesContent = document.getElementById('sources-content');
 
+    // Page sizes for infinite scroll, and how often to pull changes made elsewhere
+    const CONVERSATIONS_PER_PAGE = 50;
+    const MESSAGES_PER_PAGE = 30;
+    const SYNC_INTERVAL_MS = 15000;
+    // Deep searches start speculatively once the draft has been still this long
+    const PREFETCH_DEBOUNCE_MS = 800;
+    const PREFETCH_MIN_CHARS = 12;
+
     // State
     let currentConversationId = null;
     let isDeepSearch = false;
     let isLoading = false;
+    const conversations = new Map();
+    let conversationPage = 0;
+    let conversationPages = 1;
+    let loadingConversations = false;
+    let hasOlderMessages = false;
+    let loadingOlderMessages = false;
+    let messagesReady = false;
+    let localMessageCounter = 0;
+    let syncCursor = null;
+    let syncing = false;
+    const clientId = window.crypto && crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`;
+    let prefetchTimer = null;
+    let prefetchedDraft = '';
+
+    // Only the visible part of the sidebar and of the conversation is in the DOM
+    const sidebarList = new VirtualList(chatHistory.parentElement, chatHistory, {
+        key: conv => conv.id,
+        render: renderConversationItem,
+        estimate: 36,
+        onNearEnd: () => {
+            if (conversationPage < conversationPages) loadConversations(conversationPage + 1);
+        }
+    });
+    const messageList = new VirtualList(chatMessages, chatMessages, {
+        key: item => item.key,
+        render: renderMessage,
+        estimate: 120,
+        onNearStart: loadOlderMessages
+    });
 
     // Initialize
     loadConversations();
     setupEventListeners();
+    setInterval(() => {
+        if (document.visibilityState === 'visible') syncChanges();
+    }, SYNC_INTERVAL_MS);
 
     function setupEventListeners() {
         // Send message on button click or Enter key
@@ -34,13 +74,22 @@ document.addEventListener('DOMContentLoaded', function() {
                 sendMessage();
             }
         });
+        userInput.addEventListener('input', schedulePrefetch);
 
         // Toggle deep search mode
         deepSearchToggle.addEventListener('change', function() {
             isDeepSearch = this.checked;
             modeLabel.textContent = isDeepSearch ? 'Deep Search' : 'Basic Chat';
+            if (isDeepSearch) {
+                schedulePrefetch();
+            } else {
+                cancelPrefetch();
+            }
         });
 
+        // Leaving the page abandons whatever was being prefetched
+        window.addEventListener('pagehide', cancelPrefetch);
+
         // New chat button
         newChatButton.addEventListener('click', startNewConversation);
 
@@ -52,6 +101,11 @@ document.addEventListener('DOMContentLoaded', function() {
         // Sources modal
         closeSourcesModal.addEventListener('click', () => sourcesModal.style.display = 'none');
 
+        // Catch up on changes made in other tabs while this one was hidden
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'visible') syncChanges();
+        });
+
         // Close modals when clicking outside
         window.addEventListener('click', function(event) {
             if (event.target === chatModal) {
@@ -63,88 +117,211 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    function loadConversations() {
-        fetch('/api/conversations')
-            .then(response => response.json())
-            .then(conversations => {
-                chatHistory.innerHTML = '';
-                conversations.forEach(conv => {
-                    const convElement = document.createElement('div');
-                    convElement.className = 'conversation-item';
-                    convElement.dataset.id = conv.id;
-                    
-                    convElement.innerHTML = `
-                        <div class="conversation-title">${conv.title}</div>
-                        <div class="conversation-actions">
-                            <button class="edit-chat" title="Edit">
-                                <i class="fas fa-edit"></i>
-                            </button>
-                        </div>
-                    `;
-                    
-                    convElement.addEventListener('click', function() {
-                        loadConversation(conv.id);
-                    });
-                    
-                    const editButton = convElement.querySelector('.edit-chat');
-                    editButton.addEventListener('click', function(e) {
-                        e.stopPropagation();
-                        openChatModal(conv.id, conv.title);
-                    });
-                    
-                    chatHistory.appendChild(convElement);
-                });
+    function loadConversations(page = 1) {
+        if (loadingConversations) return;
+        loadingConversations = true;
+        fetch(`/api/conversations?page=${page}&per_page=${CONVERSATIONS_PER_PAGE}`)
+            .then(response => response.json().then(data => ({ data, headers: response.headers })))
+            .then(({ data, headers }) => {
+                if (page === 1) {
+                    // A full reload; later changes come from /api/sync
+                    conversations.clear();
+                    syncCursor = headers.get('X-Sync-Cursor');
+                }
+                data.forEach(conv => conversations.set(conv.id, conv));
+                conversationPage = parseInt(headers.get('X-Page'), 10);
+                conversationPages = parseInt(headers.get('X-Total-Pages'), 10);
+                renderSidebar();
             })
-            .catch(error => console.error('Error loading conversations:', error));
+            .catch(error => console.error('Error loading conversations:', error))
+            .finally(() => {
+                loadingConversations = false;
+            });
+    }
+
+    function renderSidebar() {
+        const ordered = Array.from(conversations.values()).sort((a, b) =>
+            b.updated_at_iso.localeCompare(a.updated_at_iso) || b.id - a.id
+        );
+        sidebarList.setItems(ordered);
+    }
+
+    function renderConversationItem(conv) {
+        const convElement = document.createElement('div');
+        convElement.className = 'conversation-item';
+        convElement.dataset.id = conv.id;
+        if (conv.id === currentConversationId) {
+            convElement.classList.add('active');
+        }
+        
+        convElement.innerHTML = `
+            <div class="conversation-title">${conv.title}</div>
+            <div class="conversation-actions">
+                <button class="edit-chat" title="Edit">
+                    <i class="fas fa-edit"></i>
+                </button>
+            </div>
+        `;
+        
+        convElement.addEventListener('click', function() {
+            loadConversation(conv.id);
+        });
+        
+        const editButton = convElement.querySelector('.edit-chat');
+        editButton.addEventListener('click', function(e) {
+            e.stopPropagation();
+            openChatModal(conv.id, conv.title);
+        });
+        
+        return convElement;
+    }
+
+    function markActiveConversation() {
+        document.querySelectorAll('.conversation-item').forEach(item => {
+            item.classList.toggle('active', item.dataset.id === String(currentConversationId));
+        });
+    }
+
+    function messageItem(message) {
+        return {
+            key: `m${message.id}`,
+            id: message.id,
+            content: message.content,
+            isUser: message.is_user,
+            sources: message.sources
+        };
     }
 
     function loadConversation(conversationId) {
-        fetch(`/api/conversation/${conversationId}`)
+        // Only the latest page; older messages load as the user scrolls up
+        fetch(`/api/conversation/${conversationId}?tail=1&per_page=${MESSAGES_PER_PAGE}`)
             .then(response => response.json())
             .then(data => {
-                // Clear current chat
-                chatMessages.innerHTML = '';
                 currentConversationId = conversationId;
-                conversationTitle.textContent = data.title;
+                conversationTitle.textContent = data.conversation.title;
+                markActiveConversation();
                 
-                // Update active state in sidebar
-                document.querySelectorAll('.conversation-item').forEach(item => {
-                    item.classList.remove('active');
-                    if (item.dataset.id === conversationId.toString()) {
-                        item.classList.add('active');
-                    }
+                messagesReady = false;
+                hasOlderMessages = data.pagination.has_more;
+                messageList.clear();
+                messageList.setItems(data.messages.map(messageItem));
+                messageList.scrollToEnd();
+                messagesReady = true;
+            })
+            .catch(error => console.error('Error loading conversation:', error));
+    }
+
+    function loadOlderMessages() {
+        if (!messagesReady || !hasOlderMessages || loadingOlderMessages || !currentConversationId) return;
+        const oldest = messageList.items.find(item => item.id);
+        if (!oldest) return;
+        const conversationId = currentConversationId;
+        loadingOlderMessages = true;
+        fetch(`/api/conversation/${conversationId}?before=${oldest.id}&per_page=${MESSAGES_PER_PAGE}`)
+            .then(response => response.json())
+            .then(data => {
+                if (conversationId !== currentConversationId) return;
+                hasOlderMessages = data.pagination.has_more;
+                messageList.prepend(data.messages.map(messageItem));
+            })
+            .catch(error => console.error('Error loading older messages:', error))
+            .finally(() => {
+                loadingOlderMessages = false;
+            });
+    }
+
+    function syncChanges() {
+        if (!syncCursor || syncing) return;
+        syncing = true;
+        const conversationId = currentConversationId;
+        const params = new URLSearchParams({ since: syncCursor });
+        if (conversationId) params.set('conversation_id', conversationId);
+        fetch(`/api/sync?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.reset) {
+                    loadConversations();
+                    return;
+                }
+                syncCursor = data.cursor;
+                data.conversations.forEach(conv => {
+                    conversations.set(conv.id, conv);
+                    sidebarList.invalidate(conv.id);
                 });
-                
-                // Add messages to chat
-                data.messages.forEach(message => {
-                    addMessageToUI(message.content, message.is_user, message.sources);
+                data.deleted.forEach(id => {
+                    conversations.delete(id);
+                    sidebarList.invalidate(id);
+                    if (id === currentConversationId) startNewConversation();
                 });
+                renderSidebar();
                 
-                // Scroll to bottom
-                chatMessages.scrollTop = chatMessages.scrollHeight;
+                if (conversationId === currentConversationId) {
+                    const fresh = data.messages
+                        .map(messageItem)
+                        .filter(item => messageList.indexOf(item.key) === -1);
+                    if (fresh.length) {
+                        const stick = messageList.isNearBottom();
+                        messageList.append(fresh);
+                        if (stick) messageList.scrollToEnd();
+                    }
+                }
             })
-            .catch(error => console.error('Error loading conversation:', error));
+            .catch(error => console.error('Error syncing changes:', error))
+            .finally(() => {
+                syncing = false;
+            });
+    }
+
+    function schedulePrefetch() {
+        clearTimeout(prefetchTimer);
+        if (!isDeepSearch) return;
+        prefetchTimer = setTimeout(() => {
+            const draft = userInput.value.trim();
+            if (draft === prefetchedDraft) return;
+            if (draft.length < PREFETCH_MIN_CHARS) {
+                cancelPrefetch();
+                return;
+            }
+            // The server dedupes drafts and cancels this client's previous one
+            prefetchedDraft = draft;
+            fetch('/api/prefetch', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ query: draft, client_id: clientId })
+            }).catch(error => console.error('Error prefetching deep search:', error));
+        }, PREFETCH_DEBOUNCE_MS);
+    }
+
+    function cancelPrefetch() {
+        clearTimeout(prefetchTimer);
+        if (!prefetchedDraft) return;
+        prefetchedDraft = '';
+        fetch(`/api/prefetch?client_id=${encodeURIComponent(clientId)}`, { method: 'DELETE', keepalive: true })
+            .catch(error => console.error('Error cancelling prefetch:', error));
     }
 
     function startNewConversation() {
         currentConversationId = null;
-        chatMessages.innerHTML = '';
+        hasOlderMessages = false;
+        messageList.clear();
         conversationTitle.textContent = 'New Conversation';
         userInput.value = '';
         
         // Remove active state from all conversations
-        document.querySelectorAll('.conversation-item').forEach(item => {
-            item.classList.remove('active');
-        });
+        markActiveConversation();
     }
 
     function sendMessage() {
         const message = userInput.value.trim();
         if (!message || isLoading) return;
         
-        // Add user message to UI
-        addMessageToUI(message, true);
+        // Add user message to UI; it gets its server id once the reply is in
+        const localKey = `local-${++localMessageCounter}`;
+        addMessageToUI(message, true, null, localKey);
         userInput.value = '';
+        // The chat attaches to the prefetched scrape, so it must not be cancelled
+        clearTimeout(prefetchTimer);
+        prefetchedDraft = '';
         isLoading = true;
         
         // Show loading indicator in send button
@@ -168,10 +345,19 @@ document.addEventListener('DOMContentLoaded', function() {
             }
             
             currentConversationId = data.conversation_id;
-            addMessageToUI(data.response, false, data.sources);
+            const userKey = `m${data.user_message_id}`;
+            if (messageList.indexOf(userKey) === -1) {
+                messageList.replace(localKey, { key: userKey, id: data.user_message_id, content: message, isUser: true, sources: null });
+            } else {
+                // A sync already brought it in
+                messageList.remove(localKey);
+            }
+            if (messageList.indexOf(`m${data.message_id}`) === -1) {
+                addMessageToUI(data.response, false, data.sources, `m${data.message_id}`, data.message_id);
+            }
             
-            // Reload conversations to update the list
-            loadConversations();
+            // Pull the new or updated conversation into the sidebar
+            syncChanges();
         })
         .catch(error => {
             console.error('Error:', error);
@@ -184,7 +370,13 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    function addMessageToUI(content, isUser, sources = null) {
+    function addMessageToUI(content, isUser, sources = null, key = null, id = null) {
+        messageList.append([{ key: key || `local-${++localMessageCounter}`, id, content, isUser, sources }]);
+        messageList.scrollToEnd();
+    }
+
+    function renderMessage(item) {
+        const { content, isUser, sources } = item;
         const messageDiv = document.createElement('div');
         messageDiv.className = isUser ? 'message user-message' : 'message ai-message';
         messageDiv.innerHTML = content;
@@ -203,8 +395,7 @@ document.addEventListener('DOMContentLoaded', function() {
             messageDiv.appendChild(sourcesContainer);
         }
         
-        chatMessages.appendChild(messageDiv);
-        chatMessages.scrollTop = chatMessages.scrollHeight;
+        return messageDiv;
     }
 
     function openChatModal(conversationId, title) {
@@ -227,7 +418,7 @@ document.addEventListener('DOMContentLoaded', function() {
             if (data.success) {
                 conversationTitle.textContent = newTitle;
                 chatModal.style.display = 'none';
-                loadConversations();
+                syncChanges();
             }
         })
         .catch(error => console.error('Error updating conversation:', error));
@@ -244,8 +435,10 @@ document.addEventListener('DOMContentLoaded', function() {
             .then(data => {
                 if (data.success) {
                     chatModal.style.display = 'none';
+                    conversations.delete(currentConversationId);
+                    sidebarList.invalidate(currentConversationId);
                     startNewConversation();
-                    loadConversations();
+                    renderSidebar();
                 }
             })
             .catch(error => console.error('Error deleting conversation:', error));
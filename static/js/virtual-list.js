@@ -0,0 +1,199 @@
+// Windowed rendering for long lists. Only the items in and near the viewport
+// are in the DOM; two spacers stand in for the rest. Item heights are measured
+// as items render and estimated until then.
+class VirtualList {
+    constructor(scroller, host, options) {
+        this.scroller = scroller;
+        this.host = host;
+        this.key = options.key;
+        this.renderItem = options.render;
+        this.estimate = options.estimate || 60;
+        this.overscan = options.overscan || 800;
+        this.onNearStart = options.onNearStart || null;
+        this.onNearEnd = options.onNearEnd || null;
+
+        this.items = [];
+        this.heights = new Map();
+        this.nodes = new Map();
+        this.frame = null;
+
+        this.topSpacer = document.createElement('div');
+        this.topSpacer.className = 'virtual-spacer';
+        this.window = document.createElement('div');
+        this.window.className = 'virtual-window';
+        this.bottomSpacer = document.createElement('div');
+        this.bottomSpacer.className = 'virtual-spacer';
+        host.replaceChildren(this.topSpacer, this.window, this.bottomSpacer);
+        scroller.classList.add('virtual-scroller');
+
+        scroller.addEventListener('scroll', () => this.schedule(), { passive: true });
+        window.addEventListener('resize', () => {
+            // Wrapping changes with the width, so every measurement is stale
+            this.heights.clear();
+            this.schedule();
+        });
+    }
+
+    gap() {
+        return parseFloat(getComputedStyle(this.window).rowGap) || 0;
+    }
+
+    heightOf(item, gap) {
+        const measured = this.heights.get(this.key(item));
+        return (measured === undefined ? this.estimate : measured) + gap;
+    }
+
+    schedule() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.update();
+            });
+        }
+    }
+
+    indexOf(key) {
+        return this.items.findIndex(item => this.key(item) === key);
+    }
+
+    // Replace the list; nodes of items that are still present are reused
+    setItems(items) {
+        this.items = items;
+        this.update();
+    }
+
+    // Add older items at the top without moving what is on screen
+    prepend(items) {
+        if (!items.length) return;
+        const distanceFromBottom = this.scroller.scrollHeight - this.scroller.scrollTop;
+        this.items = items.concat(this.items);
+        this.update();
+        this.scroller.scrollTop = this.scroller.scrollHeight - distanceFromBottom;
+    }
+
+    append(items) {
+        this.items = this.items.concat(items);
+        this.update();
+    }
+
+    // Re-render one item (e.g. after its content or key changed)
+    replace(key, item) {
+        const index = this.indexOf(key);
+        if (index === -1) return;
+        this.items[index] = item;
+        this.invalidate(key);
+        this.update();
+    }
+
+    remove(key) {
+        const index = this.indexOf(key);
+        if (index === -1) return;
+        this.items.splice(index, 1);
+        this.invalidate(key);
+        this.update();
+    }
+
+    invalidate(key) {
+        const node = this.nodes.get(key);
+        if (node) {
+            node.remove();
+            this.nodes.delete(key);
+        }
+        this.heights.delete(key);
+    }
+
+    clear() {
+        this.items = [];
+        this.heights.clear();
+        this.nodes.forEach(node => node.remove());
+        this.nodes.clear();
+        this.update();
+    }
+
+    isNearBottom(threshold = 80) {
+        return this.scroller.scrollHeight - this.scroller.scrollTop - this.scroller.clientHeight < threshold;
+    }
+
+    scrollToEnd() {
+        // Twice: the first pass measures the newly rendered tail
+        for (let pass = 0; pass < 2; pass++) {
+            this.scroller.scrollTop = this.scroller.scrollHeight;
+            this.update();
+        }
+    }
+
+    update() {
+        const gap = this.gap();
+        // Where the list starts inside the scroller (after padding, headings)
+        const origin = this.topSpacer.offsetTop;
+        const scrollTop = this.scroller.scrollTop;
+        const viewTop = scrollTop - origin - this.overscan;
+        const viewBottom = scrollTop - origin + this.scroller.clientHeight + this.overscan;
+
+        let start = 0;
+        let before = 0;
+        while (start < this.items.length && before + this.heightOf(this.items[start], gap) < viewTop) {
+            before += this.heightOf(this.items[start], gap);
+            start++;
+        }
+        let end = start;
+        let bottom = before;
+        while (end < this.items.length && bottom < viewBottom) {
+            bottom += this.heightOf(this.items[end], gap);
+            end++;
+        }
+        let after = 0;
+        for (let i = end; i < this.items.length; i++) {
+            after += this.heightOf(this.items[i], gap);
+        }
+
+        // Reconcile the rendered window with items[start, end)
+        const wanted = new Set();
+        let previous = null;
+        for (let i = start; i < end; i++) {
+            const key = this.key(this.items[i]);
+            wanted.add(key);
+            let node = this.nodes.get(key);
+            if (!node) {
+                node = this.renderItem(this.items[i]);
+                this.nodes.set(key, node);
+            }
+            const expected = previous ? previous.nextSibling : this.window.firstChild;
+            if (node !== expected) {
+                this.window.insertBefore(node, expected);
+            }
+            previous = node;
+        }
+        for (const [key, node] of this.nodes) {
+            if (!wanted.has(key)) {
+                node.remove();
+                this.nodes.delete(key);
+            }
+        }
+
+        // Measure what rendered; estimates above the viewport that turn out
+        // wrong would shift the content, so the scroll position absorbs them
+        let shift = 0;
+        let y = before;
+        for (let i = start; i < end; i++) {
+            const key = this.key(this.items[i]);
+            const height = this.nodes.get(key).offsetHeight;
+            const old = this.heightOf(this.items[i], 0);
+            if (height !== old) {
+                this.heights.set(key, height);
+                if (y + old < scrollTop - origin) shift += height - old;
+            }
+            y += old + gap;
+        }
+        this.topSpacer.style.height = `${before}px`;
+        this.bottomSpacer.style.height = `${after}px`;
+        if (shift) this.scroller.scrollTop = scrollTop + shift;
+
+        if (this.onNearStart && this.scroller.scrollTop < this.overscan / 2) {
+            this.onNearStart();
+        }
+        if (this.onNearEnd && this.isNearBottom(this.overscan / 2)) {
+            this.onNearEnd();
+        }
+    }
+}
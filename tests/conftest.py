@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point the app at throwaway files before any module reads Config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_workdir = tempfile.mkdtemp(prefix='crm-tests-')
+os.environ.setdefault('SHARED_STORE_PATH', os.path.join(_workdir, 'shared.db'))
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(_workdir, 'chat.db')}")
+os.environ.setdefault('LLM_BACKEND', 'stub')
+os.environ.setdefault('HEADLINE_PREFETCH_ENABLED', 'false')
+os.environ.setdefault('RETENTION_ENABLED', 'false')
+os.environ.setdefault('HEADLINE_STORE_DIR', os.path.join(_workdir, 'headlines'))
+
+
+@pytest.fixture
+def app():
+    """The Flask app in an app context, on an emptied temporary database."""
+    from app import app as flask_app
+    from models import db, ensure_schema
+    with flask_app.app_context():
+        db.drop_all()
+        ensure_schema()
+        yield flask_app
+        db.session.remove()
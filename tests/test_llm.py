@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm import GeminiBackend, LLMTimeoutError, StubBackend
+
+
+class FakeGenerativeModel:
+    """Accepts exactly what google-generativeai 0.3.2's generate_content builds a request from."""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate_content(self, contents, *, generation_config=None, safety_settings=None, stream=False):
+        self.calls.append(contents)
+        return type('Response', (), {'text': f"answer to {contents}"})()
+
+
+def test_gemini_calls_generate_content_with_the_prompt_only():
+    backend = GeminiBackend('key', timeout=5)
+    backend._model = FakeGenerativeModel()
+    assert backend.generate('hello') == 'answer to hello'
+    assert asyncio.run(backend.generate_async('again')) == 'answer to again'
+    assert backend._model.calls == ['hello', 'again']
+
+
+def test_generate_async_respects_the_concurrency_limit():
+    backend = StubBackend(latency=0.1, tokens_per_second=1e9, max_concurrency=2, timeout=5)
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+    generate = backend._generate
+
+    def counted(prompt):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        try:
+            return generate(prompt)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    backend._generate = counted
+
+    async def run():
+        return await asyncio.gather(*(backend.generate_async(f"prompt {i}") for i in range(6)))
+
+    started = time.perf_counter()
+    assert len(asyncio.run(run())) == 6
+    assert peak[0] == 2
+    assert time.perf_counter() - started < 1.0
+
+
+def test_generate_async_timeout_releases_the_slot():
+    backend = StubBackend(latency=0.5, tokens_per_second=1e9, max_concurrency=1, timeout=0.1, max_retries=0)
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(backend.generate_async('slow'))
+    time.sleep(0.6)
+    assert backend._limiter.acquire(blocking=False)
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from config import Config
+from llm import StubBackend
+from memory import build_context, schedule_update, update_memory
+from models import db, Conversation, ConversationMemory, Message
+
+
+class BarrierBackend(StubBackend):
+    """Stub model whose calls all wait for each other, so concurrent updates see the same state."""
+
+    def __init__(self, parties):
+        super().__init__(latency=0, tokens_per_second=1e9, output_tokens=12, max_concurrency=parties, timeout=10)
+        self.barrier = threading.Barrier(parties, timeout=10)
+        self.outputs = []
+
+    def _generate(self, prompt):
+        # Each waiting call gets a distinct summary
+        summary = f"summary {self.barrier.wait()}"
+        self.outputs.append(summary)
+        return summary
+
+
+@pytest.fixture(autouse=True)
+def small_window(monkeypatch):
+    monkeypatch.setattr(Config, 'MEMORY_RECENT_TURNS', 1)
+    monkeypatch.setattr(Config, 'MEMORY_SUMMARIZE_BATCH', 1)
+
+
+def add_conversation(turns, memory=False):
+    conversation = Conversation(title='memory')
+    db.session.add(conversation)
+    db.session.flush()
+    messages = []
+    for i in range(turns):
+        messages.append(Message(conversation_id=conversation.id, content=f"question {i}", is_user=True))
+        messages.append(Message(conversation_id=conversation.id, content=f"answer {i}", is_user=False,
+                                renderer_version=1))
+    db.session.add_all(messages)
+    if memory:
+        db.session.add(ConversationMemory(conversation_id=conversation.id, summary='', summarized_through=0))
+    db.session.commit()
+    return conversation.id, [message.id for message in messages]
+
+
+def memory_of(conversation_id):
+    db.session.expire_all()
+    return db.session.get(ConversationMemory, conversation_id)
+
+
+def run_concurrently(app, conversation_id, llm, parties):
+    results = []
+
+    def run():
+        with app.app_context():
+            results.append(update_memory(conversation_id, llm))
+            db.session.remove()
+
+    threads = [threading.Thread(target=run) for _ in range(parties)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(20)
+    return results
+
+
+def test_schedule_update_catches_up_in_batches(app):
+    conversation_id, ids = add_conversation(3)
+    llm = StubBackend(latency=0, tokens_per_second=1e9, output_tokens=12)
+    schedule_update(app, conversation_id, llm).result(20)
+    memory = memory_of(conversation_id)
+    # Folded a turn at a time until only the recent window and one batch short remain
+    assert memory.summarized_through == ids[3]
+    assert memory.summary
+    context = build_context(conversation_id)
+    assert context.startswith('Summary of the earlier conversation:')
+    assert 'question 2' in context and 'question 1' not in context
+
+
+@pytest.mark.parametrize('existing', [False, True], ids=['first-summary', 'existing-summary'])
+def test_concurrent_updates_apply_once(app, existing):
+    conversation_id, ids = add_conversation(2, memory=existing)
+    llm = BarrierBackend(2)
+    results = run_concurrently(app, conversation_id, llm, 2)
+    assert sorted(results) == [False, True]
+    memory = memory_of(conversation_id)
+    assert memory.summarized_through == ids[1]
+    assert len(llm.outputs) == 2 and memory.summary in llm.outputs
+    assert ConversationMemory.query.count() == 1
+
+
+def test_short_conversations_are_not_summarized(app):
+    conversation_id, _ = add_conversation(1)
+    assert not update_memory(conversation_id, StubBackend(latency=0, tokens_per_second=1e9))
+    assert memory_of(conversation_id) is None
@@ -0,0 +1,56 @@
+from sqlalchemy import inspect
+
+from models import db, ensure_schema, Conversation, Message
+
+
+def old_message_table(*rows):
+    """Replace `message` with its layout from before cascading foreign keys, holding `rows`."""
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        try:
+            conn.exec_driver_sql('DROP TABLE IF EXISTS message__orphans')
+            conn.exec_driver_sql('DROP TABLE message')
+            conn.exec_driver_sql(
+                'CREATE TABLE message (id INTEGER PRIMARY KEY, conversation_id INTEGER REFERENCES conversation (id), '
+                'content TEXT, is_user BOOLEAN, created_at DATETIME, sources TEXT)'
+            )
+            for row_id, conversation_id in rows:
+                conn.exec_driver_sql(
+                    'INSERT INTO message (id, conversation_id, content, is_user) VALUES (?, ?, ?, 0)',
+                    (row_id, conversation_id, f"message {row_id}")
+                )
+        finally:
+            conn.exec_driver_sql('PRAGMA foreign_keys=ON')
+
+
+def add_conversation():
+    conversation = Conversation(title='kept')
+    db.session.add(conversation)
+    db.session.commit()
+    return conversation.id
+
+
+def test_rebuild_moves_orphans_aside(app):
+    kept = add_conversation()
+    old_message_table((1, kept), (2, kept + 100), (3, None))
+    ensure_schema()
+    inspector = inspect(db.engine)
+    [fk] = inspector.get_foreign_keys('message')
+    assert fk['options'].get('ondelete', '').upper() == 'CASCADE'
+    assert {'renderer_version', 'updated_at'} <= {column['name'] for column in inspector.get_columns('message')}
+    assert sorted(message.id for message in Message.query) == [1, 3]
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql('SELECT id, conversation_id FROM message__orphans').all() == [(2, kept + 100)]
+    # The rebuilt table cascades
+    db.session.delete(db.session.get(Conversation, kept))
+    db.session.commit()
+    assert [message.id for message in Message.query] == [3]
+
+
+def test_rebuild_without_orphans_leaves_no_orphan_table(app):
+    kept = add_conversation()
+    old_message_table((1, kept), (2, None))
+    ensure_schema()
+    inspector = inspect(db.engine)
+    assert 'message__orphans' not in inspector.get_table_names()
+    assert sorted(message.id for message in Message.query) == [1, 2]
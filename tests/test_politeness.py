@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SHARED_STORE_PATH', os.path.join(tempfile.mkdtemp(), 'shared.db'))
+
+from politeness import HostLimiter, is_block_page
+from shared import SharedStore
+
+
+def test_query_with_marker_word_is_not_a_block_page():
+    query = 'captcha bypass news'
+    url = 'https://www.google.com/search?q=captcha+bypass+news+latest&tbm=nws'
+    assert not is_block_page(url, 'captcha bypass news latest - Google Search', query)
+
+
+def test_block_pages_are_still_detected():
+    assert is_block_page('https://www.google.com/sorry/index?continue=x', '', 'captcha bypass news')
+    assert is_block_page('https://example.com/', 'Just a moment...', 'captcha bypass news')
+
+
+def test_queries_naming_a_marker_still_detect_block_pages():
+    assert is_block_page('https://example.com/cdn-cgi/', 'Access Denied', 'access denied error')
+    assert is_block_page('https://www.google.com/sorry/index?q=captcha', '', 'captcha')
+    assert is_block_page('https://example.com/', 'Attention Required! | Cloudflare', 'captcha')
+    assert is_block_page('https://example.com/captcha-check', 'Example', 'captcha solver')
+
+
+def test_echoed_query_in_path_is_not_a_block_page():
+    query = 'access denied error'
+    assert not is_block_page('https://example.com/search/access-denied-error', 'Results for access denied error', query)
+    assert not is_block_page('https://example.com/tag/access%20denied%20error', 'Example', query)
+
+def test_busy_host_is_scheduled_last():
+    limiter = HostLimiter(store=SharedStore(os.path.join(tempfile.mkdtemp(), 'shared.db')))
+    limiter.back_off('busy.example')
+    urls = ['https://busy.example/a', 'https://idle.example/b', 'https://other.example/c']
+    assert list(limiter.schedule(urls, lambda url: url)) == urls[1:] + urls[:1]
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import Config
+from ranking import EvidencePolicy, bm25_scores, parse_timestamp, rank_results, tokenize
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+def article(title, content='', source='Example', time=''):
+    return {'title': title, 'content': content, 'source': source, 'time': time}
+
+
+def test_bm25_prefers_documents_matching_more_terms():
+    documents = [tokenize('python release notes'), tokenize('python asyncio release'), tokenize('cooking pasta')]
+    scores = bm25_scores(tokenize('python asyncio release'), documents)
+    assert scores[1] > scores[0] > scores[2] == 0
+    assert not bm25_scores([], documents).any()
+
+
+def test_rank_results_orders_by_relevance_and_keeps_top_k():
+    results = [
+        article('Cricket scores', 'Match report'),
+        article('Python 3.14 released', 'The Python 3.14 release brings a free-threaded build'),
+        article('Python tips', 'Some Python tips'),
+    ]
+    ranked = rank_results('python 3.14 release', results, top_k=2, now=NOW)
+    assert [item['title'] for item in ranked] == ['Python 3.14 released', 'Python tips']
+    assert rank_results('anything', []) == []
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('3 hours ago', NOW - timedelta(hours=3)),
+    ('1 day ago', NOW - timedelta(days=1)),
+    ('2 wks ago', NOW - timedelta(weeks=2)),
+    ('Yesterday', NOW - timedelta(days=1)),
+    ('just now', NOW),
+    ('Oct 3, 2025', datetime(2025, 10, 3)),
+    ('Recent - October 18, 2026', datetime(2026, 10, 18)),
+    ('2026-01-02', datetime(2026, 1, 2)),
+    ('', None),
+    ('sometime', None),
+])
+def test_parse_timestamp(text, expected):
+    assert parse_timestamp(text, NOW) == expected
+
+
+def test_recent_results_win_ties():
+    results = [article('Budget vote', time='3 days ago'), article('Budget vote', time='1 hour ago')]
+    assert rank_results('budget vote', results, now=NOW)[0]['time'] == '1 hour ago'
+
+
+def test_evidence_stops_the_search(monkeypatch):
+    monkeypatch.setattr(Config, 'DEEP_SEARCH_EVIDENCE_THRESHOLD', 1.5)
+    policy = EvidencePolicy('budget vote')
+    policy.extend([article('Budget vote passes', source='BBC')] * 2)
+    assert policy.should_stop() and policy.report()['stop_reason'] == 'evidence'
+
+
+def test_low_yield_stops_after_a_run_of_results_matching_nothing(monkeypatch):
+    monkeypatch.setattr(Config, 'DEEP_SEARCH_LOW_YIELD_RESULTS', 3)
+    policy = EvidencePolicy('budget vote')
+    policy.extend([article('Cricket scores'), article('Weather')])
+    assert not policy.should_stop()
+    # A result on topic starts the count again
+    policy.extend([article('Budget talks'), article('Cricket scores'), article('Weather')])
+    assert not policy.should_stop()
+    policy.add(article('Film reviews'))
+    assert policy.should_stop() and policy.report()['stop_reason'] == 'low_yield'
+    assert not policy.enter('general_search')
+    assert policy.report()['phases_skipped'] == ['general_search']
+
+
+def test_low_yield_needs_query_terms_and_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(Config, 'DEEP_SEARCH_LOW_YIELD_RESULTS', 2)
+    # "latest news today" has no specific terms: any article is on topic
+    policy = EvidencePolicy('latest news today')
+    policy.extend([article('Cricket scores'), article('Weather')])
+    assert not policy.should_stop()
+    monkeypatch.setattr(Config, 'DEEP_SEARCH_LOW_YIELD_RESULTS', 0)
+    policy = EvidencePolicy('budget vote')
+    policy.extend([article('Cricket scores'), article('Weather'), article('Film reviews')])
+    assert not policy.should_stop()
@@ -0,0 +1,48 @@
+import json
+
+import orjson
+
+from records import SourceResult, as_record, dumps_with_raw, encode_sources, pack_payload, unpack_payload
+
+ITEM = {'title': 'Title', 'link': 'https://example.com/a', 'source': 'Example', 'time': '1 hour ago', 'content': 'body ' * 2000}
+
+
+def test_record_reads_like_the_dict_it_replaces():
+    record = SourceResult.from_dict(ITEM)
+    assert record['title'] == ITEM['title'] and record.get('time') == ITEM['time']
+    assert record.get('missing', 'default') == 'default'
+    assert record.to_dict() == ITEM
+    assert as_record(record) is record
+
+
+def test_record_shares_its_content_string():
+    record = SourceResult.from_dict(ITEM)
+    assert record.content is ITEM['content']
+
+
+def test_preview_truncates_on_use_only():
+    record = SourceResult.from_dict(ITEM)
+    assert record.preview(100) == ITEM['content'][:100]
+    assert record.preview(10 ** 6) is record.content
+    assert len(record.content) == len(ITEM['content'])
+
+
+def test_encode_sources_matches_the_dict_encoding():
+    encoded = encode_sources([SourceResult.from_dict(ITEM), dict(ITEM, content=None)])
+    assert orjson.loads(encoded) == [ITEM, dict(ITEM, content='')]
+
+
+def test_dumps_with_raw_splices_encoded_values():
+    sources = encode_sources([ITEM])
+    payload = dumps_with_raw({'response': 'ok'}, sources=sources, missing=None)
+    assert json.loads(payload) == {'response': 'ok', 'sources': [ITEM], 'missing': None}
+    assert json.loads(dumps_with_raw({}, sources=sources)) == {'sources': [ITEM]}
+
+
+def test_packed_payloads_round_trip():
+    text = encode_sources([ITEM] * 5).decode()
+    packed = pack_payload(text)
+    assert packed.startswith('z:') and len(packed) < len(text)
+    assert unpack_payload(packed) == text
+    assert pack_payload(packed) == packed
+    assert unpack_payload(text) == text
@@ -0,0 +1,66 @@
+import renderer
+from models import db, Conversation, Message
+from renderer import RenderCache, backfill_markdown, format_ai_response, render_key, render_message
+
+MARKDOWN = '## Summary\nSome text [Source 1].\n\n- one\n- two'
+
+
+def add_messages(*messages):
+    conversation = Conversation(title='render')
+    db.session.add(conversation)
+    db.session.flush()
+    for message in messages:
+        message.conversation_id = conversation.id
+    db.session.add_all(messages)
+    db.session.commit()
+    return [message.id for message in messages]
+
+
+def test_render_key_follows_content_and_renderer_version(monkeypatch):
+    assert render_key(MARKDOWN) == render_key(MARKDOWN)
+    assert render_key(MARKDOWN) != render_key(MARKDOWN + '.')
+    first = render_key(MARKDOWN)
+    monkeypatch.setattr(renderer, 'RENDERER_VERSION', renderer.RENDERER_VERSION + 1)
+    assert render_key(MARKDOWN) != first
+
+
+def test_render_cache_evicts_least_recently_used():
+    cache = RenderCache(2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'
+    cache.put('c', 'C')
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A' and cache.get('c') == 'C'
+
+
+def test_render_message_memoizes_markdown_and_passes_html_through(monkeypatch):
+    monkeypatch.setattr(renderer, 'RENDER_CACHE', RenderCache(10))
+    calls = []
+    monkeypatch.setattr(renderer, 'format_ai_response', lambda text: calls.append(text) or format_ai_response(text))
+    reply = Message(content=MARKDOWN, is_user=False, renderer_version=renderer.RENDERER_VERSION)
+    assert render_message(reply) == format_ai_response(MARKDOWN)
+    assert render_message(reply) == format_ai_response(MARKDOWN)
+    assert calls == [MARKDOWN]
+    stored_html = Message(content='<p>old</p>', is_user=False, renderer_version=None)
+    assert render_message(stored_html) == '<p>old</p>'
+    assert render_message(Message(content='**hi**', is_user=True)) == '**hi**'
+
+
+def test_backfill_moves_recoverable_html_to_markdown(app, monkeypatch):
+    monkeypatch.setattr(renderer, 'RENDERER_VERSION', 2)
+    html = format_ai_response(MARKDOWN)
+    recoverable, odd, user = add_messages(
+        Message(content=html, is_user=False),
+        Message(content='<div>hand-written</div>', is_user=False),
+        Message(content=html, is_user=True),
+    )
+    assert backfill_markdown(0, 10) == (odd, 1)
+    db.session.expire_all()
+    converted = db.session.get(Message, recoverable)
+    assert converted.renderer_version == 2
+    assert format_ai_response(converted.content) == html
+    assert db.session.get(Message, odd).renderer_version is None
+    assert db.session.get(Message, user).content == html
+    # Nothing left above the last id visited
+    assert backfill_markdown(odd, 10) == (None, 0)
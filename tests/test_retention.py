@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+from sqlalchemy import delete, update
+
+from config import Config
+from models import db, Conversation, Message, RetentionState
+from records import PACKED_PREFIX, unpack_payload
+from retention import RetentionTask, strip_bodies
+
+
+@pytest.fixture
+def task(app, monkeypatch):
+    monkeypatch.setattr(Config, 'RETENTION_PAUSE', 0)
+    monkeypatch.setattr(Config, 'RETENTION_BATCH_SIZE', 2)
+    monkeypatch.setattr(Config, 'RETENTION_COMPRESS_DAYS', 7)
+    monkeypatch.setattr(Config, 'RETENTION_BODY_DAYS', 90)
+    return RetentionTask(app, store=None)
+
+
+def sources(n=3):
+    return orjson.dumps([
+        {'title': f"Story {i}", 'link': f"https://example.com/{i}", 'content': 'Body text. ' * 200}
+        for i in range(n)
+    ]).decode()
+
+
+def add_messages(*ages_in_days):
+    conversation = Conversation(title='retention')
+    db.session.add(conversation)
+    db.session.flush()
+    now = datetime.utcnow()
+    messages = [
+        Message(conversation_id=conversation.id, content='reply', is_user=False, sources=sources(),
+                created_at=now - timedelta(days=age))
+        for age in ages_in_days
+    ]
+    db.session.add_all(messages)
+    db.session.commit()
+    return [message.id for message in messages]
+
+
+def stored(message_id):
+    db.session.expire_all()
+    return db.session.get(Message, message_id).sources
+
+
+def test_strip_bodies_keeps_everything_but_the_content():
+    items = orjson.loads(unpack_payload(strip_bodies(sources(2))))
+    assert [item['content'] for item in items] == ['', '']
+    assert [item['title'] for item in items] == ['Story 0', 'Story 1']
+    assert strip_bodies('not json') == 'not json'
+    assert strip_bodies('{"answer": 1}') == '{"answer": 1}'
+
+
+def test_run_packs_and_prunes_by_age(task):
+    pruned, packed, fresh = add_messages(120, 10, 1)
+    report = task.run_once()
+    assert report['compressed_rows'] == 2 and report['pruned_rows'] == 1
+    assert report['payload_bytes_saved'] > 0
+    assert stored(packed).startswith(PACKED_PREFIX)
+    assert unpack_payload(stored(packed)) == sources()
+    assert all(item['content'] == '' for item in orjson.loads(unpack_payload(stored(pruned))))
+    assert stored(fresh) == sources()
+
+
+def test_watermarks_live_in_the_chat_database(task):
+    ids = add_messages(30, 20, 10, 1)
+    task.run_once()
+    marks = {state.name: state.last_id for state in RetentionState.query}
+    # The sweep stops at the first row newer than the cutoff
+    assert marks['compress:message'] == ids[2]
+    assert marks['prune:message'] == 0
+
+
+def test_runs_resume_from_the_watermark(task):
+    first, second = add_messages(30, 20)
+    task.run_once()
+    # A row behind the watermark is not visited again
+    db.session.execute(update(Message).where(Message.id == first).values(sources=sources()))
+    db.session.commit()
+    assert task.run_once()['compressed_rows'] == 0
+    assert stored(first) == sources()
+    # Without its watermark the step walks the table from the start
+    db.session.execute(delete(RetentionState).where(RetentionState.name == 'compress:message'))
+    db.session.commit()
+    assert task.run_once()['compressed_rows'] == 1
+    assert stored(first).startswith(PACKED_PREFIX)
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import orjson
+import pytest
+from sqlalchemy import update
+
+from config import Config
+from models import db, Conversation, ConversationMemory, Message, SearchHistory, Tombstone
+from transfer import ImportFailed, export_lines, import_lines
+
+
+def add_conversation(title, messages=2):
+    conversation = Conversation(title=title)
+    db.session.add(conversation)
+    db.session.flush()
+    for i in range(messages):
+        db.session.add(Message(conversation_id=conversation.id, content=f"{title} message {i}", is_user=i % 2 == 0))
+    db.session.add(SearchHistory(conversation_id=conversation.id, query=title, sources='[]'))
+    db.session.flush()
+    last = Message.query.filter_by(conversation_id=conversation.id).order_by(Message.id.desc()).first()
+    db.session.add(ConversationMemory(conversation_id=conversation.id, summary=f"{title} summary",
+                                      summarized_through=last.id))
+    db.session.commit()
+    return conversation.id
+
+
+def export(since=None):
+    return [orjson.loads(line) for line in export_lines(since)]
+
+
+def test_export_pages_keep_rows_under_their_conversation(app, monkeypatch):
+    monkeypatch.setattr(Config, 'TRANSFER_BATCH_SIZE', 2)
+    ids = [add_conversation(f"c{i}", messages=3) for i in range(5)]
+    lines = export()
+    assert lines[0]['type'] == 'export'
+    assert [line['id'] for line in lines if line['type'] == 'conversation'] == ids
+    current = None
+    for line in lines[1:]:
+        if line['type'] == 'conversation':
+            current = line['id']
+        else:
+            assert line['conversation_id'] == current
+    assert sum(line['type'] == 'message' for line in lines) == 15
+
+
+def test_remap_import_copies_everything_under_new_ids(app):
+    add_conversation('first')
+    add_conversation('second')
+    lines = list(export_lines())
+    counts = import_lines(lines)
+    assert counts['conversation'] == 2 and counts['message'] == 4 and counts['conversation_memory'] == 2
+    assert Conversation.query.count() == 4
+    for memory in ConversationMemory.query:
+        # Each copied summary points at a message of its own conversation
+        assert db.session.get(Message, memory.summarized_through).conversation_id == memory.conversation_id
+
+
+def test_failed_import_rolls_back_and_names_the_line(app):
+    add_conversation('kept')
+    lines = list(export_lines()) + [b'{"type": "message", "conversation_id": 1, "created_at": "not a date"}\n']
+    with pytest.raises(ImportFailed) as failure:
+        import_lines(lines)
+    assert failure.value.line == len(lines)
+    assert Conversation.query.count() == 1
+
+
+def test_incremental_export_includes_rows_rewritten_in_place(app):
+    add_conversation('old')
+    since = datetime.utcnow()
+    # A Core update, as retention and the Markdown backfill do, stamps updated_at
+    db.session.execute(update(Message).where(Message.id == 1).values(content='rewritten'))
+    db.session.commit()
+    lines = export(since)
+    assert [line['type'] for line in lines] == ['export', 'conversation', 'message']
+    assert lines[2]['content'] == 'rewritten'
+
+
+def test_restore_deletes_leave_tombstones(app):
+    kept, removed = add_conversation('kept'), add_conversation('removed')
+    header = {'type': 'export', 'version': 1}
+    lines = [orjson.dumps(header), orjson.dumps({'type': 'deleted_conversation', 'id': removed})]
+    counts = import_lines(lines, mode='restore')
+    assert counts['deleted_conversation'] == 1
+    assert db.session.get(Conversation, removed) is None and db.session.get(Conversation, kept) is not None
+    assert [t.conversation_id for t in Tombstone.query] == [removed]
+    assert Message.query.filter_by(conversation_id=removed).count() == 0
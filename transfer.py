@@ -0,0 +1,321 @@
+"""
+Streaming NDJSON export and import of all chat data.
+
+`export_lines` writes one JSON object per line. A header comes first. Then
+each conversation is followed by its messages, search history and memory
+row, and, for incremental exports, the ids of conversations deleted since.
+The four tables are read in pages of TRANSFER_BATCH_SIZE rows, keyed by
+conversation and id, and merged in lockstep, so memory stays constant
+whatever the size of the database. Each page is read in a short transaction
+of its own, so a long export never holds a read transaction that would keep
+writers waiting or the WAL from being checkpointed. Rows written while it
+runs may or may not be included; they are in the next incremental export.
+Message sources are passed through as the stored
+JSON strings and are never parsed; payloads compacted by retention.py are
+unpacked first, so an export does not depend on how rows were stored.
+
+An incremental export (`since`) covers the messages, search history and
+memory rows created or written since then, each selected by its own
+timestamps, so rows rewritten in place (retention, the Markdown backfill)
+are included. Each comes under its conversation line, and conversations
+created or updated since are included too. Its header's `exported_at` is
+the `since` for the next one.
+
+`import_lines` reads an export TRANSFER_BATCH_SIZE lines at a time, with
+bulk inserts per run of same-typed rows. By default the whole import is one
+transaction: a bad line rolls it all back. With `atomic=False` each batch
+commits on its own, which keeps write locks short for large imports, and a
+failure leaves the batches before it in place. Either way a failure raises
+`ImportFailed` with the number of the line at fault (the first line of the
+run of rows, for database errors). It has two modes:
+
+* ``remap`` (default) gives every row a new id. Use it to merge an export
+  into a database that already has data. It keeps one old-to-new id entry
+  per conversation, plus one per message of the conversation in progress.
+* ``restore`` keeps the original ids and updates existing rows in place. Use
+  it to restore a full export and then apply incremental ones on top.
+"""
+import itertools
+from datetime import datetime
+
+import orjson
+from sqlalchemy import bindparam, delete, insert, or_, select, tuple_, union, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import Config
+from records import unpack_payload
+from models import db, Conversation, Message, SearchHistory, ConversationMemory, Tombstone, record_tombstones
+
+EXPORT_VERSION = 1
+
+TABLES = {
+    'conversation': Conversation.__table__,
+    'message': Message.__table__,
+    'search_history': SearchHistory.__table__,
+    'conversation_memory': ConversationMemory.__table__,
+}
+
+# Column identifying a row for replacement in restore mode
+KEYS = {'conversation': 'id', 'message': 'id', 'search_history': 'id', 'conversation_memory': 'conversation_id'}
+
+# Tables whose updated_at records the last write to this database, so imports stamp it anew
+WRITE_STAMPED = {'message', 'search_history'}
+
+
+class ImportFailed(ValueError):
+    """An import stopped at line `line`; `counts` holds what was imported (and kept) before it."""
+
+    def __init__(self, line, message, counts=None):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+        self.counts = counts or {}
+
+
+def _line(kind, row):
+    if row.get('sources'):
+        row['sources'] = unpack_payload(row['sources'])
+    return orjson.dumps({'type': kind, **row}) + b'\n'
+
+
+def _paged(statement, *order):
+    """Rows of `statement` sorted by the `order` columns, read a page at a time in short transactions."""
+    key = tuple_(*order) if len(order) > 1 else order[0]
+    last = None
+    while True:
+        page = statement.order_by(*order).limit(Config.TRANSFER_BATCH_SIZE)
+        if last is not None:
+            page = page.where(key > (tuple_(*last) if len(order) > 1 else last[0]))
+        with db.engine.connect() as conn:
+            rows = conn.execute(page).mappings().all()
+        yield from rows
+        if len(rows) < Config.TRANSFER_BATCH_SIZE:
+            return
+        last = [rows[-1][column.name] for column in order]
+
+
+class _GroupedRows:
+    """Rows ordered by conversation_id, handed out one conversation at a time."""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.head = next(self.rows, None)
+
+    def take(self, conversation_id):
+        # Rows of conversations that are not exported (e.g. orphans) are skipped
+        while self.head is not None and (self.head['conversation_id'] or 0) < conversation_id:
+            self.head = next(self.rows, None)
+        while self.head is not None and self.head['conversation_id'] == conversation_id:
+            yield dict(self.head)
+            self.head = next(self.rows, None)
+
+
+def export_lines(since=None):
+    """Yield the export as encoded NDJSON lines; `since` (a datetime) makes it incremental."""
+    conversations, messages, history, memory = (TABLES[name] for name in KEYS)
+    conversation_query = select(conversations)
+    # Rows without a conversation are never exported, and a NULL key would end the paging
+    message_query = select(messages).where(messages.c.conversation_id.isnot(None))
+    history_query = select(history).where(history.c.conversation_id.isnot(None))
+    memory_query = select(memory)
+    if since is not None:
+        changed_messages = or_(messages.c.created_at >= since, messages.c.updated_at >= since)
+        changed_history = or_(history.c.created_at >= since, history.c.updated_at >= since)
+        changed_memory = memory.c.updated_at >= since
+        # Conversations with any changed row, so the rows have a conversation line to follow
+        changed = union(
+            select(messages.c.conversation_id).where(changed_messages),
+            select(history.c.conversation_id).where(changed_history),
+            select(memory.c.conversation_id).where(changed_memory),
+        )
+        conversation_query = conversation_query.where(
+            or_(conversations.c.updated_at >= since, conversations.c.id.in_(changed))
+        )
+        message_query = message_query.where(changed_messages)
+        history_query = history_query.where(changed_history)
+        memory_query = memory_query.where(changed_memory)
+
+    yield _line('export', {'version': EXPORT_VERSION, 'exported_at': datetime.utcnow(), 'since': since})
+    grouped = [
+        ('message', _GroupedRows(_paged(message_query, messages.c.conversation_id, messages.c.id))),
+        ('search_history', _GroupedRows(_paged(history_query, history.c.conversation_id, history.c.id))),
+        ('conversation_memory', _GroupedRows(_paged(memory_query, memory.c.conversation_id))),
+    ]
+    for conversation in _paged(conversation_query, conversations.c.id):
+        yield _line('conversation', conversation)
+        for kind, rows in grouped:
+            for row in rows.take(conversation['id']):
+                yield _line(kind, row)
+    if since is not None:
+        tombstones = Tombstone.__table__
+        for row in _paged(select(tombstones).where(tombstones.c.deleted_at >= since), tombstones.c.id):
+            yield _line('deleted_conversation', {'id': row['conversation_id']})
+
+
+def _parse_row(table, record):
+    row = {}
+    for column in table.columns:
+        if column.name in record:
+            value = record[column.name]
+            if value is not None and isinstance(column.type, db.DateTime):
+                value = datetime.fromisoformat(value)
+            row[column.name] = value
+    return row
+
+
+class Importer:
+    def __init__(self, mode='remap'):
+        if mode not in ('remap', 'restore'):
+            raise ValueError(f"Unknown import mode: {mode}")
+        self.mode = mode
+        self.conversation_ids = {}
+        # Messages of the conversation being imported, for remapping its memory row
+        self.message_ids = {}
+        self.counts = {}
+
+    def _count(self, key, amount=1):
+        self.counts[key] = self.counts.get(key, 0) + amount
+
+    def apply(self, conn, numbered):
+        """Import a batch of (line number, decoded line) on `conn`, inside the caller's transaction."""
+        for kind, run in itertools.groupby(numbered, key=lambda item: item[1].get('type')):
+            run = list(run)
+            records = [record for _, record in run]
+            try:
+                if kind == 'export':
+                    for header in records:
+                        if header.get('version', 0) > EXPORT_VERSION:
+                            raise ValueError(f"Export version {header['version']} is newer than this app supports")
+                elif kind == 'deleted_conversation':
+                    self._delete(conn, [record['id'] for record in records])
+                elif kind in TABLES:
+                    self._insert(conn, kind, records)
+                else:
+                    self._count('skipped', len(records))
+            except SQLAlchemyError as e:
+                raise ImportFailed(run[0][0], f"{kind} rows could not be written: {getattr(e, 'orig', None) or e}") from e
+            except (KeyError, TypeError, ValueError) as e:
+                raise ImportFailed(run[0][0], f"invalid {kind} line: {e!r}") from e
+
+    def _insert(self, conn, kind, records):
+        table = TABLES[kind]
+        rows = [_parse_row(table, record) for record in records]
+        if kind in WRITE_STAMPED:
+            for row in rows:
+                row.pop('updated_at', None)
+        if self.mode == 'restore':
+            # Existing rows are updated in place; deleting a conversation would cascade to its children
+            key = table.c[KEYS[kind]]
+            existing = set(conn.execute(select(key).where(key.in_([row[key.name] for row in rows]))).scalars())
+            changed, added = [], []
+            for row in rows:
+                if row[key.name] in existing:
+                    row['row_key'] = row.pop(key.name)
+                    changed.append(row)
+                else:
+                    added.append(row)
+            if changed:
+                conn.execute(update(table).where(key == bindparam('row_key')), changed)
+            if added:
+                conn.execute(insert(table), added)
+            self._count(kind, len(rows))
+            return
+
+        if kind == 'conversation':
+            self.message_ids = {}
+            old_ids = [row.pop('id') for row in rows]
+            statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+            new_ids = conn.execute(statement, rows).scalars().all()
+            self.conversation_ids.update(zip(old_ids, new_ids))
+            self._count(kind, len(rows))
+            return
+
+        kept = []
+        for row in rows:
+            conversation_id = self.conversation_ids.get(row.get('conversation_id'))
+            if conversation_id is None:
+                self._count('orphaned')
+                continue
+            row['conversation_id'] = conversation_id
+            if kind == 'conversation_memory':
+                # The summary covers messages up to one that must have been imported too
+                summarized_through = self.message_ids.get(row.get('summarized_through'))
+                if row.get('summarized_through') and summarized_through is None:
+                    self._count('orphaned')
+                    continue
+                row['summarized_through'] = summarized_through or 0
+            kept.append(row)
+        if not kept:
+            return
+        if kind == 'message':
+            old_ids = [row.pop('id') for row in kept]
+            statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+            self.message_ids.update(zip(old_ids, conn.execute(statement, kept).scalars().all()))
+        else:
+            for row in kept:
+                row.pop('id', None)
+            conn.execute(insert(table), kept)
+        self._count(kind, len(kept))
+
+    def _delete(self, conn, ids):
+        if self.mode == 'remap':
+            # Deletions refer to ids in the exporting database
+            ids = [self.conversation_ids[i] for i in ids if i in self.conversation_ids]
+        if not ids:
+            return
+        conversations = TABLES['conversation']
+        ids = conn.execute(select(conversations.c.id).where(conversations.c.id.in_(ids))).scalars().all()
+        if not ids:
+            return
+        for kind, table in TABLES.items():
+            column = table.c.id if kind == 'conversation' else table.c.conversation_id
+            conn.execute(delete(table).where(column.in_(ids)))
+        # So clients of /api/sync drop them, as after a delete through the API
+        record_tombstones(conn, ids)
+        self._count('deleted_conversation', len(ids))
+
+
+def import_lines(lines, mode='remap', atomic=True):
+    """
+    Import NDJSON lines (bytes or str); returns row counts by type. Raises
+    ImportFailed, after rolling back everything (atomic) or the failing
+    batch (otherwise).
+    """
+    importer = Importer(mode)
+    committed = {}
+    with db.engine.connect() as conn:
+        transaction = conn.begin() if atomic else None
+
+        def flush(batch):
+            nonlocal committed
+            if atomic:
+                importer.apply(conn, batch)
+                return
+            with conn.begin():
+                importer.apply(conn, batch)
+            committed = dict(importer.counts)
+
+        try:
+            batch = []
+            for number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError as e:
+                    raise ImportFailed(number, f"not valid JSON ({e})")
+                if not isinstance(record, dict):
+                    raise ImportFailed(number, 'expected a JSON object')
+                batch.append((number, record))
+                if len(batch) >= Config.TRANSFER_BATCH_SIZE:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+            if transaction is not None:
+                transaction.commit()
+        except ImportFailed as e:
+            if transaction is not None:
+                transaction.rollback()
+            e.counts = committed
+            raise
+    return importer.counts
@@ -0,0 +1,125 @@
+"""
+Process lifecycle for multi-worker serving: startup pre-warming and reaping
+of Chrome processes left behind by workers that exited or crashed.
+
+Every chromedriver a WebScraper starts is registered in the shared store
+under its worker's pid. A worker quits its own browsers when it shuts down;
+the gunicorn master reaps those of a worker that died (see gunicorn.conf.py),
+and startup reaps any whose owner no longer exists.
+"""
+import os
+import signal
+import time
+
+from shared import SHARED
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _cmdline(pid):
+    try:
+        with open(f"/proc/{pid}/cmdline", 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode('utf-8', 'replace')
+    except OSError:
+        return ''
+
+
+def _descendants(pid):
+    """Pids of all processes below `pid`, read from /proc (empty where /proc is unavailable)."""
+    children = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding='utf-8') as f:
+                # The command name may contain spaces; fields after it are fixed
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def kill_tree(pid, grace=2.0):
+    """Terminate a chromedriver and the browsers below it; returns the number of processes signalled."""
+    # Pids get reused: only touch the process if it still is a chromedriver
+    if 'chromedriver' not in _cmdline(pid):
+        return 0
+    pids = [pid] + _descendants(pid)
+    for target in pids:
+        try:
+            os.kill(target, signal.SIGTERM)
+        except OSError:
+            pass
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline and any(pid_alive(p) for p in pids):
+        time.sleep(0.1)
+    for target in pids:
+        if pid_alive(target):
+            try:
+                os.kill(target, signal.SIGKILL)
+            except OSError:
+                pass
+    return len(pids)
+
+
+def reap_browsers(owner):
+    """Kill every browser registered by worker `owner`."""
+    reaped = 0
+    for pid, _ in SHARED.browsers(owner):
+        reaped += kill_tree(pid)
+        SHARED.unregister_browser(pid)
+    return reaped
+
+
+def reap_orphans():
+    """Kill browsers whose worker no longer exists (e.g. after a crash or SIGKILL)."""
+    reaped = 0
+    for pid, owner in SHARED.browsers():
+        if not pid_alive(owner):
+            reaped += kill_tree(pid)
+            SHARED.unregister_browser(pid)
+    return reaped
+
+
+def shutdown_worker():
+    """Quit this process's browsers cleanly, then kill any that didn't go."""
+    from scraper import close_all_scrapers
+    close_all_scrapers()
+    reap_browsers(os.getpid())
+
+
+def prewarm(app):
+    """
+    One-time startup work, run in the gunicorn master before workers fork:
+    create the schema, resolve chromedriver and clean up after any earlier crash.
+    """
+    from models import db, ensure_schema
+    with app.app_context():
+        ensure_schema()
+        # Pooled connections must not be shared across fork
+        db.engine.dispose()
+    # Resolved once here and inherited by the forked workers
+    from scraper import chromedriver_path
+    chromedriver_path()
+    SHARED.purge_expired()
+    reaped = reap_orphans()
+    if reaped:
+        print(f"Reaped {reaped} orphaned Chrome processes")
@@ -0,0 +1,14 @@
+"""
+WSGI entry point for multi-process serving:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+gunicorn.conf.py preloads this module in the master, so the pre-warming
+below runs once before the workers are forked.
+"""
+from app import app
+from workers import prewarm
+
+prewarm(app)
+
+application = app